@@ -0,0 +1,99 @@
+"""Detection table benchmark: per-render parsing of sheet records vs. the typed table.
+
+    python benchmarks/bench_detection_table.py --rows 10000 100000 1000000
+
+The legacy path is reproduced as it was in disease_tracking.main: a
+DataFrame of the raw records with to_numeric/to_datetime run on every
+render and object columns kept. The typed path is typed_detections,
+which load_detections runs once per data change; a rerun after that
+only compares the cache key.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.map_data import jitter_coordinates, typed_detections  # noqa: E402
+
+
+def synthetic_records(rows, seed=0):
+    """get_all_records()-style dicts: dates as text, numbers as numbers, a few "N/A" dates."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D")
+    dates = days.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    dates[rng.random(rows) < 0.02] = "N/A"
+    diseases = rng.choice(["Rust", "Cercospora", "Sooty Mold"], rows)
+    confidence = rng.uniform(50, 99, rows).round(1)
+    lats = np.round(rng.uniform(5.0, 12.0, rows), 6)
+    lons = np.round(rng.uniform(120.0, 126.0, rows), 6)
+    altitude = rng.uniform(0, 1500, rows).round(1)
+    return [
+        {
+            "Timestamp": date,
+            "Disease Detected": disease,
+            "Confidence": float(conf),
+            "Latitude": float(lat),
+            "Longitude": float(lon),
+            "Altitude": float(alt),
+        }
+        for date, disease, conf, lat, lon, alt in zip(dates, diseases, confidence, lats, lons, altitude)
+    ]
+
+
+def legacy_parse(df):
+    df.columns = [col.strip().lower() for col in df.columns]
+    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
+    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce", format="mixed")
+    df["year"] = df["timestamp"].dt.year
+    df["month"] = df["timestamp"].dt.month
+    df["month_name"] = df["timestamp"].dt.month_name()
+    df["display_lat"], df["display_long"] = jitter_coordinates(df)
+    return df
+
+
+def timed(func, make_input, repeat):
+    samples, result = [], None
+    for _ in range(repeat):
+        df = make_input()
+        started = time.perf_counter()
+        result = func(df)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)), result
+
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>9} {'legacy':>10} {'typed':>10} {'legacy MB':>10} {'typed MB':>9} {'smaller':>8}")
+    for rows in args.rows:
+        raw = pd.DataFrame(synthetic_records(rows))
+        legacy_time, legacy = timed(legacy_parse, raw.copy, args.repeat)
+        typed_time, typed = timed(typed_detections, raw.copy, args.repeat)
+
+        assert len(typed) == len(legacy)
+        assert np.allclose(typed["latitude"], legacy["latitude"], atol=1e-5, equal_nan=True)
+        assert typed["timestamp"].isna().equals(legacy["timestamp"].isna())
+
+        legacy_mb, typed_mb = megabytes(legacy), megabytes(typed)
+        print(
+            f"{rows:>9} {legacy_time * 1000:>8.0f}ms {typed_time * 1000:>8.0f}ms "
+            f"{legacy_mb:>10.1f} {typed_mb:>9.1f} {legacy_mb / typed_mb:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Marker jitter benchmark: per-coordinate mask loop vs. the vectorized jitter_coordinates.
+
+    python benchmarks/bench_jitter.py --rows 10000 100000 1000000
+
+The old loop is reproduced here as it was in disease_tracking.main (one
+full boolean mask per unique coordinate). It is O(rows x unique points),
+so it only runs up to --legacy-max rows; larger sizes time the new path
+alone.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.map_data import jitter_coordinates  # noqa: E402
+
+
+def synthetic_locations(rows, stacked_share=0.5, seed=0):
+    """Sheet-like rows around a few farms; `stacked_share` of them reuse an earlier coordinate."""
+    rng = np.random.default_rng(seed)
+    unique = max(1, int(rows * (1 - stacked_share)))
+    lats = np.round(rng.uniform(5.0, 12.0, unique), 6)
+    lons = np.round(rng.uniform(120.0, 126.0, unique), 6)
+    picks = np.concatenate([np.arange(unique), rng.integers(0, unique, rows - unique)])
+    return pd.DataFrame({"latitude": lats[picks], "longitude": lons[picks]})
+
+
+def legacy_jitter(df):
+    coord_counts = df.groupby(["latitude", "longitude"]).size().reset_index(name="count")
+    for idx, row in coord_counts.iterrows():
+        mask = (df["latitude"] == row["latitude"]) & (df["longitude"] == row["longitude"])
+        if row["count"] > 1:
+            jitter_amount = 0.0001
+            jitter_lats = np.random.uniform(-jitter_amount, jitter_amount, mask.sum())
+            jitter_longs = np.random.uniform(-jitter_amount, jitter_amount, mask.sum())
+            df.loc[mask, "display_lat"] = df.loc[mask, "latitude"] + jitter_lats
+            df.loc[mask, "display_long"] = df.loc[mask, "longitude"] + jitter_longs
+        else:
+            df.loc[mask, "display_lat"] = df.loc[mask, "latitude"]
+            df.loc[mask, "display_long"] = df.loc[mask, "longitude"]
+    return df
+
+
+def vectorized_jitter(df):
+    df["display_lat"], df["display_long"] = jitter_coordinates(df)
+    return df
+
+
+def timed(func, make_input, repeat):
+    samples = []
+    for _ in range(repeat):
+        df = make_input()
+        started = time.perf_counter()
+        func(df)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--stacked", type=float, default=0.5, help="share of rows on a reused coordinate")
+    parser.add_argument("--legacy-max", type=int, default=10_000, help="largest size the old loop runs at")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>9} {'legacy':>10} {'vectorized':>11} {'speed-up':>9}")
+    for rows in args.rows:
+        base = synthetic_locations(rows, args.stacked)
+        make_input = base.copy
+
+        first = vectorized_jitter(make_input())
+        again = vectorized_jitter(make_input())
+        assert first["display_lat"].equals(again["display_lat"]), "jitter is not deterministic"
+
+        vectorized = timed(vectorized_jitter, make_input, args.repeat)
+        if rows <= args.legacy_max:
+            legacy = timed(legacy_jitter, make_input, 1)
+            print(f"{rows:>9} {legacy:>9.2f}s {vectorized * 1000:>9.1f}ms {legacy / vectorized:>8.0f}x")
+        else:
+            print(f"{rows:>9} {'skipped':>10} {vectorized * 1000:>9.1f}ms {'':>9}")
+
+
+if __name__ == "__main__":
+    main()
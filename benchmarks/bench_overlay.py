@@ -0,0 +1,146 @@
+"""Overlay rendering benchmark: per-box drawing vs. the batched OverlayRenderer.
+
+    python benchmarks/bench_overlay.py --boxes 150 --size 4000x3000
+
+The old renderer is reproduced here as it was (per-box tensor access,
+per-box font metrics, full-resolution canvas) so both paths draw the same
+synthetic detections on the same image.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.processing import nms_indices  # noqa: E402
+from modules.visualizations import OverlayRenderer, preview_canvas  # noqa: E402
+
+LABELS = {0: "abiotic", 1: "cercospora", 2: "healthy", 3: "late-stage-rust", 4: "sooty mold"}
+COLORS = {0: (255, 255, 0), 1: (255, 0, 0), 2: (0, 204, 0), 3: (255, 165, 0), 4: (0, 0, 0)}
+
+
+class _Array:
+    """Stands in for a torch tensor: `.cpu()` and `.numpy()` return host data."""
+
+    def __init__(self, values):
+        self.values = np.asarray(values)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.values
+
+    def __getitem__(self, index):
+        return _Array(self.values[index])
+
+    def __int__(self):
+        return int(self.values.reshape(-1)[0])
+
+    def __float__(self):
+        return float(self.values.reshape(-1)[0])
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+
+class _Boxes:
+    """Minimal ultralytics `Boxes`: rows of (x1, y1, x2, y2, conf, cls)."""
+
+    def __init__(self, data):
+        self.data = _Array(data)
+        self.xyxy = _Array(data[:, :4])
+        self.conf = _Array(data[:, 4])
+        self.cls = _Array(data[:, 5])
+
+    def __len__(self):
+        return len(self.data.values)
+
+    def __getitem__(self, index):
+        return _Boxes(self.data.values[[index]])
+
+
+def synthetic_boxes(count, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width * 0.95, count)
+    y1 = rng.uniform(0, height * 0.95, count)
+    w = rng.uniform(20, width * 0.05, count)
+    h = rng.uniform(20, height * 0.05, count)
+    data = np.column_stack(
+        [x1, y1, np.minimum(x1 + w, width), np.minimum(y1 + h, height),
+         rng.uniform(0.3, 1.0, count), rng.integers(0, len(LABELS), count)]
+    ).astype(np.float32)
+    return _Boxes(data)
+
+
+def legacy_draw(image, boxes, overlap_threshold):
+    """The pre-OverlayRenderer path: NMS to a list, copy, draw each box at full size."""
+    keep = nms_indices(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), overlap_threshold)
+    kept = [boxes[i] for i in keep]
+    canvas = np.array(image, copy=True)
+    colors = {key: tuple(color[::-1]) for key, color in COLORS.items()}
+    for box in kept:
+        height, width = canvas.shape[:2]
+        font_scale = max(0.6, min(width, height) / 600)
+        font_thickness = max(2, min(width, height) // 250)
+        box_thickness = max(3, min(width, height) // 200)
+        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
+        label_idx = int(box.cls)
+        label = f"{LABELS[label_idx]}: {float(box.conf):.2f}"
+        cv2.rectangle(canvas, (int(x1), int(y1)), (int(x2), int(y2)), colors[label_idx], box_thickness)
+        cv2.putText(canvas, label, (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, colors[label_idx], font_thickness)
+    cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB, dst=canvas)
+    return canvas
+
+
+def renderer_draw(image, boxes, overlap_threshold, max_dim):
+    data = np.asarray(boxes.data.cpu())
+    xyxy, confidences, class_ids = data[:, :4], data[:, 4], data[:, 5].astype(np.int32)
+    keep = nms_indices(xyxy, confidences, overlap_threshold)
+    canvas, scale = preview_canvas(image, max_dim)
+    OverlayRenderer(LABELS, COLORS).draw(canvas, xyxy[keep], class_ids[keep], confidences[keep], scale)
+    cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB, dst=canvas)
+    return canvas
+
+
+def timed(func, repeat):
+    func()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boxes", type=int, nargs="+", default=[10, 100, 300])
+    parser.add_argument("--size", default="4000x3000", help="WIDTHxHEIGHT of the synthetic image")
+    parser.add_argument("--overlap", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    image = np.random.default_rng(1).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+    print(f"{'boxes':>6} {'legacy':>10} {'full res':>10} {'preview':>10} {'speed-up':>9}")
+    for count in args.boxes:
+        boxes = synthetic_boxes(count, width, height)
+        legacy = timed(lambda: legacy_draw(image, boxes, args.overlap), args.repeat)
+        full = timed(lambda: renderer_draw(image, boxes, args.overlap, None), args.repeat)
+        preview = timed(lambda: renderer_draw(image, boxes, args.overlap, 1200), args.repeat)
+        print(
+            f"{count:>6} {legacy * 1000:>8.1f}ms {full * 1000:>8.1f}ms "
+            f"{preview * 1000:>8.1f}ms {legacy / preview:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
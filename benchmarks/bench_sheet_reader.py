@@ -0,0 +1,120 @@
+"""Sheets reader benchmark: get_all_records vs. the column-wise fetch_detection_columns.
+
+    python benchmarks/bench_sheet_reader.py --rows 10000 100000 1000000
+
+No network is involved. The sheet is held in memory as the JSON payloads
+the Sheets API would return: row-major values for get_all_records, and
+column-major ranges for batch_get. Each payload goes through a JSON
+round trip on every call, standing in for the transfer, and that is part
+of the timings. Each path is timed up to a DataFrame the Map tab can use.
+The report also gives the peak Python memory (tracemalloc) and the
+payload bytes each path downloads.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from modules.database import SHEETS_PAGE_ROWS, fetch_detection_columns  # noqa: E402
+from modules.map_data import DETECTION_COLUMNS  # noqa: E402
+
+HEADERS = ["Timestamp", "Disease Detected", "Confidence", "Latitude", "Longitude", "Altitude", "Image Hash"]
+
+
+class SyntheticWorksheet:
+    """The parts of gspread.Worksheet both readers use, backed by an in-memory sheet."""
+
+    def __init__(self, rows, seed=0):
+        rng = np.random.default_rng(seed)
+        days = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D")
+        dates = days.strftime("%Y-%m-%d").to_numpy(dtype=object)
+        dates[rng.random(rows) < 0.02] = "N/A"
+        self.columns = [
+            list(dates),
+            list(rng.choice(["Rust", "Cercospora", "Sooty Mold"], rows)),
+            rng.uniform(50, 99, rows).round(1).tolist(),
+            np.round(rng.uniform(5.0, 12.0, rows), 6).tolist(),
+            np.round(rng.uniform(120.0, 126.0, rows), 6).tolist(),
+            rng.uniform(0, 1500, rows).round(1).tolist(),
+            [f"{value:032x}" for value in rng.integers(0, 2**62, rows)],
+        ]
+        self.row_count = rows + 1
+        self.downloaded = 0
+
+    def _receive(self, payload):
+        body = json.dumps(payload)
+        self.downloaded += len(body)
+        return json.loads(body)
+
+    def row_values(self, row):
+        return self._receive(HEADERS) if row == 1 else []
+
+    def get_all_records(self):
+        values = self._receive([HEADERS] + [list(row) for row in zip(*self.columns)])
+        return [dict(zip(values[0], row)) for row in values[1:]]
+
+    def batch_get(self, ranges, **kwargs):
+        result = []
+        for a1 in ranges:
+            col, first, _, last = re.fullmatch(r"([A-Z]+)(\d+):([A-Z]+)(\d+)", a1).groups()
+            values = self.columns[ord(col) - ord("A")][int(first) - 2 : int(last) - 1]
+            result.append([values] if values else [])
+        return self._receive(result)
+
+
+def legacy_read(worksheet):
+    df = pd.DataFrame(worksheet.get_all_records())
+    df.columns = [col.strip().lower() for col in df.columns]
+    return df
+
+
+def columnar_read(worksheet):
+    return fetch_detection_columns(DETECTION_COLUMNS, worksheet=worksheet)
+
+
+def measure(func, worksheet):
+    # Timed and traced in separate runs; tracemalloc slows allocation-heavy code several-fold
+    worksheet.downloaded = 0
+    started = time.perf_counter()
+    result = func(worksheet)
+    elapsed = time.perf_counter() - started
+    payload = worksheet.downloaded
+
+    tracemalloc.start()
+    func(worksheet)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2**20, payload / 2**20
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args(argv)
+
+    print(f"page size {SHEETS_PAGE_ROWS} rows; times include JSON decoding")
+    print(f"{'rows':>9} {'reader':>9} {'time':>9} {'peak MB':>9} {'payload MB':>11}")
+    for rows in args.rows:
+        worksheet = SyntheticWorksheet(rows)
+        legacy, *legacy_stats = measure(legacy_read, worksheet)
+        columnar, *columnar_stats = measure(columnar_read, worksheet)
+
+        assert len(columnar) == len(legacy)
+        assert np.allclose(columnar["latitude"], legacy["latitude"].astype(float))
+        assert (columnar["timestamp"].to_numpy() == legacy["timestamp"].to_numpy()).all()
+
+        for name, (elapsed, peak, payload) in (("records", legacy_stats), ("columns", columnar_stats)):
+            print(f"{rows:>9} {name:>9} {elapsed * 1000:>7.0f}ms {peak:>9.1f} {payload:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,3 +30,35 @@ DISEASE_LIGHTWEIGHT_MODEL = MODEL_DIR / "yolo12n.pt"
 DISEASE_MODEL_YOLO12M = MODEL_DIR / "yolo11m96.pt" 
 
 LEAF_MODEL = MODEL_DIR / "cleaf.pt"  # unchanged
+
+# Batch processing
+# Upper bound on decoded image memory held by a batch run
+BATCH_MEMORY_BUDGET_MB = 1024
+# Maximum number of images decoded at the same time
+BATCH_MAX_IN_FLIGHT = 4
+# Upper bound on encoded images queued for Drive upload; kept apart from the
+# decoded-image budget so persistence never waits on decoding (or vice versa)
+BATCH_UPLOAD_BUDGET_MB = 256
+# Threads decoding images and reading EXIF ahead of inference
+BATCH_READ_WORKERS = 2
+# Threads saving results to Sheets and queueing Drive uploads
+BATCH_IO_WORKERS = 4
+# Capacity of the queue in front of each batch stage
+BATCH_QUEUE_SIZE = 4
+# Most images taken from ZIP archives in one batch
+BATCH_MAX_ARCHIVE_MEMBERS = 1000
+# Archive members larger than this (uncompressed) are skipped
+BATCH_MAX_ARCHIVE_MEMBER_MB = 50
+# Duplicate photos in a batch are detected once; "save_once" saves one result per
+# group of duplicates, "save_each" saves the shared result for every file
+BATCH_DUPLICATE_POLICY = "save_once"
+# Opt-in: photos whose 64-bit difference hashes differ in at most this many bits
+# are merged as near duplicates (resized or re-compressed copies). Distinct shots
+# of similar leaves can fall within a few bits, so the default (None) merges
+# byte-identical files only
+BATCH_NEAR_DUPLICATE_BITS = None
+
+# Debugging
+# Trace Python allocations around each detection and show the peak; this slows
+# detection and misses memory held by native libraries (OpenCV, torch)
+DEBUG_PEAK_MEMORY = False
@@ -1,12 +1,19 @@
 import streamlit as st
 from streamlit_extras.stylable_container import stylable_container
 from components.ui_manager import manage_ui_state
+from components.config import settings
 
 # Import other modules
 from modules.detection_utils import initialize_session_state
 from modules.batch_processing import process_all_images
 from modules.cache_management import clear_cache, get_cache_size, limit_cache_size
 from modules.image_uploader import authenticate_drive
+from modules.batch_jobs import start_batch_workers, submit_batch_job
+from modules.batch_progress import results_table
+from modules.job_queue import FAILED, FINISHED_STATUSES, JobQueue
+
+# Seconds between refreshes of the background jobs panel
+JOB_REFRESH_SECONDS = 2
 
 
 def main(theme_colors):
@@ -200,6 +207,26 @@ def main(theme_colors):
         # Call our UI manager to handle the UI state
         manage_ui_state(theme_colors)
 
+    # Background batch jobs keep running after this session ends
+    start_batch_workers()
+    st.sidebar.divider()
+    st.sidebar.header("BATCH PROCESSING")
+    run_now = render_background_jobs(current_model_config, PARENT_FOLDER_ID, batch_mode)
+    if run_now:
+        # Runs in this session, below the viewer; the page reports progress as it goes
+        st.divider()
+        process_all_images(
+            st.session_state.get("uploaded_files"),
+            detection_model_choice,
+            disease_model_mode,
+            confidence,
+            overlap_threshold,
+            st.session_state.get("job_save_to_drive", False),
+            drive,
+            PARENT_FOLDER_ID,
+            settings,
+        )
+
     # Cache management in sidebar - keep this part as is
     if get_cache_size() > 0:
         st.sidebar.divider()
@@ -212,6 +239,70 @@ def main(theme_colors):
                 st.sidebar.error("Failed to clear cache.")
 
 
+def render_background_jobs(current_model_config, PARENT_FOLDER_ID, batch_mode):
+    """Sidebar controls to process the current batch and follow recent background jobs.
+
+    Returns True when the batch should be processed now, in this session;
+    queued jobs keep running after the session ends.
+    """
+    job_queue = JobQueue()
+    run_now = False
+
+    uploaded_files = st.session_state.get("uploaded_files")
+    if batch_mode and uploaded_files:
+        save_to_drive = st.sidebar.checkbox(
+            "Upload detections to Drive", value=False, key="job_save_to_drive"
+        )
+        run_now = st.sidebar.button("⚡ Detect & save all now", use_container_width=True)
+        if st.sidebar.button("🕒 Detect & save all in background", use_container_width=True):
+            job_id = submit_batch_job(
+                uploaded_files, current_model_config, save_to_drive, PARENT_FOLDER_ID, job_queue
+            )
+            st.sidebar.success(
+                f"Queued job `{job_id}`. You can close this tab and check back later."
+            )
+
+    with st.sidebar:
+        render_job_list(job_queue)
+    return run_now
+
+
+@st.fragment(run_every=JOB_REFRESH_SECONDS)
+def render_job_list(job_queue):
+    """Recent jobs with their progress and outcome summary, refreshed on a timer."""
+    jobs = job_queue.list_jobs(limit=5)
+    if not jobs:
+        st.caption("No background jobs yet.")
+        return
+
+    for job in jobs:
+        total = job["progress_total"] or 1
+        with st.expander(f"{job['id']} · {job['status']}"):
+            st.progress(min(job["progress_done"] / total, 1.0))
+            st.caption(f"{job['progress_done']}/{job['progress_total']} images · {job['message'] or ''}")
+            if job["error"]:
+                st.error(job["error"])
+            if job["status"] not in FINISHED_STATUSES and not job["cancel_requested"]:
+                if st.button("Cancel", key=f"cancel_{job['id']}"):
+                    job_queue.request_cancel(job["id"])
+                    st.rerun()
+            if job["status"] == FAILED and job_queue.input_dir(job["id"]).exists():
+                if st.button("Retry", key=f"retry_{job['id']}"):
+                    job_queue.resubmit(job["id"])
+                    st.rerun()
+            if job["result"]:
+                counts = job["result"].get("counts", {})
+                st.caption(", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+                for note in job["result"].get("notes", []):
+                    st.caption(f"⚠️ {note}")
+            results = job_queue.results(job["id"])
+            if results:
+                # Same summary as interactive batches; per-image rows only on request
+                st.dataframe(results_table(results), use_container_width=True, hide_index=True)
+                if st.toggle(f"Per-image details ({len(results)})", key=f"details_{job['id']}"):
+                    st.dataframe(results, use_container_width=True, hide_index=True)
+
+
 if __name__ == "__main__":
     default_theme = {
         "LIGHT": {
@@ -1,8 +1,19 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import numpy as np
-from modules.database import fetch_all_locations  # Fetch data from Google Sheets
+import plotly.graph_objects as go
+from modules.hotspots import (
+    HOTSPOT_MIN_DETECTIONS,
+    HOTSPOT_RADIUS_KM,
+    HOTSPOT_WINDOW_DAYS,
+    get_hotspot_model,
+)
+from modules.map_aggregation import POINTS_MIN_ZOOM, aggregate_points, cell_size_degrees
+from modules.map_density import density_grid, heatmap_radius_px
+from modules.map_data import get_detection_filter, load_detections
+from modules.rollups import MONTH, WEEK, get_rollup_store
+from modules.spatial_index import get_spatial_index
+from modules.history_store import start_export_scheduler
 
 # Define colors for different diseases (Hex format for Plotly)
 DISEASE_COLORS = {
@@ -14,74 +25,248 @@ DISEASE_COLORS = {
     # "abiotic-disorder": "#ffff00",  # Yellow
 }
 
+# Largest hotspots outlined on the map and listed below it
+MAX_HOTSPOTS_SHOWN = 20
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def density_layer(filter_key, data_version, zoom, _lats, _lons):
+    """Heatmap cells for one filter combination at one zoom.
+
+    The coordinate arrays are not hashed; `filter_key` and
+    `data_version` (the rollups' `detections_version`) identify them, so
+    a cached grid is reused until the filters change or a detection is
+    saved.
+    """
+    return density_grid(_lats, _lons, cell_size_degrees(zoom))
+
+
+# Filter combinations whose rows and figures are kept; older ones are evicted first
+FIGURE_CACHE_ENTRIES = 32
+
+# The functions below are cached as shared objects keyed by their hashable
+# arguments and `data_version`, the rollups' `detections_version`: it moves on
+# every saved detection, dated or not, and every snapshot export. Underscore
+# arguments are not hashed. Callers must not modify what they return.
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def select_detections(filter_key, data_version, _df, _selector):
+    """Detections matching (disease, year, near), with their marker colors.
+
+    `near` is None or (lat, lon, radius_km, since).
+    """
+    disease, year, near = filter_key
+    within, since = None, None
+    if near is not None:
+        near_lat, near_lon, radius_km, since = near
+        within, _ = get_spatial_index(_df, data_version).radius(near_lat, near_lon, radius_km)
+    # Only the selected rows are materialized; no whole-frame copy per filter change
+    positions = _selector.positions(disease=disease, year=year, since=since, within=within)
+    return _df.iloc[positions].assign(color=_selector.colors(positions, DISEASE_COLORS))
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def hotspot_table(disease, year, data_version, _df):
+    """The largest hotspots last seen in `year` for `disease`, and the model they come from."""
+    # Clustered over all detections; rebuilt only when the data changes
+    hotspot_model = get_hotspot_model(_df, data_version)
+    hotspots = hotspot_model.summary()
+    if disease is not None:
+        hotspots = hotspots[hotspots["disease"] == disease]
+    if year is not None:
+        hotspots = hotspots[hotspots["last seen"].dt.year == year]
+    return hotspots.head(MAX_HOTSPOTS_SHOWN), hotspot_model
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def map_figure(
+    filter_key,
+    data_version,
+    map_zoom,
+    map_layer,
+    show_hotspots,
+    _filtered_df,
+    _hotspots,
+    _hotspot_model,
+):
+    """The detection map for one filter combination, zoom and layer, and its caption (or None)."""
+    caption = None
+    if map_layer == "Heatmap":
+        cells, cell_degrees = density_layer(
+            filter_key,
+            data_version,
+            map_zoom,
+            _filtered_df["latitude"].to_numpy(dtype="float64"),
+            _filtered_df["longitude"].to_numpy(dtype="float64"),
+        )
+        fig = px.density_mapbox(
+            cells,
+            lat="latitude",
+            lon="longitude",
+            z="density",
+            radius=heatmap_radius_px(cell_degrees, map_zoom),
+            zoom=map_zoom,
+            color_continuous_scale="YlOrRd",
+            hover_data={"density": ":.1f"},
+        )
+        fig.update_coloraxes(showscale=False)
+    else:
+        # Bounded payload: grid cells unless zoomed in on few enough points
+        map_df, map_mode = aggregate_points(
+            _filtered_df, map_zoom, lat="display_lat", lon="display_long"
+        )
+        if map_mode == "points":
+            fig = px.scatter_mapbox(
+                map_df,
+                lat="display_lat",
+                lon="display_long",
+                color="disease detected",
+                color_discrete_map=DISEASE_COLORS,
+                hover_name="disease detected",
+                hover_data=["confidence", "latitude", "longitude"],
+                zoom=map_zoom,
+                size_max=15,
+                opacity=0.8,
+            )
+        else:
+            fig = px.scatter_mapbox(
+                map_df,
+                lat="display_lat",
+                lon="display_long",
+                color="dominant",
+                size="count",
+                color_discrete_map=DISEASE_COLORS,
+                hover_name="dominant",
+                hover_data={
+                    "count": True,
+                    "dominant share": ":.0%",
+                    "mean confidence": True,
+                    "display_lat": False,
+                    "display_long": False,
+                },
+                zoom=map_zoom,
+                size_max=30,
+                opacity=0.7,
+            )
+        if map_mode == "cells":
+            if map_zoom >= POINTS_MIN_ZOOM:
+                hint = "narrow the filters to see individual detections"
+            else:
+                hint = f"zoom to {POINTS_MIN_ZOOM} or more to see individual detections"
+            if len(map_df):
+                caption = (
+                    f"{len(_filtered_df):,} detections grouped into {len(map_df):,} cells "
+                    f"of {map_df['cell size'].iloc[0]:.3g}° (colored by the most common "
+                    f"disease); {hint}."
+                )
+
+    if show_hotspots:
+        hotspot_diseases = dict(zip(_hotspots["hotspot"], _hotspots["disease"]))
+        for hotspot, (lats, lons) in _hotspot_model.outlines(_hotspots["hotspot"]).items():
+            disease = hotspot_diseases[hotspot]
+            fig.add_trace(
+                go.Scattermapbox(
+                    lat=lats,
+                    lon=lons,
+                    mode="lines",
+                    fill="toself",
+                    line={"width": 2, "color": DISEASE_COLORS.get(disease.lower(), "#646464")},
+                    name=f"Hotspot {hotspot + 1} ({disease})",
+                    hoverinfo="name",
+                )
+            )
+
+    fig.update_layout(
+        mapbox_style="open-street-map",
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        height=600,
+        legend=dict(
+            title="Legend",
+            yanchor="top",
+            y=0.99,
+            xanchor="left",
+            x=0.01,
+            bgcolor="rgba(255, 255, 255, 0.8)",
+        ),
+    )
+    return fig, caption
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def hotspot_growth_figure(disease, year, data_version, _hotspots, _hotspot_model):
+    """Cumulative weekly detections of the listed hotspots."""
+    growth = _hotspot_model.growth(_hotspots["hotspot"])
+    growth["hotspot"] = "Hotspot " + (growth["hotspot"] + 1).astype(str)
+    fig_growth = px.line(
+        growth,
+        x="period",
+        y="detections",
+        color="hotspot",
+        title="Hotspot Growth",
+        markers=True,
+    )
+    fig_growth.update_layout(
+        xaxis_title="Week", yaxis_title="Detections (cumulative)"
+    )
+    return fig_growth
+
+
+@st.cache_resource(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def occurrence_figure(grain, disease, year, data_version, _rollups):
+    """Detections per period and disease from the rollups, or None when there are none."""
+    time_series = _rollups.query(
+        grain,
+        diseases=None if disease is None else [disease],
+        year=year,
+    )
+    if time_series.empty:
+        return None
+    fig_line = px.line(
+        time_series,
+        x="period",
+        y="count",
+        color="disease detected",
+        title="Disease Reports",
+        markers=True,
+        color_discrete_map=DISEASE_COLORS,
+    )
+    fig_line.update_layout(
+        xaxis_title="Date", yaxis_title="Occurrence Count"
+    )
+    return fig_line
+
 
 def main(theme_colors=None):
     st.info(
-        "Disease markers may overlap; zoom in for a clearer view.",
+        "Disease markers may overlap; zoom in or switch the map layer to Heatmap for a clearer view.",
         icon=":material/info:",
     )
 
-    # Fetch data from Google Sheets
-    locations = fetch_all_locations()
-
-    if not locations or len(locations) == 0:
-        st.warning("No disease detection data available.")
-        return
+    # Keep the Parquet snapshot of the sheet fresh in the background
+    start_export_scheduler()
 
-    df = pd.DataFrame(locations)
-    df.columns = [col.strip().lower() for col in df.columns]
+    # Read before loading, so cached figures are never keyed newer than the data they show
+    rollups = get_rollup_store()
+    data_version = rollups.detections_version()
 
-    required_columns = ["disease detected", "confidence", "latitude", "longitude"]
-    if not all(col in df.columns for col in required_columns):
-        st.error("Invalid data format in Google Sheets. Please check column names.")
-        st.write("Found columns:", df.columns.tolist())
+    # Typed, cached detection table; parsed only when the data changes
+    try:
+        df = load_detections()
+    except ValueError as e:
+        st.error(str(e))
         return
 
-    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
-    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
-
-    if "timestamp" in df.columns:
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    else:
-        st.error("Missing 'timestamp' column in the dataset.")
+    if df.empty:
+        st.warning("No disease detection data available.")
         return
 
-    df["year"] = df["timestamp"].dt.year
-    df["month"] = df["timestamp"].dt.month
-
-    month_map = {
-        1: "January",
-        2: "February",
-        3: "March",
-        4: "April",
-        5: "May",
-        6: "June",
-        7: "July",
-        8: "August",
-        9: "September",
-        10: "October",
-        11: "November",
-        12: "December",
-    }
-
-    df["month_name"] = df["month"].map(month_map)
+    # Categorical codes and cached masks for the disease/year filters
+    selector = get_detection_filter(df)
 
-    coord_counts = (
-        df.groupby(["latitude", "longitude"]).size().reset_index(name="count")
-    )
-    for idx, row in coord_counts.iterrows():
-        mask = (df["latitude"] == row["latitude"]) & (
-            df["longitude"] == row["longitude"]
-        )
-        if row["count"] > 1:
-            jitter_amount = 0.0001
-            jitter_lats = np.random.uniform(-jitter_amount, jitter_amount, mask.sum())
-            jitter_longs = np.random.uniform(-jitter_amount, jitter_amount, mask.sum())
-            df.loc[mask, "display_lat"] = df.loc[mask, "latitude"] + jitter_lats
-            df.loc[mask, "display_long"] = df.loc[mask, "longitude"] + jitter_longs
-        else:
-            df.loc[mask, "display_lat"] = df.loc[mask, "latitude"]
-            df.loc[mask, "display_long"] = df.loc[mask, "longitude"]
+    # Monthly/weekly counts maintained as detections are saved; seed them on first use
+    if rollups.is_empty():
+        rollups.rebuild(df)
 
     col1, col2 = st.columns([0.7, 0.3])
 
@@ -89,11 +274,12 @@ def main(theme_colors=None):
         with st.container(border=True):
             st.subheader("Filter Options")
 
+            # Options come from the typed table, so undated detections are listed too
             disease_filter = st.selectbox(
-                "Select Disease Type", ["All"] + sorted(df["disease detected"].unique())
+                "Select Disease Type", ["All"] + list(df["disease detected"].cat.categories)
             )
 
-            years = sorted(df["year"].dropna().unique().astype(int))
+            years = sorted(int(year) for year in df["year"].unique() if year != -1)
 
             filter_col = st.columns(2)
 
@@ -113,15 +299,75 @@ def main(theme_colors=None):
             #         if selected_month_name != "All":
             #             selected_month = [k for k, v in month_map.items() if v == selected_month_name][0]
 
-            filtered_df = df.copy()
-            if disease_filter != "All":
-                filtered_df = filtered_df[
-                    filtered_df["disease detected"] == disease_filter
-                ]
-            if selected_year != "All":
-                filtered_df = filtered_df[filtered_df["year"] == int(selected_year)]
-                # if selected_month is not None:
-                #     filtered_df = filtered_df[filtered_df["month"] == selected_month]
+            map_zoom = st.slider(
+                "Map zoom",
+                min_value=1,
+                max_value=18,
+                value=5,
+                help=(
+                    f"Detections are grouped into grid cells sized for this zoom; "
+                    f"from zoom {POINTS_MIN_ZOOM} they are shown individually."
+                ),
+            )
+
+            map_layer = st.radio(
+                "Map layer",
+                ["Markers", "Heatmap"],
+                horizontal=True,
+                help="The heatmap shows detection density and avoids overlapping markers.",
+            )
+
+            show_hotspots = st.toggle(
+                "Outbreak hotspots",
+                help=(
+                    f"Outline clusters of at least {HOTSPOT_MIN_DETECTIONS} detections of one "
+                    f"disease within {HOTSPOT_RADIUS_KM:g} km and {HOTSPOT_WINDOW_DAYS} days."
+                ),
+            )
+
+            near_location = st.toggle("Near location")
+            if near_location:
+                # Start at the middle of the data; 0,0 when nothing has coordinates
+                middle = df[["latitude", "longitude"]].median().fillna(0.0)
+                near_cols = st.columns(2)
+                with near_cols[0]:
+                    near_lat = st.number_input(
+                        "Latitude", -90.0, 90.0, float(middle["latitude"]), format="%.5f"
+                    )
+                with near_cols[1]:
+                    near_lon = st.number_input(
+                        "Longitude", -180.0, 180.0, float(middle["longitude"]), format="%.5f"
+                    )
+                near_cols = st.columns(2)
+                with near_cols[0]:
+                    radius_km = st.number_input("Within (km)", 0.1, 500.0, 5.0, step=1.0)
+                with near_cols[1]:
+                    last_days = st.number_input(
+                        "In the last (days)", 0, 3650, 90, help="0 keeps all dates"
+                    )
+
+                # Whole days, so the window (and the cache key) only moves once a day
+                since = (
+                    pd.Timestamp.today().normalize() - pd.Timedelta(days=last_days)
+                    if last_days
+                    else None
+                )
+                near = (near_lat, near_lon, radius_km, since)
+            else:
+                near = None
+
+            disease_choice = None if disease_filter == "All" else disease_filter
+            year_choice = None if selected_year == "All" else int(selected_year)
+            filter_key = (disease_choice, year_choice, near)
+
+            filtered_df = select_detections(filter_key, data_version, df, selector)
+            if near_location:
+                st.caption(f"{len(filtered_df):,} detection(s) within {radius_km:g} km")
+
+            if show_hotspots:
+                hotspots, hotspot_model = hotspot_table(disease_choice, year_choice, data_version, df)
+            else:
+                hotspots, hotspot_model = None, None
 
         with st.container(border=True):
             st.subheader("📝 Disease Legend")
@@ -141,70 +387,54 @@ def main(theme_colors=None):
     with col1:
         with st.container(border=True):
             if len(filtered_df) > 0:
-                filtered_df["color"] = filtered_df["disease detected"].apply(
-                    lambda x: DISEASE_COLORS.get(x.lower(), "#646464")
-                )
-
-                fig = px.scatter_mapbox(
+                fig, caption = map_figure(
+                    filter_key,
+                    data_version,
+                    map_zoom,
+                    map_layer,
+                    show_hotspots,
                     filtered_df,
-                    lat="display_lat",
-                    lon="display_long",
-                    color="disease detected",
-                    color_discrete_map=DISEASE_COLORS,
-                    hover_name="disease detected",
-                    hover_data=["confidence", "latitude", "longitude"],
-                    zoom=5,
-                    size_max=15,
-                    opacity=0.8,
-                )
-
-                fig.update_layout(
-                    mapbox_style="open-street-map",
-                    margin={"r": 0, "t": 0, "l": 0, "b": 0},
-                    height=600,
-                    legend=dict(
-                        title="Legend",
-                        yanchor="top",
-                        y=0.99,
-                        xanchor="left",
-                        x=0.01,
-                        bgcolor="rgba(255, 255, 255, 0.8)",
-                    ),
+                    hotspots,
+                    hotspot_model,
                 )
+                if caption:
+                    st.caption(caption)
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.warning("No data available for the selected filter.")
 
+        if show_hotspots:
+            with st.container(border=True):
+                st.subheader("🔥 Outbreak Hotspots")
+                if hotspots.empty:
+                    st.info("No hotspots for the selected filter.")
+                else:
+                    st.dataframe(
+                        hotspots.assign(hotspot=hotspots["hotspot"] + 1),
+                        use_container_width=True,
+                        hide_index=True,
+                    )
+                    fig_growth = hotspot_growth_figure(
+                        disease_choice, year_choice, data_version, hotspots, hotspot_model
+                    )
+                    st.plotly_chart(fig_growth, use_container_width=True)
+
         with st.container(border=True):
             st.subheader("📈 Disease Occurrence Over Time")
 
-            if not filtered_df.empty:
-                time_series = (
-                    filtered_df.groupby(
-                        [filtered_df["timestamp"].dt.to_period("M"), "disease detected"]
-                    )
-                    .size()
-                    .reset_index(name="count")
-                )
-                time_series["timestamp"] = time_series["timestamp"].astype(str)
-
-                fig_line = px.line(
-                    time_series,
-                    x="timestamp",
-                    y="count",
-                    color="disease detected",
-                    title="Disease Reports",
-                    markers=True,
-                    color_discrete_map=DISEASE_COLORS,
-                )
-                fig_line.update_layout(
-                    xaxis_title="Date", yaxis_title="Occurrence Count"
-                )
+            grain = st.radio(
+                "Period",
+                [MONTH, WEEK],
+                format_func=lambda g: "Monthly" if g == MONTH else "Weekly",
+                horizontal=True,
+            )
+            fig_line = occurrence_figure(grain, disease_choice, year_choice, data_version, rollups)
+
+            if fig_line is not None:
                 st.plotly_chart(fig_line, use_container_width=True)
             else:
                 st.info("No data available for time-series visualization.")
 
-
 if __name__ == "__main__":
     default_theme = {
         "LIGHT": {
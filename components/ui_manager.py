@@ -19,7 +19,17 @@ from modules.gps_utils import (
     get_location_name,
     save_location_data,
 )
-from modules.detection_runner import check_image_exists, _upload_image_once
+from modules.detection_runner import check_image_exists
+from modules.image_buffer import decode_image
+from modules.archive_ingest import is_archive
+from modules.display_images import show_image
+from modules.memory_utils import format_bytes
+from modules.image_uploader import (
+    DriveUploadPool,
+    format_upload_summary,
+    upload_bytes_for,
+    upload_fingerprint,
+)
 
 from components.ui.instructions import (
     top_bar,
@@ -106,9 +116,10 @@ def render_instructions(
         """,
     ):
         # File uploader with dynamic accept_multiple_files based on batch_mode
+        # Batch mode also takes ZIP archives of photos
         uploaded_files = st.file_uploader(
             "Upload Image(s)",
-            type=["jpg", "jpeg", "png", "bmp", "webp"],
+            type=["jpg", "jpeg", "png", "bmp", "webp"] + (["zip"] if batch_mode else []),
             accept_multiple_files=batch_mode,
             key="instructions_uploader",  # Use a different key than the sidebar uploader
             label_visibility="collapsed",
@@ -192,6 +203,13 @@ def render_results(
                 }}
                 """,
     ):
+        # Images are sent as small encoded variants unless full resolution is asked for
+        full_resolution = st.toggle(
+            "Full resolution",
+            key="show_full_resolution",
+            help="Send the original, full-size images to the browser. Slower on large photos.",
+        )
+
         # Display the images and detection results
         col1, col2 = st.columns(2)
 
@@ -203,8 +221,6 @@ def render_results(
                 if source_img is None:
                     st.info("No image uploaded")
                 else:
-                    uploaded_image = Image.open(source_img)
-
                     if (
                         "last_uploaded_filename" not in st.session_state
                         or st.session_state["last_uploaded_filename"] != source_img.name
@@ -219,11 +235,15 @@ def render_results(
                             st.session_state.saved_to_database = False
                             st.session_state.saved_to_drive = False
 
-                    # Display the original uploaded image in col1
-                    image_placeholder.image(
-                        uploaded_image,
+                    # Display the original uploaded image in col1; the shared
+                    # decoded buffer is only touched on a display cache miss
+                    show_image(
+                        image_placeholder,
+                        f"{current_hash}:original",
+                        lambda: decode_image(source_img),
                         caption="Original Image",
-                        use_container_width=True,
+                        channels="BGR",
+                        full_resolution=full_resolution,
                     )
 
         # Handle detection in col2
@@ -244,10 +264,12 @@ def render_results(
                         cached_data = st.session_state.image_detection_cache[cache_key]
 
                         # Display the cached detection image
-                        col2_placeholder.image(
-                            cached_data["result_image"],
+                        show_image(
+                            col2_placeholder,
+                            f"{cache_key}:result",
+                            lambda: cached_data["result_image"],
                             caption="Detected Image",
-                            use_container_width=True,
+                            full_resolution=full_resolution,
                         )
 
                         # Restore all the detection results from cache
@@ -266,9 +288,13 @@ def render_results(
                         st.session_state["last_result_image"] = cached_data[
                             "result_image"
                         ]
+                        st.session_state["last_result_key"] = cache_key
                         st.session_state["processing_time"] = cached_data.get(
                             "processing_time", 0
                         )
+                        st.session_state["peak_memory"] = cached_data.get(
+                            "peak_memory", 0
+                        )
                         st.session_state.detection_run = True
                         st.session_state.last_model_config = current_model_config.copy()
 
@@ -288,12 +314,18 @@ def render_results(
                                     st.session_state.detection_in_progress = True
                                     st.rerun()  # Rerun to apply new detection
 
+                        # Results without a cache key are shown but not cached
+                        result_key = st.session_state.get("last_result_key")
+                        result_variant_key = f"{result_key}:result" if result_key else None
+
                         # Still show the previous detection result
                         if st.session_state.get("last_result_image") is not None:
-                            col2_placeholder.image(
-                                st.session_state["last_result_image"],
+                            show_image(
+                                col2_placeholder,
+                                result_variant_key,
+                                lambda: st.session_state["last_result_image"],
                                 caption="Detected Image (Previous Configuration)",
-                                use_container_width=True,
+                                full_resolution=full_resolution,
                             )
                         else:
                             # Generate and display detection image if not already done
@@ -301,10 +333,12 @@ def render_results(
                                 st.session_state.get("last_result_image") is not None
                                 and st.session_state.detection_run
                             ):
-                                col2_placeholder.image(
-                                    st.session_state["last_result_image"],
+                                show_image(
+                                    col2_placeholder,
+                                    result_variant_key,
+                                    lambda: st.session_state["last_result_image"],
                                     caption="Detected Image",
-                                    use_container_width=True,
+                                    full_resolution=full_resolution,
                                 )
                             else:
                                 # Show spinner while detection is in progress
@@ -367,6 +401,12 @@ def render_results(
                                             st.session_state["last_result_image"] = (
                                                 results["result_image"]
                                             )
+                                            st.session_state["peak_memory"] = (
+                                                results.get("peak_memory", 0)
+                                            )
+                                            st.session_state["last_result_key"] = (
+                                                cache_key
+                                            )
 
                                             # Cache the detection results with optimization
                                             results["processing_time"] = (
@@ -384,10 +424,12 @@ def render_results(
 
                                             # Display the result image
                                             preview_image = results["result_image"]
-                                            col2_placeholder.image(
-                                                preview_image,
+                                            show_image(
+                                                col2_placeholder,
+                                                f"{cache_key}:result",
+                                                lambda: preview_image,
                                                 caption="Detected Image",
-                                                use_container_width=True,
+                                                full_resolution=full_resolution,
                                             )
                                         else:
                                             st.error(
@@ -535,11 +577,20 @@ def render_results(
                             else:
                                 time_display = f"{processing_time:.2f}s"
 
+                            # Peak image memory used by the detection request
+                            peak_memory = st.session_state.get("peak_memory", 0)
+                            peak_memory_display = (
+                                f'<div style="font-size: 13.5px; color: {text_color}80; margin-top: -5px;">Peak memory: <span style="color: {primary_color}; font-weight: 600;">{format_bytes(peak_memory)}</span></div>'
+                                if peak_memory
+                                else ""
+                            )
+
                             st.markdown(
                                 f"""
                             <div style="width: 150px; padding: 20px; background-color: {secondary_background_color}; border-radius: 10px; text-align: center; margin: 0 auto;">
                                 <div style="font-size: 36px; font-weight: 600; color: {primary_color}; margin: 0; padding: 0;">{time_display}</div>
                                 <div style="font-size: 14px; color: {text_color}80; margin-top: -10px;">Processing Time</div>
+                                {peak_memory_display}
                             </div>
                             """,
                                 unsafe_allow_html=True,
@@ -743,7 +794,9 @@ def render_results(
                             if source_img:
                                 try:
                                     image_exists = check_image_exists(
-                                        drive, PARENT_FOLDER_ID, source_img.name
+                                        drive,
+                                        PARENT_FOLDER_ID,
+                                        upload_fingerprint(source_img),
                                     )
                                 except:
                                     # If check fails, assume it doesn't exist
@@ -782,11 +835,11 @@ def render_results(
                                     disabled=drive_button_disabled,
                                 ):
                                     try:
-                                        uploaded_image = PIL.Image.open(source_img)
-
                                         # Double-check if image exists before uploading
                                         if check_image_exists(
-                                            drive, PARENT_FOLDER_ID, source_img.name
+                                            drive,
+                                            PARENT_FOLDER_ID,
+                                            upload_fingerprint(source_img),
                                         ):
                                             st.warning(
                                                 "⚠️ This image already exists in Google Drive"
@@ -844,29 +897,44 @@ def render_results(
                                                         "Confidence score is too low. Try another image."
                                                     )
                                                 else:
-                                                    # Save to each disease folder
-                                                    success_count = 0
-                                                    for (
-                                                        disease,
-                                                        confidence,
-                                                    ) in (
-                                                        high_confidence_diseases.items()
-                                                    ):
-                                                        # Create a temporary copy of the image for each upload
-                                                        temp_img = uploaded_image.copy()
-                                                        _upload_image_once(
-                                                            temp_img,
-                                                            disease,
-                                                            drive,
-                                                            PARENT_FOLDER_ID,
+                                                    # Encode once; the pool uploads the bytes a single
+                                                    # time and copies them into the other disease folders
+                                                    image_bytes = upload_bytes_for(source_img)
+                                                    upload_progress = st.progress(
+                                                        0.0, "Uploading to Google Drive..."
+                                                    )
+                                                    with DriveUploadPool(
+                                                        drive, PARENT_FOLDER_ID
+                                                    ) as pool:
+                                                        pool.submit(
+                                                            image_bytes,
+                                                            list(high_confidence_diseases),
                                                         )
-                                                        success_count += 1
-
-                                                    st.session_state.saved_to_drive = (
-                                                        True
+                                                        for result in pool.results():
+                                                            upload_progress.progress(
+                                                                pool.done / pool.total,
+                                                                result["message"],
+                                                            )
+                                                        summary = pool.summary()
+
+                                                    success_count = (
+                                                        summary["uploaded"]
+                                                        + summary["copied"]
+                                                        + summary["skipped"]
                                                     )
-                                                    st.success(
-                                                        f"✅ Image uploaded to {success_count} disease folders in Google Drive!"
+                                                    if summary["failed"]:
+                                                        st.error(
+                                                            f"❌ Drive upload failed for {summary['failed']} disease folder(s)"
+                                                        )
+                                                    if success_count:
+                                                        st.session_state.saved_to_drive = (
+                                                            True
+                                                        )
+                                                        st.success(
+                                                            f"✅ Image uploaded to {success_count} disease folders in Google Drive!"
+                                                        )
+                                                    st.caption(
+                                                        format_upload_summary(summary)
                                                     )
                                     except Exception as e:
                                         st.error(f"Error uploading to Drive: {e}")
@@ -1098,6 +1166,22 @@ def manage_ui_state(theme_colors):
             st.session_state["uploaded_files"] = new_uploaded_files
             st.rerun()  # Rerun to show results UI
     else:
+        if batch_mode and isinstance(uploaded_files, list):
+            # Archives are only processed in bulk; the viewer pages through plain images
+            archives = [f for f in uploaded_files if is_archive(f)]
+            if archives:
+                st.info(
+                    f"📦 {len(archives)} ZIP archive(s) attached. Their photos are included when "
+                    "the batch is processed as a whole (**Detect & save all now** or **in background** "
+                    "in the sidebar) but are not previewed here.",
+                )
+                uploaded_files = [f for f in uploaded_files if not is_archive(f)]
+                if not uploaded_files:
+                    if st.button("Upload different files"):
+                        st.session_state["uploaded_files"] = None
+                        st.rerun()
+                    return
+
         # Initialize source_img before pagination
         source_img = None
         if uploaded_files:
@@ -0,0 +1,256 @@
+"""Headless ingest of a directory (or SD-card dump) of field photos.
+
+Runs the same detection and saving as the app, without the Streamlit UI:
+
+    python ingest.py /media/sdcard/DCIM --model Disease --disease-mode Ensemble
+
+Images flow through a streaming pipeline (enumerate -> hash -> EXIF ->
+decode -> infer -> persist) connected by bounded queues. Every finished
+image is appended to a checkpoint file, so an interrupted run picks up
+where it stopped when started again.
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from modules.detection_runner import SKIP_LABELS, detect_with_confidence
+from modules.detection_utils import load_models
+from modules.database import save_detection_to_database
+from modules.gps_utils import get_gps_location, get_image_taken_time
+from modules.image_buffer import decode_bytes
+from modules.pipeline import Failed, Stage, StagedPipeline
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Checkpoints live here unless --checkpoint is given
+CHECKPOINT_DIR = Path("data/ingest")
+
+# Minimum confidence (percent) for a detection to be saved, as in the app
+SAVE_THRESHOLD = 60
+
+# Status of a hit a --dry-run would have saved; nothing reached the database
+DRY_RUN_SAVED = "saved (dry run)"
+
+
+def enumerate_images(root):
+    """Yield image paths under `root` in a stable order, recursing into subfolders."""
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if Path(name).suffix.lower() in IMAGE_EXTENSIONS and not name.startswith("."):
+                yield Path(directory) / name
+
+
+def file_signature(path):
+    stat = path.stat()
+    return f"{path.resolve()}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+class Checkpoint:
+    """Append-only JSONL log of finished images, keyed by content hash and file signature.
+
+    Images between `claim` and `record` are in flight, so a copy of the
+    same photo found meanwhile is not ingested twice. Dry-run hits only
+    count as done for another dry run, so a real run still saves them.
+    """
+
+    def __init__(self, path, dry_run=False):
+        self.path = Path(path)
+        self.dry_run = dry_run
+        self.hashes = set()
+        self.signatures = set()
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by an interrupted run
+                    if self._is_done(entry.get("status")):
+                        self.hashes.add(entry["hash"])
+                        self.signatures.add(entry["signature"])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a")
+
+    def _is_done(self, status):
+        return status != "failed" and (self.dry_run or status != DRY_RUN_SAVED)
+
+    def claim(self, file_hash):
+        """Mark an image as in flight; False if it is done or already in flight."""
+        with self._lock:
+            if file_hash in self.hashes or file_hash in self._in_flight:
+                return False
+            self._in_flight.add(file_hash)
+            return True
+
+    def record(self, item, status, **extra):
+        entry = {
+            "hash": item["hash"],
+            "signature": item["signature"],
+            "path": str(item["path"]),
+            "status": status,
+            **extra,
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        with self._lock:
+            if self._is_done(status):
+                self.hashes.add(item["hash"])
+                self.signatures.add(item["signature"])
+            # A failed image may be retried from another copy
+            self._in_flight.discard(item["hash"])
+
+    def close(self):
+        self._file.close()
+
+
+def default_checkpoint_path(root, dry_run=False):
+    key = hashlib.md5(str(Path(root).resolve()).encode()).hexdigest()[:12]
+    return CHECKPOINT_DIR / f"{key}{'.dry-run' if dry_run else ''}.jsonl"
+
+
+def build_pipeline(args, checkpoint, models):
+    model, model_leaf, model_disease = models
+
+    def hash_stage(path):
+        signature = file_signature(path)
+        if signature in checkpoint.signatures:
+            return None  # unchanged file from an earlier run
+        data = path.read_bytes()
+        file_hash = hashlib.md5(data).hexdigest()
+        if not checkpoint.claim(file_hash):
+            return None  # same photo already ingested (e.g. copied twice)
+        return {"path": path, "signature": signature, "hash": file_hash, "data": data}
+
+    def exif_stage(item):
+        # Parsed from the bytes already read; the file is not opened again
+        source = io.BytesIO(item["data"])
+        source.name = str(item["path"])
+        item["gps"] = get_gps_location(source)
+        item["date_taken"] = get_image_taken_time(source)
+        return item
+
+    def decode_stage(item):
+        item["image"] = decode_bytes(item.pop("data"))
+        return item
+
+    def infer_stage(item):
+        item["detections"] = detect_with_confidence(
+            item.pop("image"),
+            args.model,
+            model,
+            model_leaf,
+            model_disease,
+            args.confidence,
+            args.overlap,
+        )
+        return item
+
+    def persist_stage(item):
+        item["label"], item["score"], item["status"] = None, 0, "no_detection"
+        if item["detections"]:
+            name, score = max(item["detections"], key=lambda d: d[1])
+            item["label"], item["score"] = name, score
+            if score < SAVE_THRESHOLD or name.lower() in SKIP_LABELS:
+                item["status"] = "skipped"
+            elif args.dry_run:
+                item["status"] = DRY_RUN_SAVED
+            else:
+                save_detection_to_database(name, score, item["gps"], item["date_taken"])
+                item["status"] = "saved"
+        return item
+
+    return StagedPipeline(
+        [
+            Stage("hash", hash_stage, workers=args.io_workers),
+            Stage("exif", exif_stage, workers=args.io_workers),
+            Stage("decode", decode_stage, workers=args.decode_workers),
+            # A single inference worker: the model is not shared across threads
+            Stage("infer", infer_stage, workers=1),
+            Stage("persist", persist_stage, workers=args.io_workers),
+        ],
+        queue_size=args.queue_size,
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory", help="Folder of field photos (searched recursively)")
+    parser.add_argument(
+        "--model", default="Disease", choices=["Disease", "Leaf", "Both Models"]
+    )
+    parser.add_argument(
+        "--disease-mode",
+        default="Ensemble",
+        choices=[
+            "Ensemble",
+            "YOLO11 - Precised Spots Detection",
+            "YOLO12n - Lightweight Model",
+        ],
+    )
+    parser.add_argument("--confidence", type=float, default=0.6)
+    parser.add_argument("--overlap", type=float, default=0.3)
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: data/ingest/<dir hash>[.dry-run].jsonl)")
+    parser.add_argument("--io-workers", type=int, default=4)
+    parser.add_argument("--decode-workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="Detect but don't write to the database")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not Path(args.directory).is_dir():
+        print(f"Not a directory: {args.directory}", file=sys.stderr)
+        return 2
+
+    checkpoint = Checkpoint(
+        args.checkpoint or default_checkpoint_path(args.directory, args.dry_run),
+        dry_run=args.dry_run,
+    )
+    print(f"Checkpoint: {checkpoint.path} ({len(checkpoint.hashes)} already done)")
+
+    started = time.perf_counter()
+    models = load_models(args.model, args.disease_mode)
+    print(f"Models loaded in {time.perf_counter() - started:.1f}s")
+
+    pipeline = build_pipeline(args, checkpoint, models)
+    counts = {}
+    try:
+        for result in pipeline.run(enumerate_images(args.directory)):
+            if isinstance(result, Failed):
+                item = result.item
+                path = item["path"] if isinstance(item, dict) else item
+                print(f"{'failed':<16}{path}: [{result.stage}] {result.error}")
+                if isinstance(item, dict):
+                    checkpoint.record(item, "failed", error=str(result.error))
+                counts["failed"] = counts.get("failed", 0) + 1
+                continue
+
+            checkpoint.record(result, result["status"], label=result["label"], score=result["score"])
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            label = f" ({result['label']}, {result['score']}%)" if result["label"] else ""
+            print(f"{result['status']:<16}{result['path']}{label}")
+    except KeyboardInterrupt:
+        pipeline.cancel()
+        print("Interrupted; run again to resume from the checkpoint.")
+    finally:
+        checkpoint.close()
+
+    print()
+    print(pipeline.report())
+    print("  " + ", ".join(f"{status}: {n}" for status, n in sorted(counts.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import hashlib
+import io
+import threading
+import zipfile
+from pathlib import PurePosixPath
+
+from modules.batch_dedup import dhash_bits
+from modules.batch_manifest import content_hash
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def is_archive(file):
+    """True for uploads (or paths) that are ZIP archives, judged by name."""
+    name = getattr(file, "name", str(file))
+    return name.lower().endswith(".zip")
+
+
+def _is_image_member(info):
+    path = PurePosixPath(info.filename)
+    if info.is_dir() or path.suffix.lower() not in IMAGE_EXTENSIONS:
+        return False
+    # macOS resource forks and hidden files ride along in many exported archives
+    return not any(part.startswith(".") or part == "__MACOSX" for part in path.parts)
+
+
+class _ArchiveReader:
+    """Reads the members of one archive through a single ZipFile, opened on first use.
+
+    Read workers share it (and `source`'s file position), so reads are
+    serialized. It closes once each of its `members` has been read; if
+    some never are (cancelled, or a duplicate that is only reported), the
+    ZipFile closes when the reader is garbage collected.
+    """
+
+    def __init__(self, source, members):
+        self.source = source
+        self._remaining = members
+        self._archive = None
+        self._lock = threading.Lock()
+
+    def read(self, info):
+        with self._lock:
+            if self._archive is None:
+                if hasattr(self.source, "seek"):
+                    self.source.seek(0)
+                self._archive = zipfile.ZipFile(self.source)
+            try:
+                return self._archive.read(info)
+            finally:
+                self._remaining -= 1
+                if self._remaining <= 0:
+                    self._archive.close()
+                    self._archive = None
+
+
+def _member_opener(reader, info, name):
+    def open_member():
+        file = io.BytesIO(reader.read(info))
+        file.name = name
+        return file
+
+    return open_member
+
+
+def _member_fingerprints(archive, info, near_duplicates):
+    """md5 and, if asked for, difference hash of a member from a single decompression."""
+    data = archive.read(info)
+    bits = None
+    if near_duplicates:
+        try:
+            bits = dhash_bits(io.BytesIO(data))
+        except Exception:
+            pass  # unreadable here; the read stage reports the real error
+    return hashlib.md5(data).hexdigest(), bits
+
+
+def archive_items(source, max_members, max_member_bytes, name=None, near_duplicates=False):
+    """Batch items for the images inside a ZIP archive, without extracting it.
+
+    `source` is an uploaded file or a path. Each member is decompressed
+    once here for its content hash and, with `near_duplicates`, its
+    difference hash ("dhash", see batch_dedup), then dropped; the item's
+    "open" callable decompresses it again only when the pipeline's read
+    stage needs the pixels, through one ZipFile shared by the archive's
+    members. Returns (items, notes), where notes describe anything skipped.
+    """
+    name = name or getattr(source, "name", str(source))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    with zipfile.ZipFile(source) as archive:
+        return _archive_items(archive, source, max_members, max_member_bytes, name, near_duplicates)
+
+
+def _archive_items(archive, source, max_members, max_member_bytes, name, near_duplicates):
+    notes = []
+    infos = archive.infolist()
+    images = [info for info in infos if _is_image_member(info)]
+    if len(images) < len(infos):
+        skipped = sum(1 for info in infos if not info.is_dir()) - len(images)
+        if skipped:
+            notes.append(f"{name}: skipped {skipped} non-image or hidden file(s)")
+
+    oversized = [info for info in images if info.file_size > max_member_bytes]
+    if oversized:
+        notes.append(
+            f"{name}: skipped {len(oversized)} image(s) larger than "
+            f"{max_member_bytes // (1024 * 1024)} MB"
+        )
+        images = [info for info in images if info.file_size <= max_member_bytes]
+
+    if len(images) > max_members:
+        notes.append(f"{name}: only the first {max_members} of {len(images)} images are processed")
+        images = images[:max_members]
+
+    items = []
+    reader = _ArchiveReader(source, len(images))
+    for info in images:
+        member_name = f"{name}/{info.filename}"
+        file_hash, bits = _member_fingerprints(archive, info, near_duplicates)
+        item = {
+            "name": member_name,
+            "hash": file_hash,
+            "open": _member_opener(reader, info, member_name),
+        }
+        if near_duplicates:
+            item["dhash"] = bits
+        items.append(item)
+    return items, notes
+
+
+def expand_uploads(files, settings):
+    """Turn a batch upload (images and ZIP archives) into pipeline items.
+
+    Plain images become {"name", "hash", "file"} items; archives are
+    expanded member by member (see archive_items), with
+    settings.BATCH_MAX_ARCHIVE_MEMBERS images allowed per batch across all
+    archives. Returns (items, notes).
+    """
+    items, notes = [], []
+    budget = settings.BATCH_MAX_ARCHIVE_MEMBERS
+    for file in files:
+        if not is_archive(file):
+            items.append({"name": file.name, "hash": content_hash(file), "file": file})
+            continue
+        try:
+            members, archive_notes = archive_items(
+                file,
+                budget,
+                settings.BATCH_MAX_ARCHIVE_MEMBER_MB * 1024 * 1024,
+                near_duplicates=settings.BATCH_NEAR_DUPLICATE_BITS is not None,
+            )
+        except zipfile.BadZipFile:
+            notes.append(f"{file.name}: not a valid ZIP archive")
+            continue
+        items.extend(members)
+        notes.extend(archive_notes)
+        budget -= len(members)
+    return items, notes
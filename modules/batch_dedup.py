@@ -0,0 +1,91 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Duplicate policies: save one row per group of duplicates, or one per file
+SAVE_ONCE = "save_once"
+SAVE_EACH = "save_each"
+
+# Side of the grayscale thumbnail a difference hash is taken from (HASH_SIZE + 1 wide)
+HASH_SIZE = 8
+
+
+def dhash_bits(source_img):
+    """64-bit difference hash of an image, as a bool array.
+
+    Each bit says whether a pixel of a tiny grayscale thumbnail is brighter
+    than its right-hand neighbour, so resized or re-compressed copies of a
+    photo hash (almost) the same. JPEGs are decoded at reduced size via
+    draft mode, which keeps this far cheaper than a full decode.
+    """
+    source_img.seek(0)
+    with Image.open(source_img) as img:
+        img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        thumb = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BILINEAR)
+        pixels = np.asarray(thumb, dtype=np.int16)
+    source_img.seek(0)
+    return (pixels[:, 1:] > pixels[:, :-1]).ravel()
+
+
+def _fingerprint(item):
+    if "dhash" in item:
+        return item["dhash"]  # taken while the archive member was hashed
+    file = item["file"] if "file" in item else item["open"]()
+    try:
+        return dhash_bits(file)
+    except Exception:
+        return None  # unreadable here; the read stage reports the real error
+
+
+def group_duplicates(items, max_distance, workers=2):
+    """Collapse exact and near-duplicate batch items into groups.
+
+    Exact copies share a content hash. Near duplicates are items whose
+    difference hashes differ in at most `max_distance` bits (None disables
+    them); fingerprints are computed on `workers` threads. Each item
+    joins the closest earlier representative within range, so groups
+    never chain through a series of small differences.
+
+    Returns the representatives in upload order, each with its duplicates
+    listed under "duplicates" and "duplicate_of" set on every duplicate.
+    """
+    by_hash = {}
+    unique = []
+    for item in items:
+        first = by_hash.setdefault(item["hash"], item)
+        if first is item:
+            unique.append(item)
+        else:
+            first.setdefault("duplicates", []).append(item)
+            item["duplicate_of"] = first["name"]
+
+    if max_distance is None or len(unique) < 2:
+        return unique
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fingerprints = list(pool.map(_fingerprint, unique))
+
+    representatives = []
+    # Representatives that could be fingerprinted, and their bits row for row
+    hashed = []
+    hashed_bits = np.zeros((len(unique), HASH_SIZE * HASH_SIZE), dtype=bool)
+    for item, bits in zip(unique, fingerprints):
+        if bits is None:
+            representatives.append(item)
+            continue
+        if hashed:
+            distances = np.count_nonzero(hashed_bits[: len(hashed)] != bits, axis=1)
+            match = int(np.argmin(distances))
+            if distances[match] <= max_distance:
+                rep = hashed[match]
+                near = [item] + item.pop("duplicates", [])
+                for dup in near:
+                    dup["duplicate_of"] = rep["name"]
+                rep.setdefault("duplicates", []).extend(near)
+                continue
+        hashed_bits[len(hashed)] = bits
+        hashed.append(item)
+        representatives.append(item)
+
+    return representatives
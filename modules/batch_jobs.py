@@ -0,0 +1,223 @@
+import io
+import json
+import time
+import zipfile
+
+from components.config import settings
+from modules.archive_ingest import archive_items, is_archive
+from modules.batch_manifest import BatchManifest, content_hash
+from modules.batch_dedup import group_duplicates
+from modules.batch_progress import UPDATE_INTERVAL
+from modules.batch_processing import build_batch_pipeline, failed_files, record_outcomes
+from modules.detection_utils import load_models
+from modules.image_uploader import DriveUploadPool, authenticate_drive
+from modules.job_queue import JobCancelled, JobQueue, new_job_id, start_job_workers
+from modules.memory_utils import MemoryBudget
+from modules.pipeline import Failed
+
+BATCH_JOB_KIND = "batch_detection"
+
+# Seconds between cancellation checks while no image finishes
+CANCEL_POLL_INTERVAL = 1.0
+
+# Seconds a cancelled job waits for in-flight images before giving up on them
+CANCEL_GRACE = 30.0
+
+
+def submit_batch_job(uploaded_images, model_config, save_to_drive, parent_folder_id, queue=None):
+    """Copy the uploads to disk and queue them as one background detection job.
+
+    The job keeps running after the browser session ends; poll it by id
+    with `JobQueue.get` / `JobQueue.results`.
+    """
+    queue = queue or JobQueue()
+    job_id = new_job_id()
+    folder = queue.input_dir(job_id)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    files = []
+    for index, file in enumerate(uploaded_images):
+        stored = f"{index:05d}_{file.name}"
+        (folder / stored).write_bytes(file.getvalue())
+        files.append({"name": file.name, "stored": stored, "hash": content_hash(file)})
+
+    params = {
+        "model_config": model_config,
+        "save_to_drive": bool(save_to_drive),
+        "parent_folder_id": parent_folder_id,
+        "files": files,
+    }
+    return queue.submit(BATCH_JOB_KIND, params, total=len(files), job_id=job_id)
+
+
+def _opener(path, name):
+    def open_image():
+        file = io.BytesIO(path.read_bytes())
+        file.name = name
+        return file
+
+    return open_image
+
+
+def _job_items(folder, files):
+    """Pipeline items for a job's stored inputs; archives are streamed member by member.
+
+    Returns (items, notes) like expand_uploads: a corrupt archive becomes a
+    note rather than failing the job.
+    """
+    items, notes = [], []
+    members_left = settings.BATCH_MAX_ARCHIVE_MEMBERS
+    for f in files:
+        path = folder / f["stored"]
+        if is_archive(f["name"]):
+            try:
+                members, archive_notes = archive_items(
+                    path,
+                    members_left,
+                    settings.BATCH_MAX_ARCHIVE_MEMBER_MB * 1024 * 1024,
+                    name=f["name"],
+                    near_duplicates=settings.BATCH_NEAR_DUPLICATE_BITS is not None,
+                )
+            except zipfile.BadZipFile:
+                notes.append(f"{f['name']}: not a valid ZIP archive")
+                continue
+            items.extend(members)
+            notes.extend(archive_notes)
+            members_left -= len(members)
+        else:
+            items.append({"open": _opener(path, f["name"]), "name": f["name"], "hash": f["hash"]})
+    return items, notes
+
+
+def run_batch_job(job, queue):
+    """Job handler: detect and save every image of a submitted batch.
+
+    Runs the same pipeline and manifest as interactive batch mode, so a
+    job interrupted by a restart resumes where it stopped.
+    """
+    params = job["params"]
+    config = params["model_config"]
+    items, notes = _job_items(queue.input_dir(job["id"]), params["files"])
+    names = {item["hash"]: item["name"] for item in items}
+
+    manifest = BatchManifest.for_hashes(
+        list(names), {**config, "save_to_drive": bool(params["save_to_drive"])}
+    )
+    pending = [item for item in items if not manifest.is_done(item["hash"])]
+    already_done = len(items) - len(pending)
+    queue.update_progress(job["id"], already_done, len(items), "Loading models")
+
+    budget = MemoryBudget(
+        settings.BATCH_MEMORY_BUDGET_MB * 1024 * 1024,
+        max_items=settings.BATCH_MAX_IN_FLIGHT,
+    )
+    upload_pool = None
+    pipeline = None
+    cancelled_at = None
+
+    def record_upload(upload):
+        if upload["status"] == "failed" and upload["key"]:
+            manifest.record_upload_failed(upload["key"], names.get(upload["key"]), upload["message"])
+            queue.add_result(job["id"], names.get(upload["key"]), "failed", error=upload["message"])
+
+    try:
+        models = load_models(config["detection_model_choice"], config["disease_model_mode"])
+        drive = authenticate_drive() if params["save_to_drive"] else None
+        if drive is not None:
+            upload_pool = DriveUploadPool(
+                drive,
+                params["parent_folder_id"],
+                max_queued_bytes=settings.BATCH_UPLOAD_BUDGET_MB * 1024 * 1024,
+            )
+
+        pipeline = build_batch_pipeline(
+            models,
+            config["detection_model_choice"],
+            config["confidence"],
+            config["overlap_threshold"],
+            params["save_to_drive"],
+            drive,
+            params["parent_folder_id"],
+            budget,
+            upload_pool,
+            manifest,
+            settings,
+        )
+
+        groups = group_duplicates(
+            pending, settings.BATCH_NEAR_DUPLICATE_BITS, workers=settings.BATCH_READ_WORKERS
+        )
+        finished = 0
+        last_update = 0.0
+        for result in pipeline.run(groups, poll_interval=CANCEL_POLL_INTERVAL):
+            if cancelled_at is None and queue.is_cancel_requested(job["id"]):
+                cancelled_at = time.monotonic()
+                pipeline.cancel()
+                # Wake stages waiting for memory or upload room so they can drain
+                budget.close()
+                if upload_pool is not None:
+                    upload_pool.cancel()
+            if cancelled_at is not None and time.monotonic() - cancelled_at > CANCEL_GRACE:
+                break  # stages still stuck; their daemon threads are abandoned
+            if result is None:
+                continue
+
+            if isinstance(result, Failed):
+                for item in failed_files(result):
+                    manifest.record(item["hash"], item["name"], "failed", error=str(result.error))
+                    queue.add_result(job["id"], item["name"], "failed", error=str(result.error))
+                    finished += 1
+            else:
+                for outcome in record_outcomes(manifest, result):
+                    queue.add_result(
+                        job["id"], outcome["name"], outcome["status"],
+                        label=outcome["label"], score=outcome["score"],
+                        duplicate_of=outcome["duplicate_of"],
+                    )
+                    finished += 1
+
+            if upload_pool is not None:
+                for upload in upload_pool.poll():
+                    record_upload(upload)
+
+            # Throttled like BatchProgress: one progress write per interval, not per image
+            now = time.monotonic()
+            if now - last_update >= UPDATE_INTERVAL:
+                last_update = now
+                queue.update_progress(
+                    job["id"], already_done + finished, message=f"Processed {_result_name(result)}"
+                )
+        queue.update_progress(job["id"], already_done + finished)
+
+        if cancelled_at is not None:
+            raise JobCancelled()
+
+        if upload_pool is not None:
+            queue.update_progress(job["id"], already_done + len(pending), message="Finishing Drive uploads")
+            for upload in upload_pool.results():
+                record_upload(upload)
+            upload_pool.close()
+    finally:
+        if pipeline is not None:
+            pipeline.cancel()
+        budget.close()
+        if upload_pool is not None:
+            upload_pool.cancel()
+            upload_pool.close(wait=False)
+        manifest.close()
+
+    counts = manifest.counts()
+    summary = {"counts": counts, "notes": notes, "report": pipeline.report()}
+    if upload_pool is not None:
+        summary["uploads"] = upload_pool.summary()
+    return json.loads(json.dumps(summary, default=str))
+
+
+def _result_name(result):
+    item = result.item if isinstance(result, Failed) else result
+    return item.get("name", "")
+
+
+def start_batch_workers():
+    """Start the per-process worker that runs queued batch jobs."""
+    start_job_workers({BATCH_JOB_KIND: run_batch_job})
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+# Per-image batch status, shared by every batch run and keyed by content hash
+# and run configuration
+MANIFEST_DIR = Path("data/batches")
+MANIFEST_DB = MANIFEST_DIR / "manifest.sqlite3"
+
+# Images untouched for this long are forgotten when a new batch starts
+MANIFEST_MAX_AGE = 30 * 24 * 60 * 60
+
+# Final statuses; anything else (failed, or interrupted while persisting) is retried
+DONE_STATUSES = {"saved", "skipped", "no_detection", "duplicate"}
+
+# Written just before an image's results are persisted, so a run that dies
+# mid-write leaves the image marked as unfinished
+PERSISTING = "persisting"
+
+# Upload state, kept apart from the status: a Drive upload finishes on its
+# own thread, in any order relative to the status writes
+UPLOAD_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    hash TEXT NOT NULL,
+    config TEXT NOT NULL,
+    name TEXT,
+    status TEXT NOT NULL,
+    upload TEXT,
+    upload_error TEXT,
+    detail TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (hash, config)
+);
+CREATE INDEX IF NOT EXISTS images_updated ON images (updated);
+"""
+
+
+def content_hash(source_img):
+    """md5 of an uploaded file's bytes, the key images are tracked under."""
+    return hashlib.md5(source_img.getvalue()).hexdigest()
+
+
+def config_key(config):
+    """Short fingerprint of a run's settings (models, thresholds, Drive saving)."""
+    if not config:
+        return ""
+    return hashlib.md5(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class BatchManifest:
+    """Per-image batch status in a local SQLite database.
+
+    Rows are keyed by each image's content hash and the run's `config`
+    (see config_key), so an image finished in one batch is skipped by any
+    later batch with the same settings that contains it, whatever else was
+    uploaded with it; changing the model, a threshold or Drive saving
+    processes it again. A manifest tracks the images of one batch:
+    those loaded by `for_hashes` plus any recorded since. Each write is
+    committed straight away, so it survives the process dying.
+    """
+
+    def __init__(self, path=MANIFEST_DB, config=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.config = config_key(config)
+        self.entries = {}
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(images)")}
+            if columns and "config" not in columns:
+                # Rows from before configs were tracked can't say what they were run with
+                conn.execute("DROP TABLE images")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @classmethod
+    def for_hashes(cls, hashes, config=None, path=MANIFEST_DB, max_age=MANIFEST_MAX_AGE):
+        """Open the manifest with what earlier runs with `config` recorded for these images."""
+        manifest = cls(path, config)
+        manifest.prune(max_age)
+        manifest.load(hashes)
+        return manifest
+
+    def prune(self, max_age=MANIFEST_MAX_AGE):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM images WHERE updated < ?", (time.time() - max_age,))
+
+    def load(self, hashes):
+        hashes = list(dict.fromkeys(hashes))
+        rows = []
+        with closing(self._connect()) as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start : start + 500]
+                rows += conn.execute(
+                    f"SELECT * FROM images WHERE config = ? "
+                    f"AND hash IN ({','.join('?' * len(chunk))})",
+                    [self.config, *chunk],
+                ).fetchall()
+        with self._lock:
+            for row in rows:
+                self.entries[row["hash"]] = _entry_from_row(row)
+
+    def status(self, file_hash):
+        entry = self.entries.get(file_hash)
+        return entry["status"] if entry else None
+
+    def is_done(self, file_hash):
+        entry = self.entries.get(file_hash)
+        return bool(entry) and entry["status"] in DONE_STATUSES and entry["upload"] != UPLOAD_FAILED
+
+    def was_attempted(self, file_hash):
+        """True when an earlier run got as far as this image, so it may already be in the sheet."""
+        return file_hash in self.entries
+
+    def record(self, file_hash, name, status, **extra):
+        """Set an image's status; starting to persist it also clears its upload state."""
+        now = time.time()
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO images (hash, config, name, status, detail, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (hash, config) DO UPDATE SET name = excluded.name, "
+                "status = excluded.status, detail = excluded.detail, updated = excluded.updated, "
+                "upload = CASE WHEN excluded.status = ? THEN NULL ELSE upload END, "
+                "upload_error = CASE WHEN excluded.status = ? THEN NULL ELSE upload_error END",
+                (file_hash, self.config, name, status, json.dumps(extra), now, PERSISTING, PERSISTING),
+            )
+            self.entries[file_hash] = self._fetch(conn, file_hash)
+
+    def record_upload_failed(self, file_hash, name, error):
+        """Mark an image's Drive upload as failed, so the next run retries the image."""
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO images (hash, config, name, status, upload, upload_error, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (hash, config) DO UPDATE SET upload = excluded.upload, "
+                "upload_error = excluded.upload_error, updated = excluded.updated",
+                (file_hash, self.config, name, PERSISTING, UPLOAD_FAILED, error, time.time()),
+            )
+            self.entries[file_hash] = self._fetch(conn, file_hash)
+
+    def _fetch(self, conn, file_hash):
+        row = conn.execute(
+            "SELECT * FROM images WHERE hash = ? AND config = ?", (file_hash, self.config)
+        ).fetchone()
+        return _entry_from_row(row)
+
+    def counts(self):
+        """Images of this batch per status; a failed upload counts as failed."""
+        totals = {}
+        for entry in self.entries.values():
+            status = "failed" if entry["upload"] == UPLOAD_FAILED else entry["status"]
+            totals[status] = totals.get(status, 0) + 1
+        return totals
+
+    def close(self):
+        """Nothing is held open between writes; kept so callers can close uniformly."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _entry_from_row(row):
+    return {
+        "hash": row["hash"],
+        "name": row["name"],
+        "status": row["status"],
+        "upload": row["upload"],
+        "upload_error": row["upload_error"],
+        "time": row["updated"],
+        **json.loads(row["detail"] or "{}"),
+    }
@@ -1,63 +1,346 @@
 import streamlit as st
-from pathlib import Path
-import PIL
 from modules.gps_utils import get_gps_location
-from modules.detection_runner import detect_and_save_silently
+from modules.detection_runner import detect_best_disease, save_best_disease
 from modules.detection_utils import load_models
+from modules.image_buffer import decode_upload, estimate_decoded_bytes
+from modules.image_uploader import DriveUploadPool, format_upload_summary
+from modules.archive_ingest import expand_uploads
+from modules.batch_dedup import SAVE_EACH, group_duplicates
+from modules.batch_manifest import PERSISTING, BatchManifest
+from modules.batch_progress import BatchProgress
+from modules.memory_utils import MemoryBudget, RssSampler, format_bytes
+from modules.pipeline import Failed, Stage, StagedPipeline
 
-def process_all_images(uploaded_images, detection_model_choice, disease_model_mode, confidence, overlap_threshold, save_to_drive, drive, PARENT_FOLDER_ID, cdisease_colors, cleaf_colors, settings):
-    """Process all uploaded images in batch mode."""
+
+def build_batch_pipeline(
+    models,
+    detection_model_choice,
+    confidence,
+    overlap_threshold,
+    save_to_drive,
+    drive,
+    PARENT_FOLDER_ID,
+    budget,
+    upload_pool,
+    manifest,
+    settings,
+):
+    """Decode/EXIF, inference and persistence stages for one batch run.
+
+    Items are {"name", "hash", "file"} dicts; an item may carry an "open"
+    callable instead of "file", to load its bytes only when it reaches the
+    read stage (ZIP members, background jobs). Decoding and EXIF run on a small
+    thread pool, inference on a single worker that owns the models, and
+    Sheets/Drive persistence on an I/O pool. An item grouped with
+    duplicates (see modules/batch_dedup) is inferred once; its duplicates
+    are saved too under settings.BATCH_DUPLICATE_POLICY == SAVE_EACH, and
+    only reported otherwise. Stages run in worker threads
+    and must not call Streamlit; the caller reports results from the main
+    thread as they come out.
+    """
+    model, model_leaf, model_disease = models
+    duplicate_policy = settings.BATCH_DUPLICATE_POLICY
+
+    def read_stage(item):
+        if "file" not in item:
+            item["file"] = item.pop("open")()
+        file = item["file"]
+        # Held until inference has finished with the pixels
+        held = budget.acquire(estimate_decoded_bytes(file))
+        try:
+            item["gps"] = get_gps_location(file)
+            item["image"] = decode_upload(file)
+            item["held"] = held
+            return item
+        except Exception:
+            budget.release(held)
+            raise
+
+    def infer_stage(item):
+        try:
+            item["best"] = detect_best_disease(
+                item["image"],
+                detection_model_choice,
+                model,
+                model_disease,
+                confidence,
+                overlap_threshold,
+            )
+        finally:
+            # Release the pixel buffer before persistence waits on the network
+            item["image"] = None
+            budget.release(item.pop("held"))
+        return item
+
+    def save(item, file, gps, check_existing):
+        return save_best_disease(
+            item["best"],
+            file,
+            gps,
+            save_to_drive,
+            drive,
+            PARENT_FOLDER_ID,
+            upload_pool=upload_pool,
+            image_hash=item["hash"],
+            check_existing=check_existing,
+        )
+
+    def persist_stage(item):
+        duplicates = item.get("duplicates", [])
+        # A retried image (failed upload, interrupted write) may already have
+        # its row in the sheet; only those pay for the lookup
+        attempted = {
+            entry["hash"]: manifest.was_attempted(entry["hash"]) for entry in [item, *duplicates]
+        }
+        manifest.record(item["hash"], item["name"], PERSISTING)
+        item["label"], item["score"] = save(item, item["file"], item["gps"], attempted[item["hash"]])
+
+        # Duplicates reuse the representative's inference
+        for dup in duplicates:
+            if duplicate_policy != SAVE_EACH:
+                dup["label"], dup["score"] = item["label"], item["score"]
+                dup["status"] = "duplicate"
+                continue
+            file = dup["file"] if "file" in dup else dup.pop("open")()
+            dup["best"] = item["best"]
+            if dup["hash"] != item["hash"]:
+                manifest.record(dup["hash"], dup["name"], PERSISTING)
+            dup["label"], dup["score"] = save(dup, file, get_gps_location(file), attempted[dup["hash"]])
+        return item
+
+    return StagedPipeline(
+        [
+            Stage("read", read_stage, workers=settings.BATCH_READ_WORKERS),
+            # A single inference worker: the models are not shared across threads
+            Stage("infer", infer_stage, workers=1),
+            Stage("persist", persist_stage, workers=settings.BATCH_IO_WORKERS),
+        ],
+        queue_size=settings.BATCH_QUEUE_SIZE,
+    )
+
+
+def manifest_status(label):
+    """Manifest status for a save_best_disease label."""
+    if label == "No Detection":
+        return "no_detection"
+    if label.startswith("Skipped"):
+        return "skipped"
+    return "saved"
+
+
+def record_outcomes(manifest, result):
+    """Record a finished item and its duplicates in the manifest.
+
+    Returns one outcome dict per file (name, hash, status, label, score,
+    duplicate_of), the representative first.
+    """
+    outcomes = []
+    for entry in [result, *result.get("duplicates", [])]:
+        status = entry.get("status") or manifest_status(entry["label"])
+        outcome = {
+            "name": entry["name"],
+            "hash": entry["hash"],
+            "status": status,
+            "label": entry["label"],
+            "score": entry["score"],
+            "duplicate_of": entry.get("duplicate_of"),
+        }
+        outcomes.append(outcome)
+        # Exact copies share the representative's manifest entry
+        if entry is result or entry["hash"] != result["hash"]:
+            extra = {"duplicate_of": entry["duplicate_of"]} if "duplicate_of" in entry else {}
+            manifest.record(
+                entry["hash"], entry["name"], status,
+                label=entry["label"], score=entry["score"], **extra,
+            )
+    return outcomes
+
+
+def failed_files(result):
+    """The item of a Failed result and its duplicates, which failed with it."""
+    return [result.item, *result.item.get("duplicates", [])]
+
+
+def process_all_images(uploaded_images, detection_model_choice, disease_model_mode, confidence, overlap_threshold, save_to_drive, drive, PARENT_FOLDER_ID, settings):
+    """Process all uploaded images in batch mode.
+
+    Images stream through build_batch_pipeline, so decoding, inference and
+    Sheets/Drive I/O overlap instead of running strictly one after another;
+    results are reported in completion order. A MemoryBudget
+    (settings.BATCH_MEMORY_BUDGET_MB / BATCH_MAX_IN_FLIGHT) caps decoded
+    pixels and the upload pool caps encoded images waiting on Drive
+    (BATCH_UPLOAD_BUDGET_MB), so a slow stage holds the others back
+    instead of growing memory.
+
+    Progress is kept in a BatchManifest keyed by each image's content
+    hash and the run's settings: running a batch again with the same
+    settings skips images that finished in any earlier run and retries
+    only failed or interrupted ones. The page shows a throttled
+    BatchProgress summary rather than one message per image.
+
+    ZIP archives in the upload are streamed member by member into the
+    same pipeline (see modules/archive_ingest); nothing is written to disk.
+
+    Identical files (and, if settings.BATCH_NEAR_DUPLICATE_BITS is set,
+    near-duplicate photos) are grouped before inference (see
+    modules/batch_dedup), so each group is detected once.
+    """
     if not uploaded_images:
         st.warning("No images to process.")
         return
-        
+
+    items, notes = expand_uploads(uploaded_images, settings)
+    for note in notes:
+        st.warning(note)
+    if not items:
+        st.warning("No images to process.")
+        return
+
+    manifest = BatchManifest.for_hashes(
+        [item["hash"] for item in items],
+        {
+            "detection_model_choice": detection_model_choice,
+            "disease_model_mode": disease_model_mode,
+            "confidence": confidence,
+            "overlap_threshold": overlap_threshold,
+            "save_to_drive": bool(save_to_drive),
+        },
+    )
+    names = {item["hash"]: item["name"] for item in items}
+    pending = [item for item in items if not manifest.is_done(item["hash"])]
+    if len(pending) < len(items):
+        st.info(
+            f"↩️ Resuming batch: {len(items) - len(pending)} of {len(items)} images "
+            f"were already processed and will be skipped."
+        )
+    if not pending:
+        manifest.close()
+        st.success("✅ **All images in this batch were already processed.**")
+        return
+
+    with st.spinner("Checking for duplicate photos..."):
+        groups = group_duplicates(
+            pending, settings.BATCH_NEAR_DUPLICATE_BITS, workers=settings.BATCH_READ_WORKERS
+        )
+    if len(groups) < len(pending):
+        action = (
+            "results are saved for every file"
+            if settings.BATCH_DUPLICATE_POLICY == SAVE_EACH
+            else "only one result per group is saved"
+        )
+        st.info(
+            f"♊ {len(pending) - len(groups)} duplicate photo(s) found: detection runs on "
+            f"{len(groups)} of {len(pending)} images and {action}."
+        )
+
     with st.spinner("Running detection and saving..."):
-        status_text = st.empty()
-        progress = st.progress(0)
-        total = len(uploaded_images)
+        progress = BatchProgress(len(pending))
+        upload_pool = None
+        pipeline = None
+        budget = MemoryBudget(
+            settings.BATCH_MEMORY_BUDGET_MB * 1024 * 1024,
+            max_items=settings.BATCH_MAX_IN_FLIGHT,
+        )
 
-        try:
-            # Load models once
-            model, model_leaf, model_disease = load_models(detection_model_choice, disease_model_mode)
-
-            for idx, file in enumerate(uploaded_images):
-                try:
-                    status_text.markdown(f"**Detecting and saving:** `{file.name}`")
-                    image = PIL.Image.open(file)
-                    gps_data = get_gps_location(file)
-
-                    # Run detection
-                    best_label, score = detect_and_save_silently(
-                        uploaded_image=image,
-                        image_file=file,
-                        gps_data=gps_data,
-                        model_type=detection_model_choice,
-                        model=model,
-                        model_leaf=model_leaf,
-                        model_disease=model_disease,
-                        confidence=confidence,
-                        overlap_threshold=overlap_threshold,
-                        save_to_drive=save_to_drive,
-                        drive=drive,
-                        parent_folder_id=PARENT_FOLDER_ID,
-                        cdisease_colors=cdisease_colors,
-                        cleaf_colors=cleaf_colors,
+        def report_upload(upload):
+            if upload["status"] == "failed":
+                progress.add(
+                    names.get(upload["key"], upload["label"]),
+                    "failed",
+                    label=upload["label"],
+                    error=upload["message"],
+                    counts_toward_total=False,
+                )
+                if upload["key"]:
+                    # Retry the whole image next run; the Sheets row is not rewritten
+                    manifest.record_upload_failed(
+                        upload["key"], names.get(upload["key"]), upload["message"]
                     )
 
-                    if best_label != "No Detection":
-                        st.success(f"✅ Saved: {file.name} ({best_label}, {score}%)")
+        with RssSampler() as rss:
+            try:
+                # Load models once
+                models = load_models(detection_model_choice, disease_model_mode)
+
+                # Drive uploads run in the background while detection continues
+                upload_pool = (
+                    DriveUploadPool(
+                        drive,
+                        PARENT_FOLDER_ID,
+                        max_queued_bytes=settings.BATCH_UPLOAD_BUDGET_MB * 1024 * 1024,
+                    )
+                    if save_to_drive
+                    else None
+                )
+
+                pipeline = build_batch_pipeline(
+                    models,
+                    detection_model_choice,
+                    confidence,
+                    overlap_threshold,
+                    save_to_drive,
+                    drive,
+                    PARENT_FOLDER_ID,
+                    budget,
+                    upload_pool,
+                    manifest,
+                    settings,
+                )
+
+                for result in pipeline.run(groups):
+                    if isinstance(result, Failed):
+                        for item in failed_files(result):
+                            manifest.record(item["hash"], item["name"], "failed", error=str(result.error))
+                            progress.add(
+                                item["name"], "failed", error=str(result.error),
+                                duplicate_of=item.get("duplicate_of"),
+                            )
                     else:
-                        st.info(f"ℹ️ Skipped: {file.name} — No disease detected.")
-
-                except Exception as e:
-                    st.error(f"❌ Failed: {file.name}: {str(e)}")
-                
-                try:
-                    # Update progress safely
-                    progress.progress((idx + 1) / total)
-                except:
-                    pass
-
-            status_text.markdown("✅ **All images processed and saved.**")
-        except Exception as e:
-            st.error(f"Error in batch processing: {str(e)}")
+                        for outcome in record_outcomes(manifest, result):
+                            progress.add(
+                                outcome["name"],
+                                outcome["status"],
+                                label=None if outcome["status"] == "no_detection" else outcome["label"],
+                                score=outcome["score"] or None,
+                                duplicate_of=outcome["duplicate_of"],
+                            )
+
+                    if upload_pool is not None:
+                        for upload in upload_pool.poll():
+                            report_upload(upload)
+
+                if upload_pool is not None:
+                    # Wait for the remaining uploads, reporting each as it lands
+                    for upload in upload_pool.results():
+                        progress.set_note(
+                            f"Uploading to Drive: {upload_pool.done}/{upload_pool.total}"
+                        )
+                        report_upload(upload)
+                    upload_pool.close()
+                    st.caption(format_upload_summary(upload_pool.summary()))
+
+                failed = manifest.counts().get("failed", 0)
+                if failed:
+                    progress.finish(
+                        f"⚠️ **{failed} image(s) failed.** Run the batch again to retry only those."
+                    )
+                else:
+                    progress.finish("✅ **All images processed and saved.**")
+            except Exception as e:
+                if pipeline is not None:
+                    pipeline.cancel()
+                if upload_pool is not None:
+                    upload_pool.cancel()
+                    upload_pool.close(wait=False)
+                st.error(f"Error in batch processing: {str(e)}")
+            finally:
+                # Wake any stage still waiting on memory so its thread can exit
+                budget.close()
+                manifest.close()
+
+        if pipeline is not None:
+            st.caption(f"⏱️ {pipeline.report().splitlines()[0]}")
+        st.caption(
+            f"🧠 {rss.report()} · peak image memory in flight "
+            f"{format_bytes(budget.peak_in_use)} of {settings.BATCH_MEMORY_BUDGET_MB} MB budget"
+        )
@@ -0,0 +1,126 @@
+import time
+from collections import Counter
+
+import pandas as pd
+import streamlit as st
+
+# Minimum seconds between redraws of the progress bar and summary
+UPDATE_INTERVAL = 0.5
+
+# Per-image statuses, in the order the summary lists them
+STATUS_LABELS = {
+    "saved": "✅ Saved",
+    "skipped": "ℹ️ Skipped",
+    "no_detection": "ℹ️ No detection",
+    "duplicate": "♊ Duplicate (not saved)",
+    "failed": "❌ Failed",
+}
+
+
+class BatchProgress:
+    """Throttled progress for a batch run: one bar, one status line, one summary table.
+
+    Per-image outcomes are collected with `add` and only drawn at most
+    every `interval` seconds, so a 500-image batch costs a few hundred
+    websocket deltas instead of thousands. Per-image detail is available
+    at the end in a collapsed table.
+    """
+
+    def __init__(self, total, interval=UPDATE_INTERVAL):
+        self.total = total
+        self.interval = interval
+        self.rows = []
+        self.statuses = Counter()
+        self.diseases = Counter()
+        self.done = 0
+        self.note = ""
+        self._started = time.perf_counter()
+        self._last_render = 0.0
+        self._status = st.empty()
+        self._bar = st.progress(0)
+        self._summary = st.empty()
+
+    def add(self, name, status, label=None, score=None, error=None, duplicate_of=None,
+            counts_toward_total=True):
+        """Record one image's outcome (or an extra event, e.g. a failed upload)."""
+        self.rows.append(
+            {"Image": name, "Status": STATUS_LABELS.get(status, status), "Disease": label,
+             "Confidence": score, "Duplicate of": duplicate_of, "Error": error}
+        )
+        self.statuses[status] += 1
+        if status == "saved" and label:
+            self.diseases[label] += 1
+        if counts_toward_total:
+            self.done += 1
+        self.update()
+
+    def set_note(self, note):
+        """Replace the status line text (e.g. "Uploading to Drive: 3/10")."""
+        self.note = note
+        self.update()
+
+    def throughput(self):
+        elapsed = time.perf_counter() - self._started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def update(self, force=False):
+        """Redraw if `interval` has passed since the last redraw (or when forced)."""
+        now = time.perf_counter()
+        if not force and now - self._last_render < self.interval:
+            return
+        self._last_render = now
+
+        rate = self.throughput()
+        remaining = (self.total - self.done) / rate if rate and self.done < self.total else 0
+        line = f"**Processed {self.done}/{self.total}** · {rate:.2f} images/s"
+        if remaining:
+            line += f" · ~{remaining:.0f}s left"
+        if self.note:
+            line += f" · {self.note}"
+        self._status.markdown(line)
+        try:
+            self._bar.progress(min(self.done / self.total, 1.0) if self.total else 1.0)
+        except Exception:
+            pass
+
+        with self._summary.container():
+            st.dataframe(self.summary_table(), use_container_width=True, hide_index=True)
+
+    def summary_table(self):
+        """Counts per outcome, then per disease saved."""
+        return outcome_table(self.statuses, self.diseases)
+
+    def finish(self, message):
+        """Final redraw, closing message and the on-demand per-image table."""
+        self.note = ""
+        self.update(force=True)
+        self._status.markdown(message)
+        failures = [row for row in self.rows if row["Error"]]
+        if failures:
+            st.error(f"{len(failures)} error(s); see the failed rows below.")
+        if self.rows:
+            with st.expander(f"Per-image details ({len(self.rows)})"):
+                st.dataframe(pd.DataFrame(self.rows), use_container_width=True, hide_index=True)
+
+
+def outcome_table(statuses, diseases):
+    """Summary rows for Counters of outcomes and of diseases saved."""
+    rows = [
+        {"Outcome": STATUS_LABELS.get(status, status), "Images": statuses[status]}
+        for status in STATUS_LABELS
+        if statuses[status]
+    ]
+    rows += [
+        {"Outcome": f"🦠 {disease}", "Images": count}
+        for disease, count in diseases.most_common()
+    ]
+    return pd.DataFrame(rows or [{"Outcome": "Waiting for results", "Images": 0}])
+
+
+def results_table(results):
+    """The BatchProgress summary for stored per-image results (a background job's)."""
+    statuses = Counter(row["status"] for row in results)
+    diseases = Counter(
+        row["label"] for row in results if row["status"] == "saved" and row.get("label")
+    )
+    return outcome_table(statuses, diseases)
@@ -1,7 +1,12 @@
 import gspread
+import numpy as np
+import pandas as pd
 import streamlit as st
+from gspread.utils import rowcol_to_a1
 from oauth2client.service_account import ServiceAccountCredentials
 import json
+from modules.history_store import mark_history_stale
+from modules.rollups import mark_detections_changed, record_detection
 
 # Define the scope for Google Sheets API
 SCOPES = [
@@ -15,6 +20,19 @@ CREDENTIALS_FILE = "coffeediseasedb-1ef5f42ae808.json"
 # Google Sheet name
 SHEET_NAME = "CoffeeDiseaseData"
 
+# Column holding the md5 of the source image, written by batch runs so a
+# resumed batch can tell whether a row was already saved
+HASH_COLUMN = 7
+HASH_HEADER = "Image Hash"
+
+# Sheet rows fetched per batch_get call when reading columns
+SHEETS_PAGE_ROWS = 50_000
+
+# Columns read as numbers; blanks and "N/A" become NaN
+NUMERIC_HEADERS = {"confidence", "latitude", "longitude", "altitude"}
+
+_hash_header_checked = False
+
 
 def authenticate_google_sheets():
     """Authenticate with Google Sheets API using service account credentials from Streamlit Secrets."""
@@ -46,15 +64,40 @@ def get_or_create_worksheet():
                 "Latitude",
                 "Longitude",
                 "Altitude",
+                HASH_HEADER,
             ]
         )
 
     return worksheet
 
 
-def save_detection_to_database(disease_name, confidence, gps_data, date_taken):
-    """Save disease detection results and GPS data to Google Sheets, but don't add timestamp if missing."""
+def _ensure_hash_header(worksheet):
+    """Name the hash column on sheets created before it existed (once per process)."""
+    global _hash_header_checked
+    if _hash_header_checked:
+        return
+    if not worksheet.cell(1, HASH_COLUMN).value:
+        worksheet.update_cell(1, HASH_COLUMN, HASH_HEADER)
+    _hash_header_checked = True
+
+
+def detection_exists(image_hash, worksheet=None):
+    """True when a row for the image with this content hash is already in the sheet."""
+    worksheet = worksheet or get_or_create_worksheet()
+    return worksheet.find(image_hash, in_column=HASH_COLUMN) is not None
+
+
+def save_detection_to_database(
+    disease_name, confidence, gps_data, date_taken, image_hash=None, check_existing=False
+):
+    """Save disease detection results and GPS data to Google Sheets, but don't add timestamp if missing.
+
+    With `image_hash` the row records the image it came from; `check_existing`
+    skips the write when a row for that image is already there.
+    """
     worksheet = get_or_create_worksheet()
+    if image_hash and check_existing and detection_exists(image_hash, worksheet):
+        return "Data already saved."
 
     # Format date taken if available, otherwise leave it blank
     formatted_date = date_taken.strftime("%Y-%m-%d") if date_taken else "N/A"
@@ -68,9 +111,18 @@ def save_detection_to_database(disease_name, confidence, gps_data, date_taken):
         (gps_data or {}).get("longitude", "N/A"),
         (gps_data or {}).get("altitude", "N/A"),
     ]
+    if image_hash:
+        _ensure_hash_header(worksheet)
+        entry.append(image_hash)
     print(f"Writing to sheet: {worksheet.title}")
     # Append data to Google Sheets
     worksheet.append_row(entry)
+    mark_history_stale()
+    record_detection(
+        date_taken, disease_name, (gps_data or {}).get("latitude"), (gps_data or {}).get("longitude")
+    )
+    # Undated rows change no rollup count, but the detection table still changed
+    mark_detections_changed()
 
     return "Data saved successfully!"
 
@@ -82,3 +134,50 @@ def fetch_all_locations():
     sheet = client.open(SHEET_NAME).sheet1  # First worksheet
     records = sheet.get_all_records()
     return records if records else []
+
+
+def _parse_column(name, values):
+    """One sheet column as an array: floats for NUMERIC_HEADERS, objects otherwise."""
+    values = np.array(values, dtype=object)
+    if name in NUMERIC_HEADERS:
+        return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+    return values
+
+
+def fetch_detection_columns(headers, page_rows=SHEETS_PAGE_ROWS, worksheet=None):
+    """Read only the `headers` columns (matched case-insensitively) into a DataFrame.
+
+    Instead of get_all_records, which downloads every column and builds a
+    dict per row, each page of `page_rows` rows is one batch_get of just
+    the wanted column ranges, returned column-major and parsed straight
+    into arrays. Numbers come back unformatted and dates as the text shown
+    in the sheet. Columns are named by their lower-cased header; headers
+    missing from the sheet are left out, and trailing blank rows are
+    dropped.
+    """
+    if worksheet is None:
+        worksheet = authenticate_google_sheets().open(SHEET_NAME).sheet1
+    header_row = [str(header).strip().lower() for header in worksheet.row_values(1)]
+    columns = {name: header_row.index(name) + 1 for name in headers if name in header_row}
+    if not columns:
+        return pd.DataFrame()
+
+    chunks = {name: [] for name in columns}
+    rows = 0
+    for first in range(2, worksheet.row_count + 1, page_rows):
+        last = min(first + page_rows - 1, worksheet.row_count)
+        ranges = [f"{rowcol_to_a1(first, col)}:{rowcol_to_a1(last, col)}" for col in columns.values()]
+        pages = worksheet.batch_get(
+            ranges,
+            major_dimension="COLUMNS",
+            value_render_option="UNFORMATTED_VALUE",
+            date_time_render_option="FORMATTED_STRING",
+        )
+        # The API trims trailing blanks per column; pad so the columns stay aligned
+        for name, page in zip(columns, pages):
+            values = list(page[0]) if page else []
+            if values:
+                rows = max(rows, first - 2 + len(values))
+            chunks[name] += values + [""] * (last - first + 1 - len(values))
+
+    return pd.DataFrame({name: _parse_column(name, values[:rows]) for name, values in chunks.items()})
@@ -1,11 +1,24 @@
-import os
-import uuid
 import numpy as np
 import streamlit as st
 from modules.gps_utils import save_location_data
-from modules.image_uploader import upload_image
+from modules.drive_index import get_drive_index
+from modules.image_uploader import (
+    encode_image_for_upload,
+    upload_bytes_for,
+    upload_image_bytes,
+)
 from modules.processing import non_max_suppression
-from modules.visualizations import draw_bounding_boxes
+from modules.image_buffer import finish_for_display
+from modules.visualizations import (
+    OVERLAY_PREVIEW_MAX_DIM,
+    boxes_to_arrays,
+    draw_bounding_boxes,
+    get_overlay_renderer,
+    preview_canvas,
+)
+
+# Labels that are never written to the database
+SKIP_LABELS = {"healthy", "abiotic"}
 
 
 def save_prediction_if_valid(
@@ -18,44 +31,60 @@ def save_prediction_if_valid(
     drive,
     parent_folder_id,
     uploaded_flag,
+    upload_pool=None,
+    image_hash=None,
+    check_existing=False,
+    strict=False,
 ):
-    """Saves to Sheets if label is valid. Uploads to Drive always if confidence >= 50."""
-    SKIP_LABELS = {"healthy", "abiotic"}
+    """Saves to Sheets if label is valid. Uploads to Drive always if confidence >= 50.
+
+    When an `upload_pool` (DriveUploadPool) is given the Drive upload is queued
+    on it instead of running inline. `image_hash`/`check_existing` make the
+    Sheets write idempotent (see save_detection_to_database); with `strict`
+    a failed Sheets write raises instead of being reported and ignored.
+    """
     saved = False
 
     # Sheets: skip if low confidence or unwanted label
     if score >= 60 and name.lower() not in SKIP_LABELS:
-        save_location_data(source_img, name, score, gps_data)
+        response = save_location_data(
+            source_img,
+            name,
+            score,
+            gps_data,
+            image_hash=image_hash,
+            check_existing=check_existing,
+        )
+        if response is None and strict:
+            raise RuntimeError(f"Saving {name} to the database failed")
         saved = True
 
     # Drive: upload anything with score >= 60
     if score >= 60 and save_to_drive and not uploaded_flag:
-        _upload_image_once(uploaded_image, name, drive, parent_folder_id)
+        if upload_pool is not None:
+            upload_pool.submit(
+                upload_bytes_for(source_img, uploaded_image), name, key=image_hash
+            )
+        else:
+            _upload_image_once(
+                uploaded_image, name, drive, parent_folder_id, source_img
+            )
         uploaded_flag = True
         saved = True
 
     return saved, uploaded_flag
 
 
-def detect_and_save_silently(
+def detect_best_disease(
     uploaded_image,
-    image_file,
-    gps_data,
     model_type,
     model,
-    model_leaf,
     model_disease,
     confidence,
     overlap_threshold,
-    save_to_drive,
-    drive,
-    parent_folder_id,
-    cdisease_colors,
-    cleaf_colors,
 ):
-    """Silent detection that only saves valid diseases (no leaf logic)."""
+    """Silent batch detection (no leaf logic): the top (name, score) disease, or None."""
 
-    result_image = np.array(uploaded_image)
     detections = []
 
     def process_boxes(res, labels):
@@ -74,29 +103,52 @@ def detect_and_save_silently(
         res = used_model.predict(uploaded_image, conf=confidence)
         detections += process_boxes(res, res[0].names)
 
-    if detections:
-        best_name, best_score = sorted(detections, key=lambda x: x[1], reverse=True)[0]
-
-        if best_score < 60:
-            return f"Skipped (low confidence: {best_score}%)", best_score
-
-        saved, _ = save_prediction_if_valid(
-            name=best_name,
-            score=best_score,
-            uploaded_image=uploaded_image,
-            source_img=image_file,
-            gps_data=gps_data,
-            save_to_drive=save_to_drive,
-            drive=drive,
-            parent_folder_id=parent_folder_id,
-            uploaded_flag=False,
-        )
+    if not detections:
+        return None
+    return max(detections, key=lambda x: x[1])
 
-        return (
-            (best_name, best_score) if saved else (f"Skipped ({best_name})", best_score)
-        )
 
-    return "No Detection", 0
+def save_best_disease(
+    best,
+    image_file,
+    gps_data,
+    save_to_drive,
+    drive,
+    parent_folder_id,
+    uploaded_image=None,
+    upload_pool=None,
+    image_hash=None,
+    check_existing=False,
+):
+    """Save a `detect_best_disease` result if it is a valid disease; returns (label, score).
+
+    Needs no decoded pixels, so it can run after the image buffer is released.
+    Raises if the Sheets write fails, so callers can retry the image later.
+    """
+    if best is None:
+        return "No Detection", 0
+
+    best_name, best_score = best
+    if best_score < 60:
+        return f"Skipped (low confidence: {best_score}%)", best_score
+
+    saved, _ = save_prediction_if_valid(
+        name=best_name,
+        score=best_score,
+        uploaded_image=uploaded_image,
+        source_img=image_file,
+        gps_data=gps_data,
+        save_to_drive=save_to_drive,
+        drive=drive,
+        parent_folder_id=parent_folder_id,
+        uploaded_flag=False,
+        upload_pool=upload_pool,
+        image_hash=image_hash,
+        check_existing=check_existing,
+        strict=True,
+    )
+
+    return (best_name, best_score) if saved else (f"Skipped ({best_name})", best_score)
 
 
 def get_highest_confidence_detections(results):
@@ -107,6 +159,13 @@ def get_highest_confidence_detections(results):
     return highest
 
 
+def preview_label(raw_name):
+    """Label drawn on previews: lower case, with late-stage rust shown as rust."""
+    name = raw_name.lower()
+    if name == "late-stage-rust":
+        return "rust"
+    return name
+
 def generate_preview_image(
     uploaded_image,
     model_type,
@@ -117,75 +176,48 @@ def generate_preview_image(
     overlap_threshold,
     cdisease_colors,
     cleaf_colors,
+    max_dim=OVERLAY_PREVIEW_MAX_DIM,
 ):
-    from modules.processing import non_max_suppression
-    from modules.visualizations import draw_bounding_boxes
-    import numpy as np
-
-    def normalize_label(raw_name):
-        """Normalize label names"""
-        # Convert underscores to spaces and capitalize
-        name = raw_name.lower()
-        
-        # Special case handling
-        if name == "late-stage-rust":
-            return "rust"
-        
-        # Return the name with title case
-        return name
+    """Run the selected model(s) on the shared BGR buffer and return an RGB overlay.
+
+    `uploaded_image` is the read-only array from `decode_image`; it is passed
+    to predict as-is. Overlays are drawn on one copy downscaled to `max_dim`
+    on its longest side (pass None for full resolution).
+    """
+    from modules.processing import nms_indices
+
+    def draw(canvas, scale, used_model, colors):
+        result = used_model.predict(uploaded_image, conf=confidence)
+        xyxy, class_ids, confidences = boxes_to_arrays(result[0].boxes)
+        keep = nms_indices(xyxy, confidences, overlap_threshold)
+        renderer = get_overlay_renderer(result[0].names, colors, preview_label)
+        renderer.draw(canvas, xyxy[keep], class_ids[keep], confidences[keep], scale)
 
     try:
+        canvas, scale = preview_canvas(uploaded_image, max_dim)
+
         if model_type == "Disease":
             # Process disease model
-            result = model.predict(uploaded_image, conf=confidence)
-            boxes = non_max_suppression(result[0].boxes, overlap_threshold)
-            labels = result[0].names
-            return draw_bounding_boxes(
-                uploaded_image, boxes, labels, cdisease_colors, normalize_label=normalize_label
-            )
+            draw(canvas, scale, model, cdisease_colors)
 
         elif model_type == "Leaf":
-            # Ensure model is not None
+            # Leave the image unannotated if model is None
             if model is not None:
-                result = model.predict(uploaded_image, conf=confidence)
-                boxes = non_max_suppression(result[0].boxes, overlap_threshold)
-                labels = result[0].names
-                return draw_bounding_boxes(uploaded_image, boxes, labels, cleaf_colors, normalize_label=normalize_label)
-            else:
-                # Return original image if model is None
-                return np.array(uploaded_image)
+                draw(canvas, scale, model, cleaf_colors)
 
         elif model_type == "Both Models":
-            # Start with a copy of the uploaded image
-            result_image = np.array(uploaded_image)
-
             # Process disease detections using model_disease (passed separately in Both Models mode)
-            result_disease = model_disease.predict(uploaded_image, conf=confidence)
-            boxes_disease = non_max_suppression(
-                result_disease[0].boxes, overlap_threshold
-            )
-            labels_disease = result_disease[0].names
-            result_image = draw_bounding_boxes(
-                result_image, boxes_disease, labels_disease, cdisease_colors, normalize_label=normalize_label
-            )
+            draw(canvas, scale, model_disease, cdisease_colors)
 
             # Process leaf detections (drawn with original label)
             if model_leaf is not None:
-                result_leaf = model_leaf.predict(uploaded_image, conf=confidence)
-                leaf_boxes = non_max_suppression(result_leaf[0].boxes, overlap_threshold)
-                leaf_labels = result_leaf[0].names
-                result_image = draw_bounding_boxes(
-                    result_image, leaf_boxes, leaf_labels, cleaf_colors, normalize_label=normalize_label
-                )
+                draw(canvas, scale, model_leaf, cleaf_colors)
 
-            return result_image
-        
-        # Default case - return original image
-        return np.array(uploaded_image)
+        return finish_for_display(canvas)
 
     except Exception as e:
         st.warning(f"Auto-preview failed: {e}")
-        return uploaded_image
+        return finish_for_display(preview_canvas(uploaded_image, max_dim)[0])
 
 def detect_labels_only(
     uploaded_image,
@@ -260,29 +292,29 @@ def normalize_label(label: str) -> str:
         return "rust"
     return label
 
-# Add this function to modules/image_uploader.py
-def check_image_exists(drive, folder_id, filename):
-    """Check if an image with the same name already exists in the Drive folder"""
+def check_image_exists(drive, folder_id, file_hash):
+    """Check whether content with this hash (see `upload_fingerprint`) is already in Drive."""
     try:
-        query = f"name = '{filename}' and '{folder_id}' in parents and trashed = false"
-        results = drive.files().list(q=query, fields="files(id, name)").execute()
-        files = results.get('files', [])
-        return len(files) > 0
+        return get_drive_index(drive, folder_id).contains(file_hash)
     except Exception as e:
         # If there's an error checking, assume it doesn't exist
         return False
 
 
-def _upload_image_once(uploaded_image, name, drive, parent_folder_id):
-    temp_path = f"temp_{uuid.uuid4().hex}.jpg"
-    uploaded_image.save(temp_path)
+def _upload_image_once(uploaded_image, name, drive, parent_folder_id, source_img=None):
     try:
         with st.spinner(f"Uploading to Google Drive ({name})..."):
-            result = upload_image(temp_path, name, drive, parent_folder_id)
+            image_bytes = (
+                upload_bytes_for(source_img, uploaded_image)
+                if source_img is not None
+                else encode_image_for_upload(uploaded_image)
+            )
+            _, _, result = upload_image_bytes(
+                image_bytes, name, drive, parent_folder_id
+            )
             st.toast(result)
     except Exception as e:
         st.error(f"Drive upload failed: {e}")
-    os.remove(temp_path)
 
 
 @st.dialog("Results")
@@ -363,7 +395,9 @@ def _run_single_model(
                 save_location_data(source_img, name, score, gps_data)
             saved_any_detections = True
             if save_to_drive and not uploaded:
-                _upload_image_once(uploaded_image, name, drive, parent_folder_id)
+                _upload_image_once(
+                    uploaded_image, name, drive, parent_folder_id, source_img
+                )
                 uploaded = True
 
     if disease_results or leaf_results:
@@ -471,7 +505,9 @@ def _run_both_models(
                 save_location_data(source_img, name, score, gps_data)
             saved_any_detections = True
             if save_to_drive and not uploaded:
-                _upload_image_once(uploaded_image, name, drive, parent_folder_id)
+                _upload_image_once(
+                    uploaded_image, name, drive, parent_folder_id, source_img
+                )
                 uploaded = True
 
     if disease_results or leaf_results:
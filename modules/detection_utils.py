@@ -1,12 +1,13 @@
 import streamlit as st
-import PIL
-from PIL import Image
 import hashlib
 import json
 from pathlib import Path
 from components.config import settings, helper
 from modules.dialog_utils import show_disease_dialog, show_leaf_dialog, show_both_model_disease_dialog
 from modules.detection_runner import generate_preview_image, detect_with_confidence
+from modules.image_buffer import decode_image
+from modules.memory_utils import track_peak_memory
+from modules.visualizations import OVERLAY_PREVIEW_MAX_DIM
 
 def check_config_changed(current_model_config):
     """Check if model configuration has changed since last detection."""
@@ -19,8 +20,12 @@ def check_config_changed(current_model_config):
             return True
     return False
 
+def preview_max_dim():
+    """Size overlays are drawn at: preview size unless the full-resolution view is on."""
+    return None if st.session_state.get("show_full_resolution") else OVERLAY_PREVIEW_MAX_DIM
+
 def get_cache_key(source_img, current_model_config):
-    """Generate a cache key based on image hash and model configuration."""
+    """Generate a cache key based on image hash, model configuration and overlay size."""
     if source_img is None:
         return None
         
@@ -29,7 +34,9 @@ def get_cache_key(source_img, current_model_config):
     image_hash = hashlib.md5(image_bytes).hexdigest()
     
     # Create a combined key for the cache that includes both image and model config
-    config_str = json.dumps(current_model_config, sort_keys=True)
+    config_str = json.dumps(
+        {**current_model_config, "overlay_max_dim": preview_max_dim()}, sort_keys=True
+    )
     return f"{image_hash}_{hashlib.md5(config_str.encode()).hexdigest()}"
 
 def run_detection(source_img, current_model_config, progress_callback=None):
@@ -65,54 +72,57 @@ def run_detection(source_img, current_model_config, progress_callback=None):
         except:
             pass
     
-    # Open the image
-    uploaded_image = PIL.Image.open(source_img)
-    
-    if progress_callback:
-        try:
-            progress_callback(60, "Running detection...")
-        except:
-            pass
-    
-    # Generate preview image with bounding boxes
-    preview_image = generate_preview_image(
-        uploaded_image,
-        detection_model_choice,
-        model if detection_model_choice != "Both Models" else None,
-        model_leaf if detection_model_choice in ["Leaf", "Both Models"] else None,
-        model_disease if detection_model_choice == "Both Models" else None,
-        confidence,
-        overlap_threshold,
-        cdisease_colors={
-            0: (255, 255, 0), # Yellow for Abiotic Disorder
-            1: (255, 0, 0), # Red for Cercospora
-            2: (0, 204, 0), # Green for Healthy
-            3: (255, 165, 0), # Orange for Rust
-            4: (0, 0, 0), # Black for Sooty Mold
-        },
-        cleaf_colors={0: (0, 255, 0), 1: (0, 255, 255), 2: (0, 0, 255)}
-    )
-    
-    if progress_callback:
-        try:
-            progress_callback(80, "Processing results...")
-        except:
-            pass
-    
-    # Get all detections with confidence
-    detections_with_confidence = detect_with_confidence(
-        uploaded_image,
-        detection_model_choice,
-        model,
-        model_leaf,
-        model_disease,
-        confidence,
-        overlap_threshold
-    )
+    with track_peak_memory(enabled=settings.DEBUG_PEAK_MEMORY) as memory:
+        # Decode once; the same buffer is shared by predict, drawing and display
+        uploaded_image = decode_image(source_img)
+        
+        if progress_callback:
+            try:
+                progress_callback(60, "Running detection...")
+            except:
+                pass
+        
+        # Generate preview image with bounding boxes
+        preview_image = generate_preview_image(
+            uploaded_image,
+            detection_model_choice,
+            model if detection_model_choice != "Both Models" else None,
+            model_leaf if detection_model_choice in ["Leaf", "Both Models"] else None,
+            model_disease if detection_model_choice == "Both Models" else None,
+            confidence,
+            overlap_threshold,
+            cdisease_colors={
+                0: (255, 255, 0), # Yellow for Abiotic Disorder
+                1: (255, 0, 0), # Red for Cercospora
+                2: (0, 204, 0), # Green for Healthy
+                3: (255, 165, 0), # Orange for Rust
+                4: (0, 0, 0), # Black for Sooty Mold
+            },
+            cleaf_colors={0: (0, 255, 0), 1: (0, 255, 255), 2: (0, 0, 255)},
+            max_dim=preview_max_dim(),
+        )
+        
+        if progress_callback:
+            try:
+                progress_callback(80, "Processing results...")
+            except:
+                pass
+        
+        # Get all detections with confidence
+        detections_with_confidence = detect_with_confidence(
+            uploaded_image,
+            detection_model_choice,
+            model,
+            model_leaf,
+            model_disease,
+            confidence,
+            overlap_threshold
+        )
     
     # Process detection results
     results = process_detection_results(detections_with_confidence)
     results["result_image"] = preview_image
+    results["peak_memory"] = memory["peak_bytes"]
 
     # Show dialog if no relevant detections found
     model_choice = current_model_config["detection_model_choice"]
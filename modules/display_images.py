@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Longest side of the images sent to the browser in the results view
+DISPLAY_MAX_DIM = 1024
+
+# Encoding used for display variants; WebP is a fraction of Streamlit's PNG
+DISPLAY_FORMAT = ".webp"
+DISPLAY_QUALITY = 80
+
+# Encoded variants kept per process (each is tens of kilobytes)
+DISPLAY_CACHE_SIZE = 256
+
+_variants = OrderedDict()
+_variants_lock = threading.Lock()
+
+
+def encode_display_variant(image, channels="RGB", max_dim=DISPLAY_MAX_DIM):
+    """Downscale an image to at most `max_dim` on its longest side and encode it.
+
+    Accepts a PIL image or an HxWx3 array in `channels` order; returns the
+    encoded bytes, ready for `st.image`.
+    """
+    if isinstance(image, Image.Image):
+        image = np.asarray(image.convert("RGB"))
+        channels = "RGB"
+
+    height, width = image.shape[:2]
+    scale = max_dim / max(height, width)
+    if scale < 1:
+        image = cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA,
+        )
+    if channels == "RGB":
+        # OpenCV encoders expect BGR; converting the small copy is cheap
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
+    ok, encoded = cv2.imencode(
+        DISPLAY_FORMAT, image, [cv2.IMWRITE_WEBP_QUALITY, DISPLAY_QUALITY]
+    )
+    if not ok:
+        ok, encoded = cv2.imencode(
+            ".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, DISPLAY_QUALITY]
+        )
+    return encoded.tobytes()
+
+
+def get_display_variant(key, make_image, channels="RGB"):
+    """Return cached display bytes for `key`, building them from `make_image()` once.
+
+    `make_image` is only called on a cache miss, so reruns that hit the
+    cache never touch the full-resolution pixels. A `key` of None encodes
+    without caching.
+    """
+    if key is None:
+        return encode_display_variant(make_image(), channels)
+
+    with _variants_lock:
+        if key in _variants:
+            _variants.move_to_end(key)
+            return _variants[key]
+
+    encoded = encode_display_variant(make_image(), channels)
+
+    with _variants_lock:
+        _variants[key] = encoded
+        while len(_variants) > DISPLAY_CACHE_SIZE:
+            _variants.popitem(last=False)
+    return encoded
+
+
+def show_image(placeholder, key, make_image, caption, channels="RGB", full_resolution=False):
+    """Show an image in `placeholder`: the cached display variant, or full resolution on request."""
+    if full_resolution:
+        placeholder.image(
+            make_image(), caption=caption, use_container_width=True, channels=channels
+        )
+    else:
+        placeholder.image(
+            get_display_variant(key, make_image, channels),
+            caption=caption,
+            use_container_width=True,
+        )
@@ -0,0 +1,149 @@
+import re
+import threading
+import time
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# Uploaded images are named "<disease>_<md5 of the uploaded bytes>.jpg"
+UPLOAD_TITLE_PATTERN = re.compile(r"^(?P<label>.+)_(?P<hash>[0-9a-f]{32})\.jpg$")
+
+# How often (seconds) the local index is reconciled against a fresh Drive listing
+RECONCILE_INTERVAL = 15 * 60
+
+# Page size for the seeding listing (Drive v2 allows up to 1000)
+LISTING_PAGE_SIZE = 1000
+
+# Folder ids OR-ed into one "in parents" clause, to keep listing queries short
+PARENTS_PER_QUERY = 40
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def _in_parents(folder_ids):
+    return " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+
+
+class DriveContentIndex:
+    """Local map of content hash -> {disease label: Drive file id}.
+
+    Seeded from a paginated listing of the images in the parent folder's
+    Disease/Date subfolders, updated after every upload, and reconciled in
+    the background every RECONCILE_INTERVAL seconds, so duplicate checks
+    are dictionary lookups instead of one Drive query per image.
+    """
+
+    def __init__(self, drive, parent_folder_id, reconcile_interval=RECONCILE_INTERVAL):
+        self.drive = drive
+        self.parent_folder_id = parent_folder_id
+        self.reconcile_interval = reconcile_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._reconciling = threading.Lock()
+        self._seeded_at = None
+
+    def _list(self, query, fields):
+        file_list = self.drive.ListFile(
+            {"q": query, "maxResults": LISTING_PAGE_SIZE, "fields": f"items({fields}),nextPageToken"}
+        )
+        # Reconciles run beside the upload workers; don't share PyDrive's http client
+        file_list.http = self.drive.auth.Get_Http_Object()
+        for page in file_list:
+            yield from page
+
+    def _upload_folders(self):
+        """Ids of the parent folder and every folder below it (Disease/Date)."""
+        folders, frontier = [self.parent_folder_id], [self.parent_folder_id]
+        while frontier:
+            children = []
+            for chunk in _chunks(frontier, PARENTS_PER_QUERY):
+                query = f"({_in_parents(chunk)}) and trashed=false and mimeType = '{FOLDER_MIME_TYPE}'"
+                children += [folder["id"] for folder in self._list(query, "id")]
+            folders += children
+            frontier = children
+        return folders
+
+    def _list_uploads(self):
+        """One paginated listing of the uploaded images under `parent_folder_id`."""
+        entries = {}
+        for chunk in _chunks(self._upload_folders(), PARENTS_PER_QUERY):
+            query = f"({_in_parents(chunk)}) and trashed=false and mimeType != '{FOLDER_MIME_TYPE}'"
+            for file in self._list(query, "id,title,md5Checksum"):
+                match = UPLOAD_TITLE_PATTERN.match(file.get("title", ""))
+                if not match:
+                    continue
+                file_hash = file.get("md5Checksum") or match.group("hash")
+                label = match.group("label").lower()
+                entries.setdefault(file_hash, {})[label] = file["id"]
+        return entries
+
+    def seed(self):
+        """(Re)load the index from Drive.
+
+        The listing is merged into the local entries rather than replacing
+        them, so uploads recorded while it ran are not forgotten.
+        """
+        entries = self._list_uploads()
+        with self._lock:
+            for file_hash, labels in entries.items():
+                self._entries.setdefault(file_hash, {}).update(labels)
+            self._seeded_at = time.time()
+
+    def _ensure_seeded(self):
+        if self._seeded_at is None:
+            with self._reconciling:
+                if self._seeded_at is None:
+                    self.seed()
+        elif time.time() - self._seeded_at > self.reconcile_interval:
+            self._reconcile_in_background()
+
+    def _reconcile_in_background(self):
+        if not self._reconciling.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self.seed()
+            except Exception as e:
+                print(f"Drive index reconciliation failed: {e}")
+                # Try again on the next interval rather than on every lookup
+                self._seeded_at = time.time()
+            finally:
+                self._reconciling.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def lookup(self, file_hash, disease_label=None):
+        """Return the Drive file id holding `file_hash` (under `disease_label` if given)."""
+        self._ensure_seeded()
+        with self._lock:
+            labels = self._entries.get(file_hash)
+            if not labels:
+                return None
+            if disease_label is None:
+                return next(iter(labels.values()))
+            return labels.get(disease_label.lower())
+
+    def contains(self, file_hash):
+        return self.lookup(file_hash) is not None
+
+    def record(self, file_hash, disease_label, file_id):
+        """Remember an upload or copy made by this process."""
+        with self._lock:
+            self._entries.setdefault(file_hash, {})[disease_label.lower()] = file_id
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_drive_index(drive, parent_folder_id):
+    """Return the process-wide index for `parent_folder_id`, creating it on first use."""
+    with _indexes_lock:
+        index = _indexes.get(parent_folder_id)
+        if index is None or index.drive is not drive:
+            index = DriveContentIndex(drive, parent_folder_id)
+            _indexes[parent_folder_id] = index
+        return index
@@ -0,0 +1,276 @@
+import hashlib
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+from PIL import Image
+
+# Bytes read from the start of a file; enough for the APP0/APP1 segments of
+# virtually every camera JPEG (an APP1 segment is capped at 64 KB)
+HEAD_SIZE = 128 * 1024
+
+# Number of metadata records kept in the per-process cache
+METADATA_CACHE_SIZE = 512
+
+# TIFF tags
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_ORIENTATION = 0x0112
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+GPS_ALTITUDE_REF = 5
+GPS_ALTITUDE = 6
+
+# TIFF field type -> (struct code, size in bytes)
+TIFF_TYPES = {
+    1: ("B", 1),  # BYTE
+    2: ("s", 1),  # ASCII
+    3: ("H", 2),  # SHORT
+    4: ("L", 4),  # LONG
+    5: ("LL", 8),  # RATIONAL
+    7: ("B", 1),  # UNDEFINED
+    9: ("l", 4),  # SLONG
+    10: ("ll", 8),  # SRATIONAL
+}
+
+
+@dataclass(frozen=True)
+class ImageMetadata:
+    """Metadata read from an image's EXIF block. Fields are None when absent."""
+
+    latitude: float = None
+    longitude: float = None
+    altitude: float = None
+    date_taken: datetime = None
+    orientation: int = None
+    camera_make: str = None
+    camera_model: str = None
+
+    @property
+    def gps(self):
+        """GPS dict in the shape used across the app, or None without coordinates."""
+        if self.latitude is None or self.longitude is None:
+            return None
+        return {
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "altitude": self.altitude,
+        }
+
+
+EMPTY_METADATA = ImageMetadata()
+
+
+def _read_head(image_file, size):
+    """Read the first `size` bytes of a path or file-like object, keeping its position."""
+    if hasattr(image_file, "read"):
+        position = image_file.tell()
+        image_file.seek(0)
+        head = image_file.read(size)
+        image_file.seek(position)
+        return head
+    with open(image_file, "rb") as f:
+        return f.read(size)
+
+
+def find_exif_segment(image_file, head=None):
+    """Return the TIFF payload of the JPEG APP1/Exif segment, or None.
+
+    Only the marker segments before the image data are walked; the
+    compressed scan itself is never read.
+    """
+    head = head if head is not None else _read_head(image_file, HEAD_SIZE)
+    if head[:2] != b"\xff\xd8":
+        return None
+
+    offset = 2
+    while offset + 4 <= len(head):
+        if head[offset] != 0xFF:
+            return None
+        marker = head[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0xD9, 0xDA):  # end of image / start of scan
+            return None
+        length = struct.unpack(">H", head[offset + 2 : offset + 4])[0]
+        end = offset + 2 + length
+        if marker == 0xE1 and head[offset + 4 : offset + 10] == b"Exif\x00\x00":
+            if end > len(head):
+                head = _read_head(image_file, end)
+            return head[offset + 10 : end]
+        offset = end
+    return None
+
+
+class _TiffReader:
+    def __init__(self, data):
+        self.data = data
+        self.endian = "<" if data[:2] == b"II" else ">"
+        if data[:2] not in (b"II", b"MM"):
+            raise ValueError("Not a TIFF header")
+
+    def unpack(self, fmt, offset):
+        return struct.unpack_from(self.endian + fmt, self.data, offset)
+
+    def first_ifd(self):
+        return self.unpack("L", 4)[0]
+
+    def read_ifd(self, offset, wanted):
+        """Return {tag: value} for the `wanted` tags of the IFD at `offset`."""
+        values = {}
+        if offset <= 0 or offset + 2 > len(self.data):
+            return values
+        count = self.unpack("H", offset)[0]
+        for i in range(count):
+            entry = offset + 2 + i * 12
+            if entry + 12 > len(self.data):
+                break
+            tag, field_type, n = self.unpack("HHL", entry)
+            if tag not in wanted or field_type not in TIFF_TYPES:
+                continue
+            code, size = TIFF_TYPES[field_type]
+            total = size * n
+            value_offset = entry + 8 if total <= 4 else self.unpack("L", entry + 8)[0]
+            if value_offset + total > len(self.data):
+                continue
+            values[tag] = self._decode(field_type, code, n, value_offset)
+        return values
+
+    def _decode(self, field_type, code, n, offset):
+        if field_type == 2:
+            raw = self.data[offset : offset + n]
+            return raw.split(b"\x00", 1)[0].decode("ascii", "ignore").strip()
+        if field_type in (5, 10):
+            parts = self.unpack(code * n, offset)
+            return tuple(
+                parts[i] / parts[i + 1] if parts[i + 1] else float(parts[i])
+                for i in range(0, len(parts), 2)
+            )
+        values = self.unpack(code * n, offset)
+        return values[0] if n == 1 else values
+
+
+def _to_degrees(dms, ref):
+    if not dms or len(dms) < 3 or not ref:
+        return None
+    degrees = dms[0] + dms[1] / 60 + dms[2] / 3600
+    return -degrees if ref in ("S", "W") else degrees
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def parse_exif(tiff_bytes):
+    """Parse a TIFF/EXIF payload into an ImageMetadata record."""
+    reader = _TiffReader(tiff_bytes)
+    ifd0 = reader.read_ifd(
+        reader.first_ifd(),
+        {TAG_MAKE, TAG_MODEL, TAG_ORIENTATION, TAG_EXIF_IFD, TAG_GPS_IFD},
+    )
+    exif = reader.read_ifd(ifd0.get(TAG_EXIF_IFD, 0), {TAG_DATETIME_ORIGINAL})
+    gps = reader.read_ifd(
+        ifd0.get(TAG_GPS_IFD, 0),
+        {
+            GPS_LATITUDE_REF,
+            GPS_LATITUDE,
+            GPS_LONGITUDE_REF,
+            GPS_LONGITUDE,
+            GPS_ALTITUDE_REF,
+            GPS_ALTITUDE,
+        },
+    )
+
+    latitude = _to_degrees(gps.get(GPS_LATITUDE), gps.get(GPS_LATITUDE_REF))
+    longitude = _to_degrees(gps.get(GPS_LONGITUDE), gps.get(GPS_LONGITUDE_REF))
+    if latitude is None or longitude is None:
+        latitude = longitude = None
+
+    altitude = gps.get(GPS_ALTITUDE)
+    if altitude is not None:
+        altitude = altitude[0]
+        # AltitudeRef is a single BYTE: 1 means below sea level
+        if gps.get(GPS_ALTITUDE_REF) == 1:
+            altitude = -altitude
+
+    return ImageMetadata(
+        latitude=latitude,
+        longitude=longitude,
+        altitude=altitude,
+        date_taken=_parse_datetime(exif.get(TAG_DATETIME_ORIGINAL)),
+        orientation=ifd0.get(TAG_ORIENTATION),
+        camera_make=ifd0.get(TAG_MAKE) or None,
+        camera_model=ifd0.get(TAG_MODEL) or None,
+    )
+
+
+def _exif_from_container(image_file):
+    """EXIF payload for non-JPEG containers (PNG eXIf, WebP EXIF) via a lazy PIL open."""
+    if hasattr(image_file, "read"):
+        position = image_file.tell()
+        image_file.seek(0)
+        try:
+            with Image.open(image_file) as img:
+                raw = img.info.get("exif")
+        finally:
+            image_file.seek(position)
+    else:
+        with Image.open(image_file) as img:
+            raw = img.info.get("exif")
+    if raw and raw.startswith(b"Exif\x00\x00"):
+        raw = raw[6:]
+    return raw or None
+
+
+def metadata_fingerprint(image_file, head):
+    """Cheap identity for an upload: name, size and a hash of the header bytes."""
+    name = getattr(image_file, "name", str(image_file))
+    size = getattr(image_file, "size", None)
+    return name, size, hashlib.md5(head).hexdigest()
+
+
+_metadata_cache = OrderedDict()
+_metadata_lock = threading.Lock()
+
+
+def extract_image_metadata(image_file):
+    """Read GPS, date taken, orientation and camera from an image in one pass.
+
+    JPEGs are parsed straight from the APP1 segment in the first bytes of
+    the file; other formats fall back to PIL's lazy header parsing.
+    Results are cached by upload fingerprint.
+    """
+    head = _read_head(image_file, HEAD_SIZE)
+    key = metadata_fingerprint(image_file, head)
+    with _metadata_lock:
+        if key in _metadata_cache:
+            _metadata_cache.move_to_end(key)
+            return _metadata_cache[key]
+
+    try:
+        if head[:2] == b"\xff\xd8":
+            tiff = find_exif_segment(image_file, head)
+        else:
+            tiff = _exif_from_container(image_file)
+        metadata = parse_exif(tiff) if tiff else EMPTY_METADATA
+    except (ValueError, struct.error, OSError):
+        metadata = EMPTY_METADATA
+
+    with _metadata_lock:
+        _metadata_cache[key] = metadata
+        if len(_metadata_cache) > METADATA_CACHE_SIZE:
+            _metadata_cache.popitem(last=False)
+    return metadata
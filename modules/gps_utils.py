@@ -1,24 +1,7 @@
 import streamlit as st
-from PIL import Image
-from PIL.ExifTags import TAGS, GPSTAGS
-from datetime import datetime
 from geopy.geocoders import Nominatim
-import piexif
 from modules.database import save_detection_to_database
-import io
-
-
-def get_decimal_coordinates(gps_coords):
-    """Convert GPS coordinates from degrees/minutes/seconds to decimal degrees."""
-    try:
-        degrees = float(gps_coords[0])
-        minutes = float(gps_coords[1])
-        seconds = float(gps_coords[2])
-        decimal_degrees = degrees + minutes / 60 + seconds / 3600
-        return decimal_degrees
-    except (ValueError, TypeError, IndexError) as e:
-        st.warning(f"Error converting GPS coordinates: {e}")
-        return None
+from modules.exif_utils import extract_image_metadata
 
 
 def convert_to_float(value):
@@ -61,86 +44,20 @@ def clean_gps_data(gps_data):
 def get_gps_location(image_file):
     """Extract GPS information from image metadata with robust error handling."""
     try:
-        # Handle both file objects and file paths
-        if hasattr(image_file, "read"):
-            # It's a file-like object, read it into bytes
-            image_bytes = image_file.read()
-            image_file.seek(0)  # Reset file pointer for later use
-            img = Image.open(io.BytesIO(image_bytes))
-        else:
-            img = Image.open(image_file)
-
-        # Try to get EXIF data safely
-        try:
-            exif = img._getexif()
-        except AttributeError:
-            # Fallback method if _getexif() is not available
-            exif = img.getexif()
-            if not exif:
-                return None
-
-        if not exif:
-            return None
-
-        gps_info = {}
-
-        # Find the GPS info tag
-        for tag_id in exif:
-            try:
-                tag = TAGS.get(tag_id, tag_id)
-                data = exif[tag_id]
-
-                if tag == "GPSInfo":
-                    for t in data:
-                        sub_tag = GPSTAGS.get(t, t)
-                        gps_info[sub_tag] = data[t]
-            except (KeyError, TypeError):
-                continue
-
-        if not gps_info:
-            return None
-
-        # Extract coordinates with validation
-        try:
-            lat_dms = gps_info.get("GPSLatitude")
-            lon_dms = gps_info.get("GPSLongitude")
-            lat_ref = gps_info.get("GPSLatitudeRef")
-            lon_ref = gps_info.get("GPSLongitudeRef")
-
-            if all([lat_dms, lon_dms, lat_ref, lon_ref]):
-                lat = get_decimal_coordinates(lat_dms)
-                lon = get_decimal_coordinates(lon_dms)
-
-                if lat is None or lon is None:
-                    return None
-
-                if lat_ref == "S":
-                    lat = -lat
-                if lon_ref == "W":
-                    lon = -lon
-
-                # Validate coordinate ranges
-                if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-                    st.warning("GPS coordinates are out of valid range")
-                    return None
-
-                # Convert altitude safely
-                altitude = gps_info.get("GPSAltitude")
-                if altitude:
-                    altitude = convert_to_float(altitude)
-
-                gps_data = {"latitude": lat, "longitude": lon, "altitude": altitude}
-                return clean_gps_data(gps_data)
-
-        except Exception as e:
-            st.warning(f"Error processing GPS coordinates: {str(e)}")
-            return None
-
+        metadata = extract_image_metadata(image_file)
     except Exception as e:
         st.warning(f"Error reading image metadata: {str(e)}")
         return None
 
-    return None
+    if metadata.gps is None:
+        return None
+
+    # Validate coordinate ranges
+    if not (-90 <= metadata.latitude <= 90) or not (-180 <= metadata.longitude <= 180):
+        st.warning("GPS coordinates are out of valid range")
+        return None
+
+    return clean_gps_data(metadata.gps)
 
 
 # Global flag to avoid spamming the same warning
@@ -152,61 +69,8 @@ def get_image_taken_time(image_file):
     global has_warned_about_date_taken
 
     try:
-        # Handle both file objects and file paths
-        if hasattr(image_file, "read"):
-            image_bytes = image_file.read()
-            image_file.seek(0)  # Reset file pointer
-            img = Image.open(io.BytesIO(image_bytes))
-        else:
-            img = Image.open(image_file)
-
-        # Try multiple methods to get EXIF data
-        exif_data_bytes = None
-
-        # Method 1: Try getting from info
-        if hasattr(img, "info") and "exif" in img.info:
-            exif_data_bytes = img.info["exif"]
-
-        # Method 2: Try getexif() method
-        if not exif_data_bytes:
-            try:
-                exif_dict = img.getexif()
-                if exif_dict:
-                    # Try to find DateTime tags
-                    for tag_id, value in exif_dict.items():
-                        tag_name = TAGS.get(tag_id, tag_id)
-                        if tag_name == "DateTimeOriginal":
-                            if isinstance(value, str):
-                                return datetime.strptime(
-                                    value, "%Y:%m:%d %H:%M:%S"
-                                ).date()
-            except Exception:
-                pass
-
-        if not exif_data_bytes:
-            return None
-
-        # Load EXIF data using piexif with error handling
-        try:
-            exif_data = piexif.load(exif_data_bytes)
-            date_taken = exif_data.get("Exif", {}).get(piexif.ExifIFD.DateTimeOriginal)
-
-            if date_taken:
-                # Handle both bytes and string types
-                if isinstance(date_taken, bytes):
-                    date_string = date_taken.decode("utf-8")
-                else:
-                    date_string = str(date_taken)
-
-                return datetime.strptime(date_string, "%Y:%m:%d %H:%M:%S").date()
-
-        except piexif.InvalidImageDataError:
-            # If piexif fails, try alternative method
-            pass
-        except Exception as e:
-            if not has_warned_about_date_taken:
-                st.warning(f"Error parsing EXIF date: {str(e)}")
-
+        date_taken = extract_image_metadata(image_file).date_taken
+        return date_taken.date() if date_taken else None
     except Exception as e:
         if not has_warned_about_date_taken:
             st.warning(f"Error extracting image date taken: {str(e)}")
@@ -238,7 +102,9 @@ def get_location_name(latitude, longitude):
         return f"Unable to retrieve location: {str(e)}"
 
 
-def save_location_data(image_file, disease_name, confidence, gps_data):
+def save_location_data(
+    image_file, disease_name, confidence, gps_data, image_hash=None, check_existing=False
+):
     """Save disease detection results along with GPS data and only add Date Taken if available."""
     try:
         # Extract date taken from the image
@@ -246,7 +112,12 @@ def save_location_data(image_file, disease_name, confidence, gps_data):
 
         # Save to database with or without timestamp
         response = save_detection_to_database(
-            disease_name, confidence, gps_data, date_taken
+            disease_name,
+            confidence,
+            gps_data,
+            date_taken,
+            image_hash=image_hash,
+            check_existing=check_existing,
         )
         return response
 
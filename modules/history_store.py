@@ -0,0 +1,229 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from modules.rollups import get_rollup_store, mark_detections_changed
+
+# Root of the Parquet snapshots; each export is a version directory
+# (v<ms>/year=YYYY/month=M/disease=NAME/*.parquet) and POINTER_FILE names the current one
+HISTORY_DIR = Path("data/history")
+POINTER_FILE = "CURRENT"
+
+# Seconds between scheduled exports
+EXPORT_INTERVAL = 10 * 60
+
+# Debounce after a new detection is saved before the next export runs
+EXPORT_DEBOUNCE = 30
+
+PARTITION_COLUMNS = ["year", "month", "disease"]
+
+# Sheet columns the snapshot is built from
+SHEET_COLUMNS = ["timestamp", "disease detected", "confidence", "latitude", "longitude", "altitude"]
+
+HISTORY_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("ms")),
+        ("disease detected", pa.string()),
+        ("confidence", pa.float32()),
+        ("latitude", pa.float64()),
+        ("longitude", pa.float64()),
+        ("altitude", pa.float32()),
+        ("year", pa.int16()),
+        ("month", pa.int8()),
+        ("disease", pa.string()),
+    ]
+)
+
+_stale = threading.Event()
+_scheduler_started = False
+_scheduler_lock = threading.Lock()
+
+
+def records_to_table(records):
+    """Convert Google Sheets records (list of dicts or a DataFrame) to an Arrow table with HISTORY_SCHEMA."""
+    df = pd.DataFrame(records)
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    for column in SHEET_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    for column in ["confidence", "latitude", "longitude", "altitude"]:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+    # Missing labels stay null rather than becoming the string "nan"
+    df["disease detected"] = df["disease detected"].astype("string").str.strip().replace("", pd.NA)
+
+    # Rows without a usable date land in year=0/month=0 so they are not lost
+    df["year"] = df["timestamp"].dt.year.fillna(0).astype("int16")
+    df["month"] = df["timestamp"].dt.month.fillna(0).astype("int8")
+    df["disease"] = df["disease detected"].str.strip().str.lower()
+
+    return pa.Table.from_pandas(
+        df[HISTORY_SCHEMA.names], schema=HISTORY_SCHEMA, preserve_index=False
+    )
+
+
+def _current_snapshot(root=HISTORY_DIR):
+    """Directory of the current snapshot version, or None when there is none."""
+    root = Path(root)
+    try:
+        name = (root / POINTER_FILE).read_text().strip()
+    except OSError:
+        return None
+    path = root / name
+    return path if name and path.is_dir() else None
+
+
+def export_history(records=None, root=HISTORY_DIR):
+    """Write the full detection history as a partitioned Parquet snapshot.
+
+    Each export goes to a new version directory under `root`, then the
+    pointer file is replaced atomically, so readers always find a complete
+    snapshot. The version it replaced is kept until the next export, for
+    readers still scanning it.
+    """
+    # Clear first so a detection saved while exporting re-marks the snapshot stale
+    _stale.clear()
+    if records is None:
+        from modules.database import fetch_detection_columns
+
+        records = fetch_detection_columns(SHEET_COLUMNS)
+
+    root = Path(root)
+    previous = _current_snapshot(root)
+    version = f"v{int(time.time() * 1000)}"
+    # Created up front: an empty sheet writes no files, but is still a valid snapshot
+    (root / version).mkdir(parents=True, exist_ok=True)
+
+    table = records_to_table(records if records is not None else [])
+    ds.write_dataset(
+        table,
+        root / version,
+        format="parquet",
+        partitioning=ds.partitioning(
+            HISTORY_SCHEMA.empty_table().select(PARTITION_COLUMNS).schema,
+            flavor="hive",
+        ),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+    pointer = root / f"{POINTER_FILE}.tmp"
+    pointer.write_text(version)
+    os.replace(pointer, root / POINTER_FILE)
+
+    # Older versions (and anything else left in the root) are no longer read
+    keep = {POINTER_FILE, version, previous.name if previous else None}
+    for path in root.iterdir():
+        if path.name not in keep:
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                path.unlink(missing_ok=True)
+
+    # Reconcile the incremental rollups with the full history (rows added elsewhere, edits)
+    try:
+        get_rollup_store().rebuild(table.to_pandas())
+    except Exception as e:
+        print(f"Error rebuilding detection rollups: {e}")
+    # The snapshot may carry edits or undated rows the rollups don't count
+    mark_detections_changed()
+    return table.num_rows
+
+
+def mark_history_stale():
+    """Flag the snapshot as behind the sheet; the scheduler re-exports shortly."""
+    _stale.set()
+
+
+def snapshot_available(root=HISTORY_DIR):
+    """True when a snapshot exists and no detection has been saved since it was written."""
+    return _current_snapshot(root) is not None and not _stale.is_set()
+
+
+def snapshot_time(root=HISTORY_DIR):
+    """When the current snapshot was swapped in (pointer mtime), or None."""
+    if _current_snapshot(root) is None:
+        return None
+    return (Path(root) / POINTER_FILE).stat().st_mtime
+
+
+def _build_filter(diseases=None, years=None, months=None, require_coordinates=False):
+    expression = None
+
+    def add(condition):
+        nonlocal expression
+        expression = condition if expression is None else expression & condition
+
+    if diseases:
+        add(ds.field("disease").isin([d.strip().lower() for d in diseases]))
+    if years:
+        add(ds.field("year").isin([int(y) for y in years]))
+    if months:
+        add(ds.field("month").isin([int(m) for m in months]))
+    if require_coordinates:
+        add(ds.field("latitude").is_valid() & ds.field("longitude").is_valid())
+    return expression
+
+
+def load_history(
+    columns=None,
+    diseases=None,
+    years=None,
+    months=None,
+    require_coordinates=False,
+    root=HISTORY_DIR,
+):
+    """Read the snapshot into a DataFrame, projecting `columns` and pushing filters down.
+
+    Partition filters (disease/year/month) prune whole directories; the
+    coordinate filter is evaluated against Parquet row-group statistics.
+    """
+    snapshot = _current_snapshot(root)
+    if snapshot is None:
+        raise FileNotFoundError(f"No history snapshot in {root}")
+    dataset = ds.dataset(
+        snapshot,
+        schema=HISTORY_SCHEMA,
+        format="parquet",
+        partitioning=ds.partitioning(
+            HISTORY_SCHEMA.empty_table().select(PARTITION_COLUMNS).schema,
+            flavor="hive",
+        ),
+    )
+    table = dataset.to_table(
+        columns=columns,
+        filter=_build_filter(diseases, years, months, require_coordinates),
+    )
+    return table.to_pandas()
+
+
+def _scheduler_loop(interval):
+    while True:
+        # Export right away when there is no snapshot yet; otherwise wake on the
+        # interval or early when a detection was saved, debouncing bursts of saves
+        if _current_snapshot(HISTORY_DIR) is not None:
+            if _stale.wait(timeout=interval):
+                time.sleep(EXPORT_DEBOUNCE)
+        try:
+            export_history()
+        except Exception as e:
+            print(f"Error exporting detection history: {e}")
+            time.sleep(EXPORT_DEBOUNCE)
+
+
+def start_export_scheduler(interval=EXPORT_INTERVAL):
+    """Start the background exporter thread once per process."""
+    global _scheduler_started
+    with _scheduler_lock:
+        if _scheduler_started:
+            return
+        _scheduler_started = True
+    threading.Thread(
+        target=_scheduler_loop, args=(interval,), daemon=True, name="history-export"
+    ).start()
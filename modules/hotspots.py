@@ -0,0 +1,293 @@
+import threading
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from modules.spatial_index import KM_PER_DEGREE
+
+# Detections count as neighbours within this distance and time of each other
+HOTSPOT_RADIUS_KM = 1.0
+HOTSPOT_WINDOW_DAYS = 14
+
+# Detections of one disease a grid cell needs to seed a hotspot
+HOTSPOT_MIN_DETECTIONS = 5
+
+# Bits per component of a packed cell key: disease | time | y | x
+_X_BITS = 19
+_Y_BITS = 19
+_T_BITS = 16
+
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _offsets(forward_only):
+    """Key deltas to the 26 cells around a cell (or the 13 "later" ones, to list each pair once)."""
+    deltas = []
+    for dt in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                if (dt, dy, dx) == (0, 0, 0):
+                    continue
+                if forward_only and (dt, dy, dx) < (0, 0, 0):
+                    continue
+                deltas.append((dt << (_Y_BITS + _X_BITS)) + (dy << _X_BITS) + dx)
+    return np.array(deltas, dtype=np.int64)
+
+
+_ALL_OFFSETS = _offsets(forward_only=False)
+_FORWARD_OFFSETS = _offsets(forward_only=True)
+
+
+def _components(n, src, dst):
+    """Connected-component label per node, by min-label propagation with pointer jumping."""
+    labels = np.arange(n, dtype=np.int64)
+    if not len(src):
+        return labels
+    while True:
+        low = np.minimum(labels[src], labels[dst])
+        updated = labels.copy()
+        np.minimum.at(updated, src, low)
+        np.minimum.at(updated, dst, low)
+        # Point every node at its label's label until the forest is flat
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+class HotspotModel:
+    """Spatio-temporal clusters of same-disease detections, DBSCAN-style on a grid.
+
+    Detections are bucketed into cells of radius/sqrt(2) km by
+    window_days per disease, so all detections in one cell are within
+    the radius and window of each other. A cell holding at least
+    `min_detections` is a core cell (every detection in it is a DBSCAN
+    core point); touching core cells (in space or the neighbouring time
+    windows) merge into one hotspot, and non-core cells touching a
+    hotspot join it as its border. Everything else is noise. This
+    approximates DBSCAN with eps = radius at cell resolution, in time
+    linear in the number of detections.
+
+    Only per-cell counts drive the clustering, so `add` folds new
+    detections into the counts and the (cheap, cell-level) clustering is
+    redone lazily on the next query.
+    """
+
+    def __init__(
+        self,
+        radius_km=HOTSPOT_RADIUS_KM,
+        window_days=HOTSPOT_WINDOW_DAYS,
+        min_detections=HOTSPOT_MIN_DETECTIONS,
+    ):
+        self.params = (radius_km, window_days, min_detections)
+        self.cell_km = radius_km / np.sqrt(2)
+        self.window_days = window_days
+        self.min_detections = min_detections
+        self.diseases = []
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lons = np.empty(0, dtype=np.float64)
+        self._days = np.empty(0, dtype=np.int64)
+        self._disease_codes = np.empty(0, dtype=np.int64)
+        self._keys = np.empty(0, dtype=np.int64)
+        self._cells = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._labels = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _cell_keys(self, lats, lons, days, disease_codes):
+        valid = ~(np.isnan(lats) | np.isnan(lons)) & (days >= 0) & (disease_codes >= 0)
+        lats, lons, days = np.where(valid, lats, 0.0), np.where(valid, lons, 0.0), np.maximum(days, 0)
+        disease_codes = np.maximum(disease_codes, 0)
+        rows = np.floor((lats + 90.0) * KM_PER_DEGREE / self.cell_km)
+        cols = np.floor((lons + 180.0) * KM_PER_DEGREE * np.cos(np.radians(lats)) / self.cell_km)
+        windows = np.floor_divide(days, self.window_days)
+        keys = (
+            (disease_codes << (_T_BITS + _Y_BITS + _X_BITS))
+            + (windows.astype(np.int64) << (_Y_BITS + _X_BITS))
+            + (rows.astype(np.int64) << _X_BITS)
+            + cols.astype(np.int64)
+        )
+        return np.where(valid, keys, -1)
+
+    def add(self, lats, lons, timestamps, diseases):
+        """Fold more detections into the model; undated, unplaced or unlabelled ones are ignored."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        dates = pd.to_datetime(pd.Series(timestamps), errors="coerce").to_numpy(dtype="datetime64[D]")
+        days = np.where(np.isnat(dates), -1, (dates - _EPOCH).astype(np.int64))
+
+        # Detections without a disease get code -1 and, like undated ones, stay noise
+        names = pd.Series(diseases, dtype=object).str.strip()
+        for name in pd.unique(names.dropna()):
+            if name not in self.diseases:
+                self.diseases.append(name)
+        lookup = {name: code for code, name in enumerate(self.diseases)}
+        disease_codes = names.map(lookup).fillna(-1).to_numpy(dtype=np.int64)
+
+        keys = self._cell_keys(lats, lons, days, disease_codes)
+
+        self._lats = np.concatenate([self._lats, lats])
+        self._lons = np.concatenate([self._lons, lons])
+        self._days = np.concatenate([self._days, days])
+        self._disease_codes = np.concatenate([self._disease_codes, disease_codes])
+        self._keys = np.concatenate([self._keys, keys])
+
+        # Merge the new per-cell counts into the existing ones
+        new_cells, new_counts = np.unique(keys[keys >= 0], return_counts=True)
+        cells = np.concatenate([self._cells, new_cells])
+        counts = np.concatenate([self._counts, new_counts])
+        self._cells, inverse = np.unique(cells, return_inverse=True)
+        self._counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        self._labels = None
+
+    def labels(self):
+        """Hotspot id per detection (-1 for noise), largest hotspot first."""
+        if self._labels is not None:
+            return self._labels
+
+        cells, counts = self._cells, self._counts
+        core = np.flatnonzero(counts >= self.min_detections)
+        core_keys = cells[core]
+
+        def neighbours(keys, offsets, targets):
+            src, dst = [], []
+            for offset in offsets:
+                wanted = keys + offset
+                pos = np.searchsorted(targets, wanted)
+                pos_clipped = np.minimum(pos, len(targets) - 1)
+                found = (pos < len(targets)) & (targets[pos_clipped] == wanted)
+                src.append(np.flatnonzero(found))
+                dst.append(pos[found])
+            if not src:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            return np.concatenate(src), np.concatenate(dst)
+
+        cell_labels = np.full(len(cells), -1, dtype=np.int64)
+        if len(core):
+            src, dst = neighbours(core_keys, _FORWARD_OFFSETS, core_keys)
+            cell_labels[core] = _components(len(core), src, dst)
+
+            # Border cells join the first hotspot they touch
+            sparse = np.flatnonzero(counts < self.min_detections)
+            src, dst = neighbours(cells[sparse], _ALL_OFFSETS, core_keys)
+            first = np.unique(src, return_index=True)[1]
+            cell_labels[sparse[src[first]]] = cell_labels[core[dst[first]]]
+
+        point_cells = np.searchsorted(cells, self._keys)
+        point_cells = np.minimum(point_cells, max(len(cells) - 1, 0))
+        labels = np.where(self._keys >= 0, cell_labels[point_cells] if len(cells) else -1, -1)
+
+        # Renumber 0..k-1 by size, largest first
+        clustered = labels >= 0
+        ids, sizes = np.unique(labels[clustered], return_counts=True)
+        order = ids[np.argsort(-sizes, kind="stable")]
+        remap = np.full(len(cells), -1, dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        labels[clustered] = remap[labels[clustered]]
+        self._labels = labels
+        return labels
+
+    def summary(self, min_size=None):
+        """One row per hotspot: disease, detections, first/last seen, centre and detections per week."""
+        labels = self.labels()
+        clustered = labels >= 0
+        if not clustered.any():
+            return pd.DataFrame(
+                columns=["hotspot", "disease", "detections", "first seen", "last seen",
+                         "latitude", "longitude", "per week"]
+            )
+        frame = pd.DataFrame(
+            {
+                "hotspot": labels[clustered],
+                "disease": np.asarray(self.diseases, dtype=object)[self._disease_codes[clustered]],
+                "day": self._days[clustered],
+                "latitude": self._lats[clustered],
+                "longitude": self._lons[clustered],
+            }
+        )
+        summary = frame.groupby("hotspot").agg(
+            disease=("disease", "first"),
+            detections=("day", "size"),
+            first_day=("day", "min"),
+            last_day=("day", "max"),
+            latitude=("latitude", "mean"),
+            longitude=("longitude", "mean"),
+        )
+        span_weeks = np.maximum((summary["last_day"] - summary["first_day"]) / 7.0, 1.0)
+        summary["per week"] = (summary["detections"] / span_weeks).round(1)
+        summary["first seen"] = _EPOCH + summary.pop("first_day").to_numpy().astype("timedelta64[D]")
+        summary["last seen"] = _EPOCH + summary.pop("last_day").to_numpy().astype("timedelta64[D]")
+        if min_size:
+            summary = summary[summary["detections"] >= min_size]
+        return summary.reset_index()[
+            ["hotspot", "disease", "detections", "first seen", "last seen",
+             "latitude", "longitude", "per week"]
+        ]
+
+    def outlines(self, hotspots=None):
+        """Convex hull per hotspot as {hotspot: (lats, lons)}, closed for drawing."""
+        labels = self.labels()
+        result = {}
+        wanted = np.unique(labels[labels >= 0]) if hotspots is None else hotspots
+        for hotspot in wanted:
+            members = labels == hotspot
+            points = np.unique(
+                np.column_stack([self._lons[members], self._lats[members]]), axis=0
+            ).astype(np.float32)
+            hull = cv2.convexHull(points).reshape(-1, 2) if len(points) >= 3 else points
+            hull = np.vstack([hull, hull[:1]])
+            result[int(hotspot)] = (hull[:, 1].astype(np.float64), hull[:, 0].astype(np.float64))
+        return result
+
+    def growth(self, hotspots=None, freq="W-SUN"):
+        """Cumulative detections per hotspot per week (starting Mondays), to plot how hotspots grew."""
+        labels = self.labels()
+        keep = labels >= 0 if hotspots is None else np.isin(labels, hotspots)
+        if not keep.any():
+            return pd.DataFrame(columns=["hotspot", "period", "detections"])
+        dates = _EPOCH + self._days[keep].astype("timedelta64[D]")
+        frame = pd.DataFrame(
+            {"hotspot": labels[keep], "period": pd.PeriodIndex(dates, freq=freq).start_time}
+        )
+        weekly = frame.groupby(["hotspot", "period"]).size().rename("detections").reset_index()
+        weekly["detections"] = weekly.groupby("hotspot")["detections"].cumsum()
+        return weekly
+
+
+_model = None
+_model_key = None
+_model_lock = threading.Lock()
+
+
+def get_hotspot_model(
+    df,
+    version,
+    radius_km=HOTSPOT_RADIUS_KM,
+    window_days=HOTSPOT_WINDOW_DAYS,
+    min_detections=HOTSPOT_MIN_DETECTIONS,
+):
+    """Process-wide HotspotModel over `df`, rebuilt when `version`, the row count or the parameters change.
+
+    `version` identifies the data (e.g. the rollups' `detections_version`).
+    `df` needs "latitude", "longitude", "timestamp" and "disease detected".
+    """
+    global _model, _model_key
+    key = (version, len(df), radius_km, window_days, min_detections)
+    with _model_lock:
+        if _model is None or _model_key != key:
+            model = HotspotModel(radius_km, window_days, min_detections)
+            model.add(
+                pd.to_numeric(df["latitude"], errors="coerce").to_numpy(dtype=np.float64),
+                pd.to_numeric(df["longitude"], errors="coerce").to_numpy(dtype=np.float64),
+                df["timestamp"],
+                df["disease detected"],
+            )
+            _model, _model_key = model, key
+        return _model
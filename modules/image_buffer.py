@@ -0,0 +1,82 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Decoded uploads kept per process; full-resolution buffers are large, so keep few
+DECODED_CACHE_SIZE = 4
+
+_decoded = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def decode_bytes(data):
+    """Decode encoded image bytes to a contiguous HxWx3 uint8 BGR array."""
+    # EXIF orientation is ignored to match how PIL-opened images were handled
+    image = cv2.imdecode(
+        np.frombuffer(data, dtype=np.uint8),
+        cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION,
+    )
+    if image is None:
+        # Formats OpenCV can't read (e.g. some WebP/BMP variants) go through PIL
+        with Image.open(io.BytesIO(data)) as img:
+            image = cv2.cvtColor(np.asarray(img.convert("RGB")), cv2.COLOR_RGB2BGR)
+    return np.ascontiguousarray(image)
+
+
+def decode_image(source_img):
+    """Return the shared decoded buffer for an upload.
+
+    The array is BGR (the channel order YOLO's predict and OpenCV drawing
+    expect for ndarrays), contiguous, and read-only: it is passed by
+    reference through predict, overlay drawing and display, and anything
+    that needs to draw must take a single working copy first.
+    """
+    data = source_img.getvalue() if hasattr(source_img, "getvalue") else source_img
+    key = hashlib.md5(data).hexdigest()
+    with _decoded_lock:
+        if key in _decoded:
+            _decoded.move_to_end(key)
+            return _decoded[key]
+
+    image = decode_bytes(data)
+    image.setflags(write=False)
+
+    with _decoded_lock:
+        _decoded[key] = image
+        while len(_decoded) > DECODED_CACHE_SIZE:
+            _decoded.popitem(last=False)
+    return image
+
+
+def working_copy(image):
+    """The one writable full-resolution copy an overlay is drawn on."""
+    return np.array(image, copy=True, order="C")
+
+
+def finish_for_display(canvas):
+    """Convert a BGR working copy to RGB in place for display and caching."""
+    cv2.cvtColor(canvas, cv2.COLOR_BGR2RGB, dst=canvas)
+    return canvas
+
+
+def estimate_decoded_bytes(source_img):
+    """Size of the decoded BGR buffer, read from the image header only."""
+    position = source_img.tell()
+    try:
+        source_img.seek(0)
+        with Image.open(source_img) as img:
+            width, height = img.size
+        return width * height * 3
+    finally:
+        source_img.seek(position)
+
+
+def decode_upload(source_img):
+    """Decode an upload without caching it and without copying its encoded bytes."""
+    with source_img.getbuffer() as view:
+        return decode_bytes(view)
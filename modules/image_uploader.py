@@ -2,10 +2,28 @@ from datetime import datetime
 from pydrive.auth import GoogleAuth
 from pydrive.drive import GoogleDrive
 from hashlib import md5
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from PIL import Image
 import streamlit as st
 from oauth2client.service_account import ServiceAccountCredentials
+import io
 import os
 import json
+import queue
+import threading
+import time
+from modules.drive_index import FOLDER_MIME_TYPE, get_drive_index
+from modules.image_buffer import decode_image
+from modules.memory_utils import MemoryBudget
+
+# Maximum number of Drive uploads in flight at once
+MAX_PARALLEL_UPLOADS = 8
+
+# One lock per (parent folder, title): parallel uploads into the same label
+# can't create duplicate folders, while different labels don't wait on each other
+_folder_locks = {}
+_folder_locks_guard = threading.Lock()
 
 
 # Authenticate and return a Google Drive instance using Streamlit Secrets
@@ -22,71 +40,366 @@ def authenticate_drive():
     return drive
 
 
-# Upload image to Google Drive in structured folders (Disease/Date)
-def upload_image(image_path, disease_label, drive, parent_folder_id):
-    # Step 1: Get or create disease folder
-    file_list = drive.ListFile(
-        {"q": f"'{parent_folder_id}' in parents and trashed=false"}
-    ).GetList()
-    disease_folder_id = None
+def thread_http(drive):
+    """A fresh authorized http client for one Drive call.
+
+    PyDrive shares a single httplib2 client, which is not thread-safe, so
+    every call made from an upload worker brings its own.
+    """
+    return drive.auth.Get_Http_Object()
+
+
+def _folder_lock(parent_id, title):
+    with _folder_locks_guard:
+        return _folder_locks.setdefault((parent_id, title.lower()), threading.Lock())
+
+
+def _get_or_create_folder(drive, title, parent_id, match_case=True):
+    """Return the id of the folder called `title` under `parent_id`, creating it if missing."""
+    with _folder_lock(parent_id, title):
+        return _find_or_create_folder(drive, title, parent_id, match_case)
+
+
+def _find_or_create_folder(drive, title, parent_id, match_case):
+    file_list = drive.ListFile({"q": f"'{parent_id}' in parents and trashed=false"})
+    file_list.http = thread_http(drive)
+    file_list = file_list.GetList()
     for file in file_list:
-        if (
-            file["title"].lower() == disease_label.lower()
-            and file["mimeType"] == "application/vnd.google-apps.folder"
-        ):
-            disease_folder_id = file["id"]
-            break
-
-    if not disease_folder_id:
-        folder_metadata = {
-            "title": disease_label,
-            "parents": [{"id": parent_folder_id}],
-            "mimeType": "application/vnd.google-apps.folder",
-        }
-        folder = drive.CreateFile(folder_metadata)
-        folder.Upload()
-        disease_folder_id = folder["id"]
+        file_title = file["title"] if match_case else file["title"].lower()
+        wanted = title if match_case else title.lower()
+        if file_title == wanted and file["mimeType"] == FOLDER_MIME_TYPE:
+            return file["id"]
 
-    # Step 2: Get or create date folder (MM-DD-YY)
+    folder_metadata = {
+        "title": title,
+        "parents": [{"id": parent_id}],
+        "mimeType": FOLDER_MIME_TYPE,
+    }
+    folder = drive.CreateFile(folder_metadata)
+    folder.Upload(param={"http": thread_http(drive)})
+    return folder["id"]
+
+
+def get_upload_folder(drive, disease_label, parent_folder_id):
+    """Return the id of the Disease/MM-DD-YY folder for today, creating folders as needed."""
     today = datetime.now().strftime("%m-%d-%y")
-    date_folders = drive.ListFile(
-        {"q": f"'{disease_folder_id}' in parents and trashed=false"}
-    ).GetList()
-    date_folder_id = None
-    for file in date_folders:
-        if (
-            file["title"] == today
-            and file["mimeType"] == "application/vnd.google-apps.folder"
-        ):
-            date_folder_id = file["id"]
-            break
-
-    if not date_folder_id:
-        date_metadata = {
-            "title": today,
-            "parents": [{"id": disease_folder_id}],
-            "mimeType": "application/vnd.google-apps.folder",
-        }
-        date_folder = drive.CreateFile(date_metadata)
-        date_folder.Upload()
-        date_folder_id = date_folder["id"]
+    # Step 1: Get or create disease folder
+    disease_folder_id = _get_or_create_folder(
+        drive, disease_label, parent_folder_id, match_case=False
+    )
+    # Step 2: Get or create date folder (MM-DD-YY)
+    date_folder_id = _get_or_create_folder(drive, today, disease_folder_id)
+    return date_folder_id, today
 
-    # Step 3: Upload with duplicate checking
-    with open(image_path, "rb") as f:
-        file_hash = md5(f.read()).hexdigest()
+
+def encode_image_for_upload(image):
+    """Encode a PIL image as JPEG bytes once, so every target folder receives identical content."""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def upload_bytes_for(source_img, image=None):
+    """Bytes to upload for an uploaded file: JPEGs as-is, anything else encoded once as JPEG.
+
+    Without a PIL `image` the shared decoded buffer (see image_buffer) is
+    encoded, so the file is not decoded a second time.
+    """
+    data = source_img.getvalue()
+    if data[:2] == b"\xff\xd8":
+        return data
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(decode_image(source_img)[..., ::-1])
+    return encode_image_for_upload(image)
+
+
+# md5 of the uploaded file's raw bytes -> md5 of the bytes that would be uploaded
+_fingerprints = OrderedDict()
+_FINGERPRINT_CACHE_SIZE = 256
+
+
+def upload_fingerprint(source_img):
+    """Content hash an upload of `source_img` would be stored under in Drive."""
+    raw_hash = md5(source_img.getvalue()).hexdigest()
+    fingerprint = _fingerprints.get(raw_hash)
+    if fingerprint is None:
+        fingerprint = md5(upload_bytes_for(source_img)).hexdigest()
+        _fingerprints[raw_hash] = fingerprint
+        if len(_fingerprints) > _FINGERPRINT_CACHE_SIZE:
+            _fingerprints.popitem(last=False)
+    return fingerprint
+
+
+def upload_image_bytes(image_bytes, disease_label, drive, parent_folder_id):
+    """Upload encoded image bytes to Disease/Date, skipping duplicates.
+
+    Duplicates are detected through the local content-hash index. Content
+    already stored under another disease is copied server-side rather than
+    uploaded again. Returns (status, file_id, message) where status is
+    "uploaded", "copied" or "skipped".
+    """
+    index = get_drive_index(drive, parent_folder_id)
+    file_hash = md5(image_bytes).hexdigest()
+
+    existing_id = index.lookup(file_hash, disease_label)
+    if existing_id:
+        return "skipped", existing_id, "⚠️ Skipped: Duplicate already exists."
+
+    source_id = index.lookup(file_hash)
+    if source_id:
+        return copy_uploaded_image(
+            source_id, file_hash, disease_label, drive, parent_folder_id
+        )
+
+    date_folder_id, today = get_upload_folder(drive, disease_label, parent_folder_id)
     filename = f"{disease_label}_{file_hash}.jpg"
 
-    existing_files = drive.ListFile(
+    file = drive.CreateFile(
         {
-            "q": f"'{date_folder_id}' in parents and trashed=false and title = '{filename}'"
+            "title": filename,
+            "parents": [{"id": date_folder_id}],
+            "mimeType": "image/jpeg",
         }
-    ).GetList()
+    )
+    file.content = io.BytesIO(image_bytes)
+    file.Upload(param={"http": thread_http(drive)})
+    index.record(file_hash, disease_label, file["id"])
+
+    return "uploaded", file["id"], f"✅ Uploaded: {filename} to {disease_label}/{today}/"
+
+
+def copy_uploaded_image(source_file_id, file_hash, disease_label, drive, parent_folder_id):
+    """Copy an already uploaded image into another disease folder on the Drive side.
 
-    if existing_files:
-        return f"⚠️ Skipped: Duplicate already exists."
+    Returns (status, file_id, message) where status is "copied" or "skipped".
+    """
+    index = get_drive_index(drive, parent_folder_id)
+    existing_id = index.lookup(file_hash, disease_label)
+    if existing_id:
+        return "skipped", existing_id, "⚠️ Skipped: Duplicate already exists."
 
-    file = drive.CreateFile({"title": filename, "parents": [{"id": date_folder_id}]})
-    file.SetContentFile(image_path)
-    file.Upload()
+    date_folder_id, today = get_upload_folder(drive, disease_label, parent_folder_id)
+    filename = f"{disease_label}_{file_hash}.jpg"
+
+    copied = (
+        drive.auth.service.files()
+        .copy(
+            fileId=source_file_id,
+            body={"title": filename, "parents": [{"id": date_folder_id}]},
+        )
+        .execute(http=thread_http(drive))
+    )
+    index.record(file_hash, disease_label, copied["id"])
+    return "copied", copied["id"], f"✅ Copied: {filename} to {disease_label}/{today}/"
+
+
+# Upload image to Google Drive in structured folders (Disease/Date)
+def upload_image(image_path, disease_label, drive, parent_folder_id):
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+    _, _, message = upload_image_bytes(
+        image_bytes, disease_label, drive, parent_folder_id
+    )
+    return message
+
+
+class DriveUploadPool:
+    """Bounded-concurrency Drive uploader.
+
+    Each submitted image is uploaded once; any further disease folders that
+    should receive the same bytes (in the same or a later submit) get a
+    server-side copy instead of a second upload. Workers never touch
+    Streamlit; the calling script reads finished uploads with `poll()` or
+    `results()` and reports progress itself.
+    """
+
+    def __init__(
+        self, drive, parent_folder_id, max_workers=MAX_PARALLEL_UPLOADS, max_queued_bytes=None
+    ):
+        self.drive = drive
+        self.parent_folder_id = parent_folder_id
+        self.cancel_event = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="drive-upload"
+        )
+        # Caps the encoded images held by queued uploads, by count and by bytes.
+        # It is the pool's own budget: waiting on it depends only on uploads
+        # finishing, never on the caller releasing memory
+        self.queued = MemoryBudget(
+            max_queued_bytes if max_queued_bytes is not None else float("inf"),
+            max_items=max_workers * 2,
+        )
+        self._sources = {}  # file hash -> Future resolving to the uploaded file id
+        self._submit_lock = threading.Lock()
+        self._completed = queue.Queue()
+        self._started = time.time()
+        self.total = 0
+        self.done = 0
+        self.bytes_sent = 0
+        self.counts = {"uploaded": 0, "copied": 0, "skipped": 0, "failed": 0, "cancelled": 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        self.close(wait=exc_type is None)
+        return False
+
+    def submit(self, image_bytes, disease_labels, key=None):
+        """Queue `image_bytes` for upload into each folder in `disease_labels`.
+
+        `key` is passed back on each result (e.g. to tie a failed upload to
+        its batch entry). Blocks while too many uploads are already waiting.
+        Safe to call from several threads.
+        """
+        if isinstance(disease_labels, str):
+            disease_labels = [disease_labels]
+        disease_labels = list(dict.fromkeys(disease_labels))
+        if not disease_labels:
+            return
+
+        file_hash = md5(image_bytes).hexdigest()
+        with self._submit_lock:
+            self.total += len(disease_labels)
+            source = self._sources.get(file_hash)
+            uploads_here = source is None
+            if uploads_here:
+                # Claim the hash now; the upload is queued once there is room
+                source = self._sources[file_hash] = Future()
+
+        if uploads_here:
+            self._start_upload(source, image_bytes, file_hash, disease_labels[0], key)
+            disease_labels = disease_labels[1:]
+
+        for label in disease_labels:
+            self._after_source(source, file_hash, label, key)
 
-    return f"✅ Uploaded: {filename} to {disease_label}/{today}/"
+    def _start_upload(self, source, image_bytes, file_hash, label, key):
+        held = self.queued.acquire(len(image_bytes))
+
+        def finished(upload):
+            self.queued.release(held)
+            failed = upload.cancelled() or upload.exception() is not None
+            source.set_result(None if failed else upload.result())
+
+        try:
+            upload = self._executor.submit(
+                self._upload_source, image_bytes, file_hash, label, key
+            )
+        except RuntimeError:  # the pool was closed while waiting for room
+            self.queued.release(held)
+            self._record(label, "cancelled", f"Cancelled: {label}", key=key)
+            source.set_result(None)
+            return
+        upload.add_done_callback(finished)
+
+    def _after_source(self, source, file_hash, label, key):
+        """Queue a copy into `label` once the source upload has finished.
+
+        Copies never occupy a worker while the source is still queued.
+        """
+
+        def start(_):
+            try:
+                self._executor.submit(self._copy_from_source, source, file_hash, label, key)
+            except RuntimeError:  # the pool is shutting down; finish it here
+                self._copy_from_source(source, file_hash, label, key)
+
+        source.add_done_callback(start)
+
+    def _record(self, label, status, message, sent=0, key=None):
+        self._completed.put(
+            {"label": label, "status": status, "message": message, "bytes": sent, "key": key}
+        )
+
+    def _upload_source(self, image_bytes, file_hash, label, key=None):
+        if self.cancel_event.is_set():
+            self._record(label, "cancelled", f"Cancelled: {label}", key=key)
+            return None
+        try:
+            status, file_id, message = upload_image_bytes(
+                image_bytes, label, self.drive, self.parent_folder_id
+            )
+        except Exception as e:
+            self._record(label, "failed", f"❌ Drive upload failed ({label}): {e}", key=key)
+            return None
+        self._record(
+            label, status, message, len(image_bytes) if status == "uploaded" else 0, key
+        )
+        return file_id
+
+    def _copy_from_source(self, source, file_hash, label, key=None):
+        source_id = source.result()
+        if self.cancel_event.is_set():
+            self._record(label, "cancelled", f"Cancelled: {label}", key=key)
+            return
+        if source_id is None:
+            self._record(
+                label, "failed", f"❌ Drive copy skipped ({label}): source upload failed", key=key
+            )
+            return
+        try:
+            status, _, message = copy_uploaded_image(
+                source_id, file_hash, label, self.drive, self.parent_folder_id
+            )
+        except Exception as e:
+            self._record(label, "failed", f"❌ Drive copy failed ({label}): {e}", key=key)
+            return
+        self._record(label, status, message, key=key)
+
+    def poll(self):
+        """Return uploads that finished since the last call, without blocking."""
+        finished = []
+        while True:
+            try:
+                result = self._completed.get_nowait()
+            except queue.Empty:
+                break
+            finished.append(self._account(result))
+        return finished
+
+    def results(self):
+        """Yield every remaining upload result in completion order until all are done."""
+        while self.done < self.total:
+            yield self._account(self._completed.get())
+
+    def _account(self, result):
+        self.done += 1
+        self.bytes_sent += result["bytes"]
+        self.counts[result["status"]] += 1
+        return result
+
+    def cancel(self):
+        """Stop starting new uploads; uploads already on the wire finish."""
+        self.cancel_event.set()
+        # Wake submitters waiting for room; their uploads are recorded as cancelled
+        self.queued.close()
+
+    def close(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def summary(self):
+        """Aggregate counts and throughput for everything processed so far."""
+        elapsed = max(time.time() - self._started, 1e-6)
+        return {
+            **self.counts,
+            "total": self.total,
+            "done": self.done,
+            "bytes": self.bytes_sent,
+            "seconds": elapsed,
+            "throughput_mbps": self.bytes_sent / elapsed / 1e6,
+        }
+
+
+def format_upload_summary(summary):
+    """One-line human readable description of a `DriveUploadPool.summary()`."""
+    return (
+        f"{summary['uploaded']} uploaded, {summary['copied']} copied, "
+        f"{summary['skipped']} skipped, {summary['failed']} failed — "
+        f"{summary['bytes'] / 1e6:.1f} MB in {summary['seconds']:.1f}s "
+        f"({summary['throughput_mbps']:.2f} MB/s)"
+    )
@@ -0,0 +1,273 @@
+import json
+import shutil
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from contextlib import closing
+from pathlib import Path
+
+# Queue database and per-job input files
+JOBS_DIR = Path("data/jobs")
+JOBS_DB = JOBS_DIR / "jobs.sqlite3"
+
+# Seconds an idle worker sleeps before looking for queued jobs again
+POLL_INTERVAL = 2.0
+
+# Jobs run at a time per process; detection jobs are CPU/GPU bound
+DEFAULT_WORKERS = 1
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = {DONE, FAILED, CANCELLED}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    name TEXT,
+    status TEXT,
+    detail TEXT,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised by a handler that stopped because cancellation was requested."""
+
+
+class JobQueue:
+    """Persistent job queue in a local SQLite database.
+
+    Jobs survive browser sessions and app restarts: any session can
+    submit, poll, cancel and read results by job id. Each call opens its
+    own connection, so the queue is safe to share across threads.
+    """
+
+    def __init__(self, path=JOBS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql, args=()):
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, args).rowcount
+
+    def input_dir(self, job_id):
+        """Folder holding a job's input files."""
+        return self.path.parent / job_id
+
+    def submit(self, kind, params, total=0, job_id=None):
+        """Queue a job and return its id. Inputs go in `input_dir(job_id)` beforehand."""
+        job_id = job_id or new_job_id()
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, params, created, progress_total) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, json.dumps(params), time.time(), total),
+        )
+        return job_id
+
+    def get(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def list_jobs(self, limit=20):
+        """Most recent jobs first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def claim_next(self):
+        """Atomically move the oldest queued job to running and return it, or None."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND cancel_requested = 0 "
+                "ORDER BY created LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, started = ? WHERE id = ?",
+                (RUNNING, time.time(), row["id"]),
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def update_progress(self, job_id, done, total=None, message=None):
+        self._execute(
+            "UPDATE jobs SET progress_done = ?, "
+            "progress_total = COALESCE(?, progress_total), message = COALESCE(?, message) "
+            "WHERE id = ?",
+            (done, total, message, job_id),
+        )
+
+    def add_result(self, job_id, name, status, **detail):
+        """Append one per-item result (e.g. one image of a batch)."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO job_results (job_id, seq, name, status, detail) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM job_results WHERE job_id = ?",
+                (job_id, name, status, json.dumps(detail), job_id),
+            )
+
+    def results(self, job_id):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT name, status, detail FROM job_results WHERE job_id = ? ORDER BY seq",
+                (job_id,),
+            ).fetchall()
+        return [
+            {"name": row["name"], "status": row["status"], **json.loads(row["detail"] or "{}")}
+            for row in rows
+        ]
+
+    def finish(self, job_id, status, result=None, error=None):
+        self._execute(
+            "UPDATE jobs SET status = ?, finished = ?, result = ?, error = ? WHERE id = ?",
+            (status, time.time(), json.dumps(result) if result is not None else None, error, job_id),
+        )
+
+    def request_cancel(self, job_id):
+        """Cancel a queued job now; ask a running one to stop at its next check."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            never_started = conn.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            ).rowcount
+            conn.execute("COMMIT")
+        if never_started:
+            shutil.rmtree(self.input_dir(job_id), ignore_errors=True)
+
+    def resubmit(self, job_id):
+        """Queue a failed job again with the inputs it kept; False if it isn't a failed job.
+
+        Its earlier per-item results are dropped; handlers resume from what
+        finished (see BatchManifest).
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, started = NULL, finished = NULL, error = NULL, "
+                "result = NULL, progress_done = 0, message = NULL, created = ? "
+                "WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, FAILED),
+            ).rowcount
+            if requeued:
+                conn.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+            conn.execute("COMMIT")
+        return bool(requeued)
+
+    def is_cancel_requested(self, job_id):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def requeue_interrupted(self):
+        """Put jobs left running by a process that died back in the queue (or cancel them, if asked)."""
+        return self._execute(
+            "UPDATE jobs SET status = CASE WHEN cancel_requested THEN ? ELSE ? END, "
+            "started = NULL WHERE status = ?",
+            (CANCELLED, QUEUED, RUNNING),
+        )
+
+
+def new_job_id():
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+
+
+def _job_from_row(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"]) if job["params"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    return job
+
+
+def _worker_loop(queue, handlers, stop_event):
+    while not stop_event.is_set():
+        job = queue.claim_next()
+        if job is None:
+            stop_event.wait(POLL_INTERVAL)
+            continue
+
+        handler = handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind {job['kind']!r}")
+            result = handler(job, queue)
+        except JobCancelled:
+            queue.finish(job["id"], CANCELLED)
+        except Exception as e:
+            traceback.print_exc()
+            queue.finish(job["id"], FAILED, error=str(e))
+            continue  # keep inputs so the job can be resubmitted (JobQueue.resubmit)
+        else:
+            queue.finish(job["id"], DONE, result=result)
+        shutil.rmtree(queue.input_dir(job["id"]), ignore_errors=True)
+
+
+_workers_started = False
+_workers_lock = threading.Lock()
+
+
+def start_job_workers(handlers, queue=None, workers=DEFAULT_WORKERS):
+    """Start the background worker threads once per process.
+
+    `handlers` maps a job kind to `handler(job, queue) -> result`. Jobs left
+    running by a previous process are requeued first; handlers are expected
+    to resume rather than redo work (see BatchManifest).
+    """
+    global _workers_started
+    with _workers_lock:
+        if _workers_started:
+            return
+        _workers_started = True
+
+    queue = queue or JobQueue()
+    queue.requeue_interrupted()
+    stop_event = threading.Event()
+    for n in range(workers):
+        threading.Thread(
+            target=_worker_loop,
+            args=(queue, handlers, stop_event),
+            daemon=True,
+            name=f"job-worker-{n}",
+        ).start()
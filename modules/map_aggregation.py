@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+# At this zoom and closer, detections are drawn as individual markers
+POINTS_MIN_ZOOM = 13
+
+# Most markers sent to the browser in any mode; larger results are aggregated (more coarsely)
+MAX_MAP_POINTS = 5000
+
+# Grid cells per 256 px map tile; 8 gives cells about 32 px across at the chosen zoom
+CELLS_PER_TILE = 8
+
+
+def cell_size_degrees(zoom):
+    """Grid cell edge, in degrees, that draws about 256 / CELLS_PER_TILE px wide at `zoom`."""
+    return 360.0 / (2 ** zoom) / CELLS_PER_TILE
+
+
+def aggregate_points(
+    df,
+    zoom,
+    lat="latitude",
+    lon="longitude",
+    category="disease detected",
+    max_points=MAX_MAP_POINTS,
+):
+    """Reduce detections to what the map can usefully draw at `zoom`.
+
+    Returns (frame, mode). At POINTS_MIN_ZOOM and closer, when at most
+    `max_points` rows remain, `df` is returned as-is with mode "points".
+    Otherwise rows are binned into a lat/lon grid sized for the zoom (see
+    cell_size_degrees), doubling the cell size until at most `max_points`
+    cells remain, and mode is "cells". Each cell row has its centroid
+    (`lat`, `lon`), "count", the most frequent `category` ("dominant"),
+    its share of the cell ("dominant share"), "mean confidence" and
+    "cell size" in degrees.
+    """
+    if zoom >= POINTS_MIN_ZOOM and len(df) <= max_points:
+        return df, "points"
+
+    lats = pd.to_numeric(df[lat], errors="coerce").to_numpy(dtype=np.float64)
+    lons = pd.to_numeric(df[lon], errors="coerce").to_numpy(dtype=np.float64)
+    valid = ~(np.isnan(lats) | np.isnan(lons))
+    lats, lons = lats[valid], lons[valid]
+    categories = df[category].to_numpy()[valid]
+    if "confidence" in df.columns:
+        confidence = pd.to_numeric(df["confidence"], errors="coerce").to_numpy(dtype=np.float64)[valid]
+    else:
+        confidence = np.full(len(lats), np.nan)
+    if not len(lats):
+        columns = [lat, lon, "count", "dominant", "dominant share", "mean confidence", "cell size"]
+        return pd.DataFrame(columns=columns), "cells"
+
+    # Grid indices at the zoom's resolution; each coarsening step halves them
+    size = cell_size_degrees(zoom)
+    rows = np.floor((lats + 90.0) / size).astype(np.int64)
+    cols = np.floor((lons + 180.0) / size).astype(np.int64)
+    while True:
+        codes, cells = pd.factorize(rows * (int(360.0 / size) + 1) + cols)
+        if len(cells) <= max_points:
+            break
+        rows >>= 1
+        cols >>= 1
+        size *= 2
+
+    n_cells = len(cells)
+    counts = np.bincount(codes, minlength=n_cells)
+
+    # Dominant category from one (cell, category) count matrix; missing
+    # categories (code -1) count towards a cell's size but never dominate it
+    category_codes, category_names = pd.factorize(categories)
+    known = category_codes >= 0
+    n_categories = max(len(category_names), 1)
+    per_category = np.bincount(
+        codes[known] * n_categories + category_codes[known],
+        minlength=n_cells * n_categories,
+    ).reshape(n_cells, n_categories)
+    dominant = per_category.argmax(axis=1)
+    dominant_count = per_category[np.arange(n_cells), dominant]
+    names = np.append(np.asarray(category_names, dtype=object), None)[:n_categories]
+
+    has_confidence = ~np.isnan(confidence)
+    confidence_sum = np.bincount(
+        codes, weights=np.where(has_confidence, confidence, 0.0), minlength=n_cells
+    )
+    confidence_count = np.bincount(codes, weights=has_confidence, minlength=n_cells)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_confidence = confidence_sum / confidence_count
+
+    cell_frame = pd.DataFrame(
+        {
+            lat: np.bincount(codes, weights=lats, minlength=n_cells) / counts,
+            lon: np.bincount(codes, weights=lons, minlength=n_cells) / counts,
+            "count": counts,
+            "dominant": np.where(dominant_count > 0, names[dominant], None),
+            "dominant share": dominant_count / counts,
+            "mean confidence": np.round(mean_confidence, 1),
+            "cell size": size,
+        }
+    )
+    return cell_frame, "cells"
@@ -0,0 +1,211 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from modules.database import fetch_detection_columns
+from modules.history_store import load_history, snapshot_available, snapshot_time
+from modules.rollups import get_rollup_store
+
+# Largest offset (degrees, about 11 m) applied to markers sharing a coordinate
+JITTER_DEGREES = 0.0001
+
+# Fixed key for the row hashes the jitter is drawn from; changing it moves every marker
+JITTER_HASH_KEY = "leafdiseasemap01"
+
+# Columns of the typed detection table, as read from the snapshot or the sheet
+DETECTION_COLUMNS = ["timestamp", "disease detected", "confidence", "latitude", "longitude"]
+
+# Date format detections are written to the sheet with; anything else is parsed the slow way
+SHEET_DATE_FORMAT = "%Y-%m-%d"
+
+
+def jitter_coordinates(df, lat="latitude", lon="longitude", amount=JITTER_DEGREES):
+    """Display coordinates that spread out markers stacked on the same point.
+
+    Rows alone at their coordinate are left in place. Rows sharing one are
+    offset by up to `amount` degrees in each direction, drawn from a hash
+    of the coordinate and the row's position within its group, so the same
+    data always produces the same map and markers don't jump on reruns.
+    Runs in a single vectorized pass. Returns (display_lat, display_lon)
+    as Series aligned with `df`.
+    """
+    lats = pd.to_numeric(df[lat], errors="coerce")
+    lons = pd.to_numeric(df[lon], errors="coerce")
+    points = pd.DataFrame({"lat": lats, "lon": lons}, index=df.index)
+
+    grouped = points.groupby(["lat", "lon"], sort=False, dropna=False)
+    stacked = ((grouped["lat"].transform("size") > 1) & lats.notna() & lons.notna()).to_numpy()
+    points["rank"] = grouped.cumcount().astype(np.int64)
+
+    hashes = pd.util.hash_pandas_object(points, index=False, hash_key=JITTER_HASH_KEY).to_numpy()
+    # Two independent uniforms in [-1, 1) from the low and high 32 bits of each hash
+    scale = np.float64(2.0 / 2**32)
+    low = (hashes & np.uint64(0xFFFFFFFF)).astype(np.float64) * scale - 1.0
+    high = (hashes >> np.uint64(32)).astype(np.float64) * scale - 1.0
+
+    display_lat = lats + np.where(stacked, low * amount, 0.0)
+    display_lon = lons + np.where(stacked, high * amount, 0.0)
+    return display_lat, display_lon
+
+
+class DetectionFilter:
+    """Row selection over a detections DataFrame through precomputed codes.
+
+    Disease is encoded once as categorical codes and year/month as small
+    integers (-1 when the date is missing), so a filter is a comparison
+    on a compact array; each (column, value) mask is computed once and
+    reused. Callers take only the selected rows (`df.iloc[positions]`)
+    instead of copying and boolean-indexing the whole frame.
+    """
+
+    def __init__(self, df, disease="disease detected", timestamp="timestamp"):
+        self.df = df
+        diseases = df[disease].astype("category")
+        self.categories = diseases.cat.categories
+        timestamps = pd.to_datetime(df[timestamp], errors="coerce")
+        self._timestamps = timestamps.to_numpy(dtype="datetime64[ns]")
+        self._codes = {
+            "disease": diseases.cat.codes.to_numpy(),
+            "year": timestamps.dt.year.fillna(-1).to_numpy(dtype=np.int16),
+            "month": timestamps.dt.month.fillna(-1).to_numpy(dtype=np.int8),
+        }
+        self._masks = {}
+
+    def mask(self, column, value):
+        """Cached boolean mask of rows whose `column` ("disease", "year", "month") equals `value`."""
+        key = (column, value)
+        if key not in self._masks:
+            if column == "disease":
+                code = self.categories.get_loc(value) if value in self.categories else -2
+            else:
+                code = int(value)
+            self._masks[key] = self._codes[column] == code
+        return self._masks[key]
+
+    def positions(self, disease=None, year=None, month=None, since=None, within=None):
+        """Row positions matching every given filter, in ascending order.
+
+        `within` restricts the result to these positions (e.g. a spatial
+        query's result); `since` keeps rows dated at or after it.
+        """
+        keep = None
+        for column, value in (("disease", disease), ("year", year), ("month", month)):
+            if value is not None:
+                mask = self.mask(column, value)
+                keep = mask if keep is None else keep & mask
+        if since is not None:
+            recent = self._timestamps >= np.datetime64(pd.Timestamp(since))
+            keep = recent if keep is None else keep & recent
+
+        if within is None:
+            return np.flatnonzero(keep) if keep is not None else np.arange(len(self.df))
+        within = np.sort(np.asarray(within, dtype=np.int64))
+        return within if keep is None else within[keep[within]]
+
+    def colors(self, positions, palette, default="#646464"):
+        """Hex color per selected row, looked up once per disease rather than per row."""
+        lookup = np.array(
+            [palette.get(str(name).lower(), default) for name in self.categories] + [default],
+            dtype=object,
+        )
+        # Code -1 (missing disease) indexes the trailing default
+        return lookup[self._codes["disease"][positions]]
+
+
+def _parse_timestamps(values):
+    """datetime64 timestamps, parsing the sheet's own date format in one fast pass."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("datetime64[ns]")
+    parsed = pd.to_datetime(values, format=SHEET_DATE_FORMAT, errors="coerce")
+    # Hand-entered rows in other formats; "N/A" (no EXIF date) stays missing
+    text = values.astype(str).str.strip()
+    retry = parsed.isna() & values.notna() & (text != "") & (text != "N/A")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(text[retry], errors="coerce", format="mixed")
+    return parsed
+
+
+def typed_detections(df):
+    """The detection table with compact dtypes, from raw sheet records or the snapshot.
+
+    Keeps DETECTION_COLUMNS only: "disease detected" as a category
+    (missing when blank), "timestamp" as datetime64, and
+    "confidence"/"latitude"/"longitude" as float32 (about 1 m of
+    precision at these coordinates). Adds
+    "year"/"month" (small ints, -1 when undated) and the jittered
+    "display_lat"/"display_long". Raises ValueError naming what is
+    missing when a required column is absent.
+    """
+    df = df.rename(columns=lambda col: str(col).strip().lower())
+    required_columns = ["disease detected", "confidence", "latitude", "longitude"]
+    if not all(col in df.columns for col in required_columns):
+        raise ValueError(
+            "Invalid data format in Google Sheets. Please check column names. "
+            f"Found columns: {df.columns.tolist()}"
+        )
+    if "timestamp" not in df.columns:
+        raise ValueError("Missing 'timestamp' column in the dataset.")
+
+    timestamps = _parse_timestamps(df["timestamp"])
+    # Missing (or blank) diseases stay missing, i.e. categorical code -1
+    diseases = df["disease detected"].astype(object).str.strip().replace("", np.nan)
+    table = pd.DataFrame(
+        {
+            "timestamp": timestamps.to_numpy(),
+            "disease detected": pd.Categorical(diseases),
+        }
+    )
+    for column in ["confidence", "latitude", "longitude"]:
+        table[column] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float32)
+    table["year"] = table["timestamp"].dt.year.fillna(-1).astype(np.int16)
+    table["month"] = table["timestamp"].dt.month.fillna(-1).astype(np.int8)
+
+    # Spread out markers stacked on the same coordinate; stable across reruns
+    display_lat, display_lon = jitter_coordinates(table)
+    table["display_lat"] = display_lat.to_numpy(dtype=np.float32)
+    table["display_long"] = display_lon.to_numpy(dtype=np.float32)
+    return table
+
+
+_table = None
+_table_key = None
+_table_filter = None
+_table_lock = threading.Lock()
+
+
+def load_detections():
+    """Process-wide typed detection table (see typed_detections), parsed once per data change.
+
+    Read from the Parquet snapshot when it is current, otherwise from
+    Google Sheets. The parsed table is reused until the snapshot is
+    rewritten or `detections_version` moves (a detection was saved or the
+    snapshot re-exported), so reruns skip both the fetch and the parsing.
+    Callers must treat the returned frame as read-only.
+    """
+    global _table, _table_key, _table_filter
+    if snapshot_available():
+        key = ("snapshot", snapshot_time(), get_rollup_store().detections_version())
+    else:
+        key = ("sheet", get_rollup_store().detections_version())
+    with _table_lock:
+        if _table is None or _table_key != key:
+            if key[0] == "snapshot":
+                raw = load_history(columns=DETECTION_COLUMNS)
+            else:
+                raw = fetch_detection_columns(DETECTION_COLUMNS)
+            _table = typed_detections(raw) if len(raw) else pd.DataFrame()
+            _table_key = key
+            _table_filter = None
+        return _table
+
+
+def get_detection_filter(df):
+    """DetectionFilter over `df`, kept (with its cached masks) while `df` is the loaded table."""
+    global _table_filter
+    with _table_lock:
+        if df is not _table:
+            return DetectionFilter(df)
+        if _table_filter is None:
+            _table_filter = DetectionFilter(df)
+        return _table_filter
@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import pandas as pd
+
+# Most histogram bins along either axis; wide extents get coarser cells instead
+HEATMAP_MAX_BINS = 160
+
+# Gaussian smoothing of the histogram, in cells (0 draws the raw counts)
+HEATMAP_SMOOTHING_CELLS = 1.5
+
+# Cells below this share of the peak density are not sent to the browser
+HEATMAP_MIN_SHARE = 0.02
+
+# Most cells in one heatmap layer
+HEATMAP_MAX_CELLS = 5000
+
+
+def density_grid(
+    lats,
+    lons,
+    cell_degrees,
+    max_bins=HEATMAP_MAX_BINS,
+    smoothing=HEATMAP_SMOOTHING_CELLS,
+    min_share=HEATMAP_MIN_SHARE,
+    max_cells=HEATMAP_MAX_CELLS,
+):
+    """Smoothed detection density on a lat/lon grid, as a compact cell table.
+
+    Points are binned with one 2D histogram over their extent (padded by
+    the smoothing width) at `cell_degrees`, coarsened as needed to stay
+    within `max_bins` per axis, then blurred with a Gaussian kernel.
+    Returns (cells, cell_degrees_used): cells has "latitude", "longitude"
+    (cell centres) and "density" for the `max_cells` densest cells at or
+    above `min_share` of the peak.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    valid = ~(np.isnan(lats) | np.isnan(lons))
+    lats, lons = lats[valid], lons[valid]
+    if not len(lats):
+        return pd.DataFrame(columns=["latitude", "longitude", "density"]), cell_degrees
+
+    pad = cell_degrees * (3 * smoothing + 1)
+    south, north = lats.min() - pad, lats.max() + pad
+    west, east = lons.min() - pad, lons.max() + pad
+    cell = max(cell_degrees, (north - south) / max_bins, (east - west) / max_bins)
+    lat_bins = max(1, int(np.ceil((north - south) / cell)))
+    lon_bins = max(1, int(np.ceil((east - west) / cell)))
+
+    counts, lat_edges, lon_edges = np.histogram2d(
+        lats,
+        lons,
+        bins=[lat_bins, lon_bins],
+        range=[[south, south + lat_bins * cell], [west, west + lon_bins * cell]],
+    )
+    density = counts.astype(np.float32)
+    if smoothing:
+        density = cv2.GaussianBlur(density, (0, 0), sigmaX=smoothing, borderType=cv2.BORDER_CONSTANT)
+
+    flat = density.ravel()
+    keep = np.flatnonzero(flat >= flat.max() * min_share)
+    if len(keep) > max_cells:
+        keep = keep[np.argpartition(flat[keep], -max_cells)[-max_cells:]]
+    rows, cols = np.unravel_index(keep, density.shape)
+
+    cells = pd.DataFrame(
+        {
+            "latitude": (lat_edges[rows] + lat_edges[rows + 1]) / 2,
+            "longitude": (lon_edges[cols] + lon_edges[cols + 1]) / 2,
+            "density": flat[keep],
+        }
+    )
+    return cells, cell
+
+
+def heatmap_radius_px(cell_degrees, zoom):
+    """Marker radius (px) that makes neighbouring heatmap cells blend at `zoom`."""
+    # Web Mercator: 256 px span 360 degrees of longitude at zoom 0
+    px = cell_degrees / 360.0 * 256 * 2 ** zoom
+    return int(np.clip(px * 1.5, 4, 60))
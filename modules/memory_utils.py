@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+
+@contextmanager
+def track_peak_memory(enabled=True):
+    """Measure the peak of traced allocations (NumPy buffers included) inside the block.
+
+    Yields a dict whose "peak_bytes" is filled in when the block exits, or
+    left at 0 when `enabled` is false. Tracing is process-wide and slows
+    allocation-heavy code, so keep it to debugging and benchmarks. Buffers
+    allocated by native libraries (OpenCV, torch) are not traced.
+    """
+    stats = {"peak_bytes": 0}
+    if not enabled:
+        yield stats
+        return
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        yield stats
+    finally:
+        stats["peak_bytes"] = max(0, tracemalloc.get_traced_memory()[1] - baseline)
+        if started_here:
+            tracemalloc.stop()
+
+
+def format_bytes(num_bytes):
+    """Human readable size, e.g. 12.3 MB."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None where it can't be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+
+        # ru_maxrss is the lifetime peak (KB on Linux, bytes on macOS): best effort
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == "darwin" else usage * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class RssSampler:
+    """Samples process RSS in a background thread to report the peak over a block.
+
+    Usage: `with RssSampler() as rss: ...` then read `rss.peak_bytes`.
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.start_bytes = None
+        self.peak_bytes = None
+        self.end_bytes = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak_bytes is None or rss > self.peak_bytes):
+            self.peak_bytes = rss
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start_bytes = self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="rss-sampler")
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.end_bytes = self._sample()
+        return False
+
+    def report(self):
+        if self.peak_bytes is None:
+            return "Peak RSS unavailable on this platform"
+        return (
+            f"Peak RSS {format_bytes(self.peak_bytes)} "
+            f"(start {format_bytes(self.start_bytes)}, end {format_bytes(self.end_bytes)})"
+        )
+
+
+class MemoryBudget:
+    """Caps the bytes (and number of items) held by in-flight work.
+
+    `acquire(n)` blocks until `n` more bytes fit under the budget and one
+    more item fits under `max_items`, then returns a token for `release`.
+    A request larger than the whole budget is let through once nothing
+    else is held, so it cannot wait forever. Each holder must release
+    before acquiring again, and a budget must not be shared by stages
+    that wait on each other; give each such stage its own budget.
+    """
+
+    def __init__(self, budget_bytes, max_items=None):
+        self.budget_bytes = budget_bytes
+        self.max_items = max_items
+        self.in_use = 0
+        self.items = 0
+        self.peak_in_use = 0
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def _fits(self, num_bytes):
+        if self.closed or self.items == 0:
+            return True
+        if self.max_items is not None and self.items >= self.max_items:
+            return False
+        return self.in_use + num_bytes <= self.budget_bytes
+
+    def acquire(self, num_bytes, timeout=None):
+        """Wait for room for `num_bytes`; returns the token, or None on timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._fits(num_bytes), timeout):
+                return None
+            self.in_use += num_bytes
+            self.items += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+        return num_bytes
+
+    def release(self, token):
+        with self._condition:
+            self.in_use -= token
+            self.items -= 1
+            self._condition.notify_all()
+
+    def close(self):
+        """Stop enforcing the budget and wake every waiter (e.g. when a batch is abandoned)."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
@@ -0,0 +1,184 @@
+import queue
+import threading
+import time
+
+# Default capacity of the queue in front of each stage
+DEFAULT_QUEUE_SIZE = 8
+
+_DONE = object()
+
+
+class Stage:
+    """One step of a StagedPipeline.
+
+    `func(item)` returns the item to pass downstream, or None to drop it.
+    `workers` threads run the stage concurrently.
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=None):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue_size = queue_size
+
+
+class Failed:
+    """An item whose processing raised; carried to the end of the pipeline untouched."""
+
+    def __init__(self, item, stage, error):
+        self.item = item
+        self.stage = stage
+        self.error = error
+
+    def __repr__(self):
+        return f"Failed(stage={self.stage!r}, error={self.error!r})"
+
+
+class StagedPipeline:
+    """Threads connected by bounded queues.
+
+    Items flow through the stages in order; each stage's input queue is
+    bounded, so a slow stage back-pressures the ones before it instead of
+    letting work pile up in memory. Results are yielded in completion
+    order.
+    """
+
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.cancel_event = threading.Event()
+        self.busy_seconds = {stage.name: 0.0 for stage in stages}
+        self.processed = 0
+        self.failed = 0
+        self.elapsed = 0.0
+        self._stats_lock = threading.Lock()
+        self._threads = []
+
+    def cancel(self):
+        """Stop feeding new items; items already inside the pipeline still drain."""
+        self.cancel_event.set()
+
+    def _feed(self, items, out_queue):
+        try:
+            for item in items:
+                if self.cancel_event.is_set():
+                    break
+                out_queue.put(item)
+        except Exception as e:
+            out_queue.put(Failed(None, "enumerate", e))
+        finally:
+            out_queue.put(_DONE)
+
+    def _work(self, stage, in_queue, out_queue, remaining):
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                # Let sibling workers see the sentinel too; the last one forwards it
+                in_queue.put(_DONE)
+                with self._stats_lock:
+                    remaining[stage.name] -= 1
+                    last = remaining[stage.name] == 0
+                if last:
+                    out_queue.put(_DONE)
+                return
+
+            if self.cancel_event.is_set():
+                # Drain without doing work so the threads can exit
+                continue
+
+            if isinstance(item, Failed):
+                out_queue.put(item)
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                result = Failed(item, stage.name, e)
+            with self._stats_lock:
+                self.busy_seconds[stage.name] += time.perf_counter() - started
+
+            if result is not None:
+                out_queue.put(result)
+
+    def is_alive(self):
+        """True while any feed or stage thread of the last run is still running."""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def run(self, items, poll_interval=None):
+        """Yield each finished item (or Failed) as soon as it leaves the last stage.
+
+        With `poll_interval` (seconds), None is yielded whenever nothing has
+        finished for that long, so the caller can check for cancellation
+        while a slow stage works. RuntimeError is raised if every stage
+        thread has exited without finishing the run.
+        """
+        queues = [
+            queue.Queue(maxsize=stage.queue_size or self.queue_size)
+            for stage in self.stages
+        ]
+        # The output queue is unbounded so the stages can always drain, even
+        # if the consumer stops early; its size is still bounded by the
+        # capacity of the queues in front of it
+        queues.append(queue.Queue())
+        remaining = {stage.name: stage.workers for stage in self.stages}
+
+        self._threads = [
+            threading.Thread(
+                target=self._feed, args=(items, queues[0]), daemon=True, name="pipeline-feed"
+            )
+        ]
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                self._threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(stage, queues[index], queues[index + 1], remaining),
+                        daemon=True,
+                        name=f"pipeline-{stage.name}-{n}",
+                    )
+                )
+        for thread in self._threads:
+            thread.start()
+
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    result = queues[-1].get(timeout=poll_interval)
+                except queue.Empty:
+                    # Threads put their output before exiting, so an empty queue
+                    # after they have all gone means the sentinel will never come
+                    if not self.is_alive() and queues[-1].empty():
+                        raise RuntimeError("pipeline stages stopped before finishing")
+                    yield None
+                    continue
+                if result is _DONE:
+                    break
+                if isinstance(result, Failed):
+                    self.failed += 1
+                else:
+                    self.processed += 1
+                yield result
+        finally:
+            # Abandoned early (consumer stopped iterating): stop feeding new work
+            self.cancel_event.set()
+            self.elapsed = time.perf_counter() - started
+
+    def throughput(self):
+        """Items per second over the last run."""
+        total = self.processed + self.failed
+        return total / self.elapsed if self.elapsed else 0.0
+
+    def report(self):
+        """Multi-line summary of throughput and per-stage busy time."""
+        lines = [
+            f"{self.processed + self.failed} items in {self.elapsed:.1f}s "
+            f"({self.throughput():.2f} items/s), {self.failed} failed"
+        ]
+        for stage in self.stages:
+            lines.append(
+                f"  {stage.name:<10} {self.busy_seconds[stage.name]:8.1f}s busy "
+                f"across {stage.workers} worker(s)"
+            )
+        return "\n".join(lines)
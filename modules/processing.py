@@ -42,20 +42,16 @@ def format_detection_results(boxes, labels, gps_data=None):
     return result
 
 
-def non_max_suppression(boxes, overlap_threshold):
-    """Apply non-max suppression to remove overlapping boxes."""
-    if len(boxes) == 0:
-        return []
-
-    # Convert boxes to numpy array
-    boxes_np = boxes.xyxy.cpu().numpy()
-    scores = boxes.conf.cpu().numpy()
+def nms_indices(xyxy, scores, overlap_threshold):
+    """Indices of the boxes kept by non-max suppression, highest score first."""
+    if len(xyxy) == 0:
+        return np.zeros(0, dtype=np.intp)
 
     # Compute areas of boxes
-    x1 = boxes_np[:, 0]
-    y1 = boxes_np[:, 1]
-    x2 = boxes_np[:, 2]
-    y2 = boxes_np[:, 3]
+    x1 = xyxy[:, 0]
+    y1 = xyxy[:, 1]
+    x2 = xyxy[:, 2]
+    y2 = xyxy[:, 3]
     areas = (x2 - x1 + 1) * (y2 - y1 + 1)
 
     # Sort boxes by confidence score
@@ -81,4 +77,15 @@ def non_max_suppression(boxes, overlap_threshold):
         inds = np.where(ovr <= overlap_threshold)[0]
         order = order[inds + 1]
 
+    return np.array(keep, dtype=np.intp)
+
+
+def non_max_suppression(boxes, overlap_threshold):
+    """Apply non-max suppression to remove overlapping boxes."""
+    if len(boxes) == 0:
+        return []
+
+    keep = nms_indices(
+        boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), overlap_threshold
+    )
     return [boxes[i] for i in keep]
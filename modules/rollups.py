@@ -0,0 +1,246 @@
+import math
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Materialized per-period counts, kept next to the history snapshot
+ROLLUPS_DB = Path("data/rollups.sqlite3")
+
+# Edge of the lat/lon squares detections are rolled up by, in degrees (about 110 km)
+REGION_DEGREES = 1.0
+
+MONTH = "month"
+WEEK = "week"
+GRAINS = (MONTH, WEEK)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    grain TEXT NOT NULL,
+    period TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    disease TEXT NOT NULL,
+    region TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (grain, period, disease, region)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_UPSERT = (
+    "INSERT INTO rollups (grain, period, year, disease, region, count) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (grain, period, disease, region) DO UPDATE SET count = count + excluded.count"
+)
+
+
+def period_starts(timestamps):
+    """Start of each timestamp's month and week (Monday), per grain, as Series."""
+    timestamps = pd.to_datetime(pd.Series(timestamps), errors="coerce")
+    days = timestamps.dt.normalize()
+    return {
+        MONTH: days - pd.to_timedelta(days.dt.day - 1, unit="D"),
+        WEEK: days - pd.to_timedelta(days.dt.dayofweek, unit="D"),
+    }
+
+
+def period_key(grain, start):
+    """Stored name of a period: "2024-05" for months, the Monday ("2024-05-13") for weeks."""
+    return start.strftime("%Y-%m" if grain == MONTH else "%Y-%m-%d")
+
+
+def region_key(latitude, longitude):
+    """Name of the REGION_DEGREES square a coordinate falls in, or "" without coordinates."""
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return ""
+    if math.isnan(lat) or math.isnan(lon):
+        return ""
+    south = math.floor(lat / REGION_DEGREES) * REGION_DEGREES
+    west = math.floor(lon / REGION_DEGREES) * REGION_DEGREES
+    return f"{south:g},{west:g}"
+
+
+class RollupStore:
+    """Monthly and weekly detection counts per disease and region, in SQLite.
+
+    `add` bumps the counts for one new detection as it is saved, and
+    `rebuild` recomputes everything from the full history (on first use
+    and whenever the snapshot is re-exported, which also picks up rows
+    added elsewhere). Every change to the counts increments
+    `data_version`. `detections_version` also moves on every saved
+    detection (dated or not) and every snapshot export, so it is the key
+    for caches of the detection table itself.
+    """
+
+    def __init__(self, path=ROLLUPS_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _bump_version(conn, key="data_version"):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + 1",
+            (key,),
+        )
+
+    def _version(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else 0
+
+    def data_version(self):
+        return self._version("data_version")
+
+    def detections_version(self):
+        return self._version("detections_version")
+
+    def mark_detections_changed(self):
+        """Note that the detection data changed, whether or not any count did."""
+        with closing(self._connect()) as conn:
+            self._bump_version(conn, "detections_version")
+
+    def is_empty(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None
+
+    def add(self, timestamp, disease, latitude=None, longitude=None):
+        """Count one detection. Detections without a usable date or disease are not rolled up."""
+        starts = {grain: series.iloc[0] for grain, series in period_starts([timestamp]).items()}
+        if pd.isna(starts[MONTH]) or pd.isna(disease):
+            return
+        disease = str(disease).strip()
+        region = region_key(latitude, longitude)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for grain, start in starts.items():
+                conn.execute(
+                    _UPSERT, (grain, period_key(grain, start), start.year, disease, region, 1)
+                )
+            self._bump_version(conn)
+            conn.execute("COMMIT")
+
+    def rebuild(self, df):
+        """Replace all counts with ones computed from a history DataFrame.
+
+        `df` needs "timestamp" and "disease detected" columns, plus
+        "latitude"/"longitude" for regions. Returns True when the counts
+        changed (and data_version was bumped).
+        """
+        rows = self._rows_from_history(df)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            current = {
+                tuple(row) for row in conn.execute(
+                    "SELECT grain, period, year, disease, region, count FROM rollups"
+                )
+            }
+            if current == set(rows):
+                conn.execute("COMMIT")
+                return False
+            conn.execute("DELETE FROM rollups")
+            conn.executemany(
+                "INSERT INTO rollups (grain, period, year, disease, region, count) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._bump_version(conn)
+            conn.execute("COMMIT")
+        return True
+
+    @staticmethod
+    def _rows_from_history(df):
+        if df is None or df.empty or "timestamp" not in df.columns:
+            return []
+        starts = period_starts(df["timestamp"].to_numpy())
+        # Missing diseases stay missing (and are dropped below) rather than becoming "nan"
+        diseases = df["disease detected"].astype(object).str.strip()
+        frame = pd.DataFrame({"disease": diseases.to_numpy()})
+        # Region squares as numbers here; only the grouped keys are formatted
+        for column, source in (("south", "latitude"), ("west", "longitude")):
+            values = pd.to_numeric(df[source], errors="coerce") if source in df.columns else np.nan
+            frame[column] = np.floor(np.asarray(values, dtype=np.float64) / REGION_DEGREES) * REGION_DEGREES
+
+        rows = []
+        for grain, periods in starts.items():
+            counts = (
+                frame.assign(start=periods.to_numpy())
+                .dropna(subset=["start", "disease"])
+                .groupby(["start", "disease", "south", "west"], dropna=False)
+                .size()
+            )
+            rows += [
+                (grain, period_key(grain, start), start.year, disease, region_key(south, west), int(count))
+                for (start, disease, south, west), count in counts.items()
+            ]
+        return rows
+
+    def query(self, grain=MONTH, diseases=None, year=None, regions=None, by_region=False):
+        """Counts per period and disease (and region, with `by_region`), oldest first.
+
+        Returns a DataFrame with "period", "disease detected", optionally
+        "region", and "count".
+        """
+        clauses, args = ["grain = ?"], [grain]
+        if diseases:
+            clauses.append(f"disease IN ({', '.join('?' * len(diseases))})")
+            args += list(diseases)
+        if year is not None:
+            clauses.append("year = ?")
+            args.append(int(year))
+        if regions:
+            clauses.append(f"region IN ({', '.join('?' * len(regions))})")
+            args += list(regions)
+        keys = "period, disease" + (", region" if by_region else "")
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT {keys}, SUM(count) AS count FROM rollups "
+                f"WHERE {' AND '.join(clauses)} GROUP BY {keys} ORDER BY {keys}",
+                args,
+            ).fetchall()
+        columns = ["period", "disease detected"] + (["region"] if by_region else []) + ["count"]
+        return pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_rollup_store():
+    """The process-wide RollupStore for ROLLUPS_DB."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RollupStore()
+        return _store
+
+
+def mark_detections_changed():
+    """Bump `detections_version` after a save or export; never fails the caller."""
+    try:
+        get_rollup_store().mark_detections_changed()
+    except Exception as e:
+        print(f"Error updating detections version: {e}")
+
+
+def record_detection(timestamp, disease, latitude=None, longitude=None):
+    """Roll up a detection that was just saved; never fails the save itself."""
+    try:
+        get_rollup_store().add(timestamp, disease, latitude, longitude)
+    except Exception as e:
+        print(f"Error updating detection rollups: {e}")
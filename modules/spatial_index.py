@@ -0,0 +1,143 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Edge of the grid cells points are bucketed by, in degrees (about 5.5 km)
+CELL_DEGREES = 0.05
+
+# Points added since the last sort are merged in once they exceed this share of the index
+MERGE_FRACTION = 0.1
+
+# Mean Earth radius used for great-circle distances
+EARTH_RADIUS_KM = 6371.0088
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Grid index over point coordinates for bounding-box and radius queries.
+
+    Points are bucketed into CELL_DEGREES cells and kept sorted by cell,
+    so a query touches one contiguous slice per row of cells it overlaps
+    (found with searchsorted) and checks only those candidates exactly.
+    `add` appends points without re-sorting; they are scanned linearly
+    until they make up MERGE_FRACTION of the index and get merged in.
+    Results are the ids points were added under: positions 0..n-1 in the
+    order they were given. Points with missing coordinates are never
+    returned. Queries crossing the antimeridian are not supported.
+    """
+
+    def __init__(self, lats=(), lons=(), cell_degrees=CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        # Cells per row of the global grid, so keys of one row are consecutive
+        self._cols = int(np.ceil(360.0 / cell_degrees)) + 1
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lons = np.empty(0, dtype=np.float64)
+        self._keys = np.empty(0, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._pending = np.empty(0, dtype=np.int64)
+        self._count = 0
+        self._all_lats = np.empty(0, dtype=np.float64)
+        self._all_lons = np.empty(0, dtype=np.float64)
+        self.add(lats, lons)
+
+    def __len__(self):
+        return self._count
+
+    def _cell(self, lats, lons):
+        rows = np.floor((np.asarray(lats) + 90.0) / self.cell_degrees).astype(np.int64)
+        cols = np.floor((np.asarray(lons) + 180.0) / self.cell_degrees).astype(np.int64)
+        return rows, cols
+
+    def add(self, lats, lons):
+        """Index more points; returns the ids they were given."""
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        ids = np.arange(self._count, self._count + len(lats), dtype=np.int64)
+        self._count += len(lats)
+        self._all_lats = np.concatenate([self._all_lats, lats])
+        self._all_lons = np.concatenate([self._all_lons, lons])
+
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        self._pending = np.concatenate([self._pending, ids[valid]])
+        if len(self._pending) > MERGE_FRACTION * len(self._ids):
+            self._merge()
+        return ids
+
+    def _merge(self):
+        ids = np.concatenate([self._ids, self._pending])
+        rows, cols = self._cell(self._all_lats[ids], self._all_lons[ids])
+        keys = rows * self._cols + cols
+        order = np.argsort(keys, kind="stable")
+        self._ids, self._keys = ids[order], keys[order]
+        self._lats, self._lons = self._all_lats[self._ids], self._all_lons[self._ids]
+        self._pending = np.empty(0, dtype=np.int64)
+
+    def _candidates(self, south, west, north, east):
+        (row0, row1), (col0, col1) = (
+            tuple(v) for v in self._cell([south, north], [west, east])
+        )
+        rows = np.arange(row0, row1 + 1, dtype=np.int64)
+        starts = np.searchsorted(self._keys, rows * self._cols + col0, side="left")
+        ends = np.searchsorted(self._keys, rows * self._cols + col1, side="right")
+        spans = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        positions = np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+        return np.concatenate([self._ids[positions], self._pending])
+
+    def bbox(self, south, west, north, east):
+        """Ids of points inside the box (inclusive), in ascending order."""
+        ids = self._candidates(south, west, north, east)
+        lats, lons = self._all_lats[ids], self._all_lons[ids]
+        inside = (lats >= south) & (lats <= north) & (lons >= west) & (lons <= east)
+        return np.sort(ids[inside])
+
+    def radius(self, lat, lon, km):
+        """Ids of points within `km` of (lat, lon) and their distances, nearest first."""
+        dlat = km / KM_PER_DEGREE
+        # Longitude degrees shrink towards the poles; clamp so the box stays finite
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+        south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+        west, east = max(lon - dlon, -180.0), min(lon + dlon, 180.0)
+
+        ids = self._candidates(south, west, north, east)
+        distances = haversine_km(lat, lon, self._all_lats[ids], self._all_lons[ids])
+        within = distances <= km
+        ids, distances = ids[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+
+
+def get_spatial_index(df, version, lat="latitude", lon="longitude"):
+    """Process-wide SpatialIndex over `df`'s coordinates, ids matching row positions.
+
+    `version` identifies the data (e.g. the rollups' `detections_version`);
+    the index is rebuilt when it or the row count changes. Rows are not
+    assumed to keep their order between loads, so there is no incremental
+    update.
+    """
+    global _index, _index_key
+    key = (version, len(df))
+    with _index_lock:
+        if _index is None or _index_key != key:
+            lats = pd.to_numeric(df[lat], errors="coerce").to_numpy(dtype=np.float64)
+            lons = pd.to_numeric(df[lon], errors="coerce").to_numpy(dtype=np.float64)
+            _index, _index_key = SpatialIndex(lats, lons), key
+        return _index
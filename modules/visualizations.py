@@ -1,7 +1,200 @@
+import threading
+
 from PIL import Image
 import numpy as np
 import cv2
 
+def bgr_colors(colors):
+    """Swap an RGB color map to BGR once, so drawing needs no per-box conversion."""
+    return {key: tuple(color[::-1]) for key, color in colors.items()}
+
+# Longest side of overlays rendered for preview; matches the result-image cache
+OVERLAY_PREVIEW_MAX_DIM = 1200
+
+# Template used to size label backgrounds; confidences always format to 4 chars
+LABEL_TEMPLATE = "{}: 0.00"
+LABEL_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+_EMPTY_XYXY = np.zeros((0, 4), dtype=np.float32)
+
+
+def boxes_to_arrays(boxes):
+    """Contiguous (xyxy, class_ids, confidences) arrays from ultralytics boxes.
+
+    Accepts a `Boxes` object or a list of single boxes; the tensor data is
+    moved to the host once instead of once per box.
+    """
+    if len(boxes) == 0:
+        return _EMPTY_XYXY, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+    if isinstance(boxes, (list, tuple)):
+        data = np.vstack([np.asarray(box.data.cpu()).reshape(-1, 6) for box in boxes])
+    else:
+        data = np.asarray(boxes.data.cpu()).reshape(-1, 6)
+    return (
+        np.ascontiguousarray(data[:, :4], dtype=np.float32),
+        data[:, 5].astype(np.int32),
+        np.ascontiguousarray(data[:, 4], dtype=np.float32),
+    )
+
+
+def preview_scale(shape, max_dim=OVERLAY_PREVIEW_MAX_DIM):
+    """Factor that brings an image of `shape` down to `max_dim` (never above 1)."""
+    if not max_dim:
+        return 1.0
+    return min(1.0, max_dim / max(shape[:2]))
+
+
+def preview_canvas(image, max_dim=OVERLAY_PREVIEW_MAX_DIM):
+    """Writable canvas to draw on: a downscaled copy, or a full copy when already small.
+
+    Returns (canvas, scale), where `scale` maps source pixel coordinates
+    onto the canvas.
+    """
+    scale = preview_scale(image.shape, max_dim)
+    if scale >= 1.0:
+        return np.array(image, copy=True, order="C"), 1.0
+    height, width = image.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    # Halve with INTER_AREA (OpenCV's fast 2x path) while more than 2x too
+    # big, then finish with a bilinear step; arbitrary-ratio INTER_AREA on a
+    # 12 MP photo costs several times more for no visible difference
+    canvas = image
+    while canvas.shape[1] >= 2 * size[0] and canvas.shape[0] >= 2 * size[1]:
+        canvas = cv2.resize(
+            canvas,
+            (canvas.shape[1] // 2, canvas.shape[0] // 2),
+            interpolation=cv2.INTER_AREA,
+        )
+    return cv2.resize(canvas, size, interpolation=cv2.INTER_LINEAR), scale
+
+
+class OverlayRenderer:
+    """Draws detections for one model's classes onto BGR canvases.
+
+    Colors, display names and label text metrics are worked out once per
+    class (and once per canvas size), so drawing a frame with hundreds of
+    lesions is a few batched OpenCV calls plus one `putText` per label.
+    """
+
+    def __init__(self, labels, colors, normalize_label=None):
+        """`labels` maps class id to model name; `colors` maps class id to an RGB tuple."""
+        self.names = {
+            idx: normalize_label(name) if normalize_label else name
+            for idx, name in labels.items()
+        }
+        self.colors = bgr_colors(colors)
+        # Dark text on light label backgrounds, white on dark ones
+        self.text_colors = {
+            idx: (0, 0, 0) if 0.299 * r + 0.587 * g + 0.114 * b > 150 else (255, 255, 255)
+            for idx, (r, g, b) in colors.items()
+        }
+        self._metrics = {}
+
+    def metrics(self, shape):
+        """Font scale, thicknesses and per-class label sizes for a canvas of `shape`."""
+        short_side = min(shape[:2])
+        if short_side not in self._metrics:
+            font_scale = max(0.4, short_side / 1000)
+            font_thickness = max(1, short_side // 500)
+            box_thickness = max(2, short_side // 300)
+            text_sizes = {}
+            for idx, name in self.names.items():
+                (text_w, text_h), baseline = cv2.getTextSize(
+                    LABEL_TEMPLATE.format(name), LABEL_FONT, font_scale, font_thickness
+                )
+                text_sizes[idx] = (text_w, text_h, baseline)
+            self._metrics[short_side] = (font_scale, font_thickness, box_thickness, text_sizes)
+        return self._metrics[short_side]
+
+    def draw(self, canvas, xyxy, class_ids, confidences, scale=1.0):
+        """Draw boxes and labelled confidences in place; `xyxy` is in source pixels."""
+        if len(xyxy) == 0:
+            return canvas
+        height, width = canvas.shape[:2]
+        font_scale, font_thickness, box_thickness, text_sizes = self.metrics(canvas.shape)
+        pad = max(2, font_thickness * 2)
+
+        # Scale and clip every box at once
+        points = np.rint(np.asarray(xyxy, dtype=np.float32) * scale).astype(np.int32)
+        points[:, [0, 2]] = np.clip(points[:, [0, 2]], 0, width - 1)
+        points[:, [1, 3]] = np.clip(points[:, [1, 3]], 0, height - 1)
+        x1, y1, x2, y2 = points.T
+
+        # Label boxes sit above each detection, or just inside it at the top
+        # edge, and are shifted left so they never run off the canvas
+        sizes = np.array([text_sizes.get(int(c), (0, 0, 0)) for c in class_ids], dtype=np.int32)
+        label_w = sizes[:, 0] + 2 * pad
+        label_h = sizes[:, 1] + sizes[:, 2] + 2 * pad
+        label_y2 = np.where(y1 - label_h >= 0, y1, np.minimum(y1 + label_h, height - 1))
+        label_y1 = label_y2 - label_h
+        label_x1 = np.clip(np.minimum(x1, width - label_w), 0, None)
+        label_x2 = label_x1 + label_w
+
+        for idx in np.unique(class_ids):
+            color = self.colors.get(int(idx), (0, 255, 0))
+            mask = class_ids == idx
+            cv2.polylines(
+                canvas, _rectangles(x1[mask], y1[mask], x2[mask], y2[mask]),
+                True, color, box_thickness,
+            )
+            cv2.fillPoly(
+                canvas,
+                _rectangles(label_x1[mask], label_y1[mask], label_x2[mask], label_y2[mask]),
+                color,
+            )
+
+        for i, (idx, confidence) in enumerate(zip(class_ids.tolist(), confidences.tolist())):
+            cv2.putText(
+                canvas,
+                f"{self.names.get(idx, idx)}: {confidence:.2f}",
+                (int(label_x1[i]) + pad, int(label_y2[i]) - pad - int(sizes[i, 2])),
+                LABEL_FONT,
+                font_scale,
+                self.text_colors.get(idx, (0, 0, 0)),
+                font_thickness,
+                cv2.LINE_AA,
+            )
+        return canvas
+
+
+# Renderers kept per (labels, colors, normalize_label); one per model and color map
+_renderers = {}
+_renderers_lock = threading.Lock()
+
+
+def get_overlay_renderer(labels, colors, normalize_label=None):
+    """Shared OverlayRenderer for a model's classes, so its label metrics are reused.
+
+    `normalize_label` must be a module-level function for the renderer to be
+    found again on the next call.
+    """
+    key = (tuple(labels.items()), tuple(colors.items()), normalize_label)
+    with _renderers_lock:
+        renderer = _renderers.get(key)
+        if renderer is None:
+            renderer = _renderers[key] = OverlayRenderer(labels, colors, normalize_label)
+    return renderer
+
+
+def _rectangles(x1, y1, x2, y2):
+    """(n, 4, 2) int32 corner arrays for batched polylines/fillPoly calls."""
+    return np.stack(
+        [np.stack([x1, y1], 1), np.stack([x2, y1], 1), np.stack([x2, y2], 1), np.stack([x1, y2], 1)],
+        axis=1,
+    ).astype(np.int32)
+
+
+def draw_detections(canvas, boxes, labels, colors, normalize_label=None, scale=1.0):
+    """Draw ultralytics boxes in place on a writable BGR canvas.
+
+    `colors` is the RGB class color map; see OverlayRenderer for callers
+    that draw the same classes repeatedly.
+    """
+    xyxy, class_ids, confidences = boxes_to_arrays(boxes)
+    renderer = OverlayRenderer(labels, colors, normalize_label)
+    return renderer.draw(canvas, xyxy, class_ids, confidences, scale)
+
 def draw_bounding_boxes(image, boxes, labels, colors, normalize_label=None):
     # Ensure the image is in RGB format
     if isinstance(image, Image.Image):
@@ -13,30 +206,13 @@ def draw_bounding_boxes(image, boxes, labels, colors, normalize_label=None):
             res_image = cv2.cvtColor(res_image, cv2.COLOR_GRAY2RGB)
         elif res_image.shape[2] == 1:
             res_image = cv2.cvtColor(res_image, cv2.COLOR_GRAY2RGB)
-    
-    # Convert to BGR for OpenCV drawing
-    res_image = cv2.cvtColor(res_image, cv2.COLOR_RGB2BGR)
-    height, width, _ = res_image.shape
-
-    for box in boxes:
-        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-        x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-        label_idx = int(box.cls)
-        confidence = float(box.conf)
-
-        raw_label = labels[label_idx]
-        display_label = normalize_label(raw_label) if normalize_label else raw_label
-        label = f"{display_label}: {confidence:.2f}"
-        color = colors[label_idx][::-1]
-
-        font_scale = max(0.6, min(width, height) / 600)
-        font_thickness = max(2, min(width, height) // 250)
-        box_thickness = max(3, min(width, height) // 200)
-
-        cv2.rectangle(res_image, (x1, y1), (x2, y2), color=color, thickness=box_thickness)
-        cv2.putText(res_image, label, (x1, y1 - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, color, font_thickness)
+        elif res_image.shape[2] == 4:
+            res_image = cv2.cvtColor(res_image, cv2.COLOR_RGBA2RGB)
+
+    # Convert to BGR for OpenCV drawing (in place, no extra copy)
+    cv2.cvtColor(res_image, cv2.COLOR_RGB2BGR, dst=res_image)
+    draw_detections(res_image, boxes, labels, colors, normalize_label)
 
     # Convert back to RGB for Streamlit display
-    res_image = cv2.cvtColor(res_image, cv2.COLOR_BGR2RGB)
-    return res_image
\ No newline at end of file
+    cv2.cvtColor(res_image, cv2.COLOR_BGR2RGB, dst=res_image)
+    return res_image
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app runs from the repository root; make its packages importable here too
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
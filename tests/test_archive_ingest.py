@@ -0,0 +1,60 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from modules import archive_ingest
+from modules.archive_ingest import archive_items, expand_uploads
+
+SETTINGS = SimpleNamespace(
+    BATCH_MAX_ARCHIVE_MEMBERS=100,
+    BATCH_MAX_ARCHIVE_MEMBER_MB=1,
+    BATCH_NEAR_DUPLICATE_BITS=None,
+)
+
+
+def _archive(members, name="photos.zip"):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for member, data in members.items():
+            archive.writestr(member, data)
+    buffer.seek(0)
+    buffer.name = name
+    return buffer
+
+
+def test_members_are_read_through_one_archive_per_source(monkeypatch):
+    source = _archive({f"img{n}.jpg": bytes([n]) * 100 for n in range(20)})
+    items, notes = archive_items(source, 100, 1024 * 1024)
+    assert notes == []
+
+    opened = []
+    real_zipfile = zipfile.ZipFile
+
+    def counting_zipfile(*args, **kwargs):
+        archive = real_zipfile(*args, **kwargs)
+        opened.append(archive)
+        return archive
+
+    monkeypatch.setattr(archive_ingest.zipfile, "ZipFile", counting_zipfile)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        files = list(pool.map(lambda item: item["open"](), reversed(items)))
+
+    assert len(opened) == 1
+    assert opened[0].fp is None  # closed after its last member
+    assert sorted(f.getvalue()[0] for f in files) == list(range(20))
+    assert files[0].name == "photos.zip/img19.jpg"
+
+
+def test_skipped_members_and_corrupt_archives_become_notes():
+    source = _archive({"a.jpg": b"a", "notes.txt": b"x", "__MACOSX/._a.jpg": b"y"})
+    corrupt = io.BytesIO(b"not a zip")
+    corrupt.name = "broken.zip"
+
+    items, notes = expand_uploads([source, corrupt], SETTINGS)
+
+    assert [item["name"] for item in items] == ["photos.zip/a.jpg"]
+    assert notes == [
+        "photos.zip: skipped 2 non-image or hidden file(s)",
+        "broken.zip: not a valid ZIP archive",
+    ]
@@ -0,0 +1,36 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from modules.batch_dedup import group_duplicates
+
+
+def _item(name, pixels, quality=90):
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=quality)
+    buffer.seek(0)
+    return {"name": name, "hash": str(hash(buffer.getvalue())), "file": buffer}
+
+
+def _gradient(offset):
+    row = np.linspace(0, 255, 64).astype(np.uint8)
+    pixels = np.tile(row, (64, 1))
+    pixels[:, 32 + offset :] = 255 - pixels[:, 32 + offset :]
+    return np.stack([pixels] * 3, axis=-1)
+
+
+def test_exact_copies_are_grouped_by_default():
+    first = _item("a.jpg", _gradient(0))
+    copy = {**first, "name": "copy of a.jpg"}
+
+    groups = group_duplicates([first, copy], max_distance=None)
+    assert groups == [first]
+    assert copy["duplicate_of"] == "a.jpg"
+
+
+def test_similar_photos_are_kept_apart_unless_near_duplicates_are_enabled():
+    items = [_item("a.jpg", _gradient(0)), _item("b.jpg", _gradient(0), quality=40)]
+
+    assert len(group_duplicates([dict(item) for item in items], max_distance=None)) == 2
+    assert len(group_duplicates([dict(item) for item in items], max_distance=4)) == 1
@@ -0,0 +1,21 @@
+import pytest
+
+for module in ("streamlit", "ultralytics", "geopy", "gspread", "oauth2client", "pydrive"):
+    pytest.importorskip(module)
+
+from modules.batch_jobs import _job_items  # noqa: E402
+
+
+def test_a_corrupt_archive_is_noted_not_fatal(tmp_path):
+    (tmp_path / "00000_broken.zip").write_bytes(b"not a zip")
+    (tmp_path / "00001_a.jpg").write_bytes(b"jpeg")
+    files = [
+        {"name": "broken.zip", "stored": "00000_broken.zip", "hash": "h0"},
+        {"name": "a.jpg", "stored": "00001_a.jpg", "hash": "h1"},
+    ]
+
+    items, notes = _job_items(tmp_path, files)
+
+    assert [item["name"] for item in items] == ["a.jpg"]
+    assert items[0]["open"]().getvalue() == b"jpeg"
+    assert notes == ["broken.zip: not a valid ZIP archive"]
@@ -0,0 +1,49 @@
+from modules.batch_manifest import PERSISTING, BatchManifest
+
+
+def test_upload_failure_survives_a_later_status_write(tmp_path):
+    manifest = BatchManifest(tmp_path / "manifest.sqlite3")
+    manifest.record("a", "a.jpg", PERSISTING)
+    # The upload thread reports before the main thread records the result
+    manifest.record_upload_failed("a", "a.jpg", "quota exceeded")
+    manifest.record("a", "a.jpg", "saved", label="Rust", score=90)
+
+    assert not manifest.is_done("a")
+    assert manifest.counts() == {"failed": 1}
+
+    reopened = BatchManifest.for_hashes(["a"], path=tmp_path / "manifest.sqlite3")
+    assert not reopened.is_done("a")
+    assert reopened.was_attempted("a")
+
+
+def test_retry_clears_the_failed_upload(tmp_path):
+    manifest = BatchManifest(tmp_path / "manifest.sqlite3")
+    manifest.record("a", "a.jpg", PERSISTING)
+    manifest.record_upload_failed("a", "a.jpg", "timeout")
+    manifest.record("a", "a.jpg", "saved")
+
+    manifest.record("a", "a.jpg", PERSISTING)
+    manifest.record("a", "a.jpg", "saved")
+    assert manifest.is_done("a")
+
+
+def test_images_are_tracked_across_batches(tmp_path):
+    path = tmp_path / "manifest.sqlite3"
+    first = BatchManifest.for_hashes(["a", "b"], path=path)
+    first.record("a", "a.jpg", "saved")
+
+    second = BatchManifest.for_hashes(["a", "c"], path=path)
+    assert second.is_done("a")
+    assert not second.was_attempted("c")
+    assert second.counts() == {"saved": 1}
+
+
+def test_images_are_processed_again_under_other_settings(tmp_path):
+    path = tmp_path / "manifest.sqlite3"
+    disease = {"detection_model_choice": "Disease", "confidence": 0.6, "save_to_drive": False}
+    first = BatchManifest.for_hashes(["a"], disease, path=path)
+    first.record("a", "a.jpg", "saved")
+
+    assert BatchManifest.for_hashes(["a"], dict(reversed(disease.items())), path=path).is_done("a")
+    assert not BatchManifest.for_hashes(["a"], {**disease, "save_to_drive": True}, path=path).is_done("a")
+    assert not BatchManifest.for_hashes(["a"], {**disease, "detection_model_choice": "Leaf"}, path=path).is_done("a")
@@ -0,0 +1,79 @@
+import io
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+for module in ("streamlit", "ultralytics", "geopy", "gspread", "oauth2client", "pydrive"):
+    pytest.importorskip(module)
+
+from modules import batch_processing, image_uploader  # noqa: E402
+from modules.batch_manifest import BatchManifest, content_hash  # noqa: E402
+from modules.image_uploader import DriveUploadPool  # noqa: E402
+from modules.memory_utils import MemoryBudget  # noqa: E402
+from modules.pipeline import Failed  # noqa: E402
+
+SETTINGS = SimpleNamespace(
+    BATCH_MAX_IN_FLIGHT=2,
+    BATCH_READ_WORKERS=2,
+    BATCH_IO_WORKERS=2,
+    BATCH_QUEUE_SIZE=1,
+    BATCH_DUPLICATE_POLICY="save_once",
+)
+
+
+def _jpeg(seed):
+    pixels = np.random.default_rng(seed).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG")
+    buffer.seek(0)
+    buffer.name = f"photo-{seed}.jpg"
+    return buffer
+
+
+def test_batch_larger_than_in_flight_cap_finishes_with_drive_upload(monkeypatch, tmp_path):
+    uploaded = []
+
+    def slow_upload(image_bytes, label, drive, parent_folder_id):
+        time.sleep(0.02)
+        uploaded.append(label)
+        return "uploaded", f"id-{len(uploaded)}", "ok"
+
+    def detect(*args):
+        return "Rust", 90
+
+    def save(best, file, gps, save_to_drive, drive, folder, upload_pool, image_hash, check_existing):
+        upload_pool.submit(file.getvalue(), best[0], key=image_hash)
+        return best
+
+    monkeypatch.setattr(image_uploader, "upload_image_bytes", slow_upload)
+    monkeypatch.setattr(batch_processing, "detect_best_disease", detect)
+    monkeypatch.setattr(batch_processing, "save_best_disease", save)
+
+    files = [_jpeg(seed) for seed in range(SETTINGS.BATCH_MAX_IN_FLIGHT * 6)]
+    items = [{"name": f.name, "hash": content_hash(f), "file": f} for f in files]
+    # The read stage fills the decoded-image item cap; queued uploads must not
+    # wait on it, or persist, infer and read end up waiting on each other
+    budget = MemoryBudget(2**30, max_items=SETTINGS.BATCH_MAX_IN_FLIGHT)
+    pool = DriveUploadPool(None, "parent", max_workers=1, max_queued_bytes=2 * 64 * 64 * 3)
+    manifest = BatchManifest(tmp_path / "manifest.sqlite3")
+    pipeline = batch_processing.build_batch_pipeline(
+        (None, None, None), "Disease", 0.5, 0.3, True, None, "parent",
+        budget, pool, manifest, SETTINGS,
+    )
+
+    results = []
+    runner = threading.Thread(target=lambda: results.extend(pipeline.run(items)), daemon=True)
+    runner.start()
+    runner.join(timeout=30)
+    assert not runner.is_alive(), "batch pipeline deadlocked"
+
+    assert not [result for result in results if isinstance(result, Failed)]
+    assert len(results) == len(items)
+    assert len(list(pool.results())) == len(items)
+    pool.close()
+    manifest.close()
+    assert len(uploaded) == len(items)
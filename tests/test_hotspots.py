@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from modules import hotspots
+from modules.hotspots import HotspotModel, get_hotspot_model
+
+
+def _cluster(lat, lon, n, day, disease, spread=0.001, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "latitude": lat + rng.uniform(-spread, spread, n),
+            "longitude": lon + rng.uniform(-spread, spread, n),
+            "timestamp": pd.Timestamp(day) + pd.to_timedelta(rng.integers(0, 3, n), unit="D"),
+            "disease detected": disease,
+        }
+    )
+
+
+def _detections():
+    return pd.concat(
+        [
+            _cluster(10.0, 120.0, 12, "2024-03-01", "Rust", seed=1),
+            _cluster(10.5, 120.5, 6, "2024-03-01", "Rust", seed=2),
+            # Same place as the first cluster, but another disease
+            _cluster(10.0, 120.0, 2, "2024-03-01", "Cercospora", seed=3),
+            # Same place, months later: too far apart in time to join
+            _cluster(10.0, 120.0, 2, "2024-09-01", "Rust", seed=4),
+            # Scattered noise on a 0.2 degree grid
+            pd.DataFrame(
+                {
+                    "latitude": np.repeat([9.0, 9.2, 9.4], 3),
+                    "longitude": np.tile([119.0, 119.2, 119.4], 3),
+                    "timestamp": pd.Timestamp("2024-03-01"),
+                    "disease detected": "Rust",
+                }
+            ),
+        ],
+        ignore_index=True,
+    )
+
+
+def _model(df):
+    model = HotspotModel(radius_km=1.0, window_days=14, min_detections=5)
+    model.add(df["latitude"], df["longitude"], df["timestamp"], df["disease detected"])
+    return model
+
+
+def test_dense_same_disease_detections_form_hotspots_largest_first():
+    df = _detections()
+    labels = _model(df).labels()
+
+    assert set(labels[:12]) == {0}
+    assert set(labels[12:18]) == {1}
+    assert set(labels[18:]) == {-1}
+
+    summary = _model(df).summary()
+    assert summary["detections"].tolist() == [12, 6]
+    assert summary["disease"].tolist() == ["Rust", "Rust"]
+
+
+def test_undated_unplaced_and_unlabelled_detections_are_noise():
+    df = _cluster(10.0, 120.0, 10, "2024-03-01", "Rust", spread=0.0001)
+    df.loc[0, "timestamp"] = pd.NaT
+    df.loc[1, "latitude"] = np.nan
+    df.loc[2, "disease detected"] = None
+
+    labels = _model(df).labels()
+    assert labels[:3].tolist() == [-1, -1, -1]
+    assert set(labels[3:]) == {0}
+
+
+def test_adding_in_parts_matches_one_build():
+    df = _detections()
+    model = HotspotModel(radius_km=1.0, window_days=14, min_detections=5)
+    for part in np.array_split(np.arange(len(df)), 3):
+        rows = df.iloc[part]
+        model.add(rows["latitude"], rows["longitude"], rows["timestamp"], rows["disease detected"])
+    assert model.labels().tolist() == _model(df).labels().tolist()
+
+
+def test_shared_model_is_rebuilt_when_the_version_changes(monkeypatch):
+    monkeypatch.setattr(hotspots, "_model", None)
+    df = _detections()
+
+    first = get_hotspot_model(df, 1)
+    assert get_hotspot_model(df, 1) is first
+    assert get_hotspot_model(df, 2) is not first
+    assert get_hotspot_model(df, 2, min_detections=50).summary().empty
@@ -0,0 +1,34 @@
+import pytest
+
+for module in ("streamlit", "ultralytics", "geopy", "gspread", "oauth2client"):
+    pytest.importorskip(module)
+
+from ingest import DRY_RUN_SAVED, Checkpoint  # noqa: E402
+
+
+def _item(n):
+    return {"hash": f"h{n}", "signature": f"s{n}", "path": f"/photos/{n}.jpg"}
+
+
+def test_dry_run_hits_are_not_done_for_a_real_run(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    dry = Checkpoint(path, dry_run=True)
+    dry.record(_item(1), DRY_RUN_SAVED)
+    dry.record(_item(2), "skipped")
+    assert not dry.claim("h1")
+    dry.close()
+
+    assert Checkpoint(path, dry_run=True).hashes == {"h1", "h2"}
+    real = Checkpoint(path)
+    assert real.hashes == {"h2"}
+    assert real.claim("h1")
+    real.close()
+
+
+def test_failed_images_are_retried(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "checkpoint.jsonl")
+    assert checkpoint.claim("h1")
+    assert not checkpoint.claim("h1")
+    checkpoint.record(_item(1), "failed", error="boom")
+    assert checkpoint.claim("h1")
+    checkpoint.close()
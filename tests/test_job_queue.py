@@ -0,0 +1,26 @@
+from modules.job_queue import DONE, FAILED, QUEUED, JobQueue
+
+
+def test_resubmit_requeues_a_failed_job(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("batch", {"files": []}, total=2)
+    queue.claim_next()
+    queue.add_result(job_id, "a.jpg", "saved")
+    queue.finish(job_id, FAILED, error="boom")
+
+    assert queue.resubmit(job_id)
+    job = queue.get(job_id)
+    assert job["status"] == QUEUED
+    assert job["error"] is None
+    assert queue.results(job_id) == []
+    assert queue.claim_next()["id"] == job_id
+
+
+def test_resubmit_ignores_jobs_that_did_not_fail(tmp_path):
+    queue = JobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.submit("batch", {})
+    queue.claim_next()
+    queue.finish(job_id, DONE, result={})
+
+    assert not queue.resubmit(job_id)
+    assert queue.get(job_id)["status"] == DONE
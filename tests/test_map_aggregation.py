@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from modules.map_aggregation import POINTS_MIN_ZOOM, aggregate_points, cell_size_degrees
+
+
+def test_missing_categories_count_but_never_dominate():
+    df = pd.DataFrame(
+        {
+            "latitude": [10.0, 10.0, 10.0, 20.0],
+            "longitude": [120.0, 120.0, 120.0, 130.0],
+            "disease detected": pd.Categorical([None, None, "Rust", None]),
+        }
+    )
+    cells, mode = aggregate_points(df, zoom=5)
+
+    assert mode == "cells"
+    cells = cells.sort_values("latitude")
+    assert cells["count"].tolist() == [3, 1]
+    assert cells["dominant"].iloc[0] == "Rust"
+    assert pd.isna(cells["dominant"].iloc[1])
+    assert np.allclose(cells["dominant share"], [1 / 3, 0.0])
+
+
+def _detections():
+    # Three points within 0.05 degrees (two of them 0.002 apart) and one far away
+    return pd.DataFrame(
+        {
+            "latitude": [10.1, 10.102, 10.15, 10.5, np.nan],
+            "longitude": [120.1, 120.102, 120.12, 120.5, 120.0],
+            "disease detected": ["Rust", "Rust", "Cercospora", "Rust", "Rust"],
+            "confidence": [90.0, 80.0, 70.0, 60.0, 50.0],
+        }
+    )
+
+
+def test_close_zooms_return_the_points_themselves():
+    df = _detections()
+    frame, mode = aggregate_points(df, zoom=POINTS_MIN_ZOOM)
+    assert mode == "points"
+    assert frame is df
+
+
+def test_cell_counts_at_each_zoom():
+    df = _detections()
+    expected = {3: [4], 8: [3, 1], POINTS_MIN_ZOOM - 1: [2, 1, 1]}
+    for zoom, counts in expected.items():
+        cells, mode = aggregate_points(df, zoom)
+        assert mode == "cells"
+        assert sorted(cells["count"], reverse=True) == counts
+        assert cells["cell size"].iloc[0] == cell_size_degrees(zoom)
+        assert cells["count"].sum() == 4  # the unplaced row is left out
+
+
+def test_cells_carry_dominant_disease_and_mean_confidence():
+    cells, _ = aggregate_points(_detections(), zoom=8)
+    first = cells.sort_values("count").iloc[-1]
+    assert first["dominant"] == "Rust"
+    assert first["dominant share"] == 2 / 3
+    assert first["mean confidence"] == 80.0
+
+
+def test_too_many_cells_coarsen_the_grid():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "latitude": rng.uniform(0, 10, 2000),
+            "longitude": rng.uniform(0, 10, 2000),
+            "disease detected": "Rust",
+        }
+    )
+    cells, mode = aggregate_points(df, zoom=POINTS_MIN_ZOOM, max_points=100)
+    assert mode == "cells"
+    assert len(cells) <= 100
+    assert cells["cell size"].iloc[0] > cell_size_degrees(POINTS_MIN_ZOOM)
+    assert cells["count"].sum() == 2000
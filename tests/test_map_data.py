@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+for module in ("streamlit", "gspread", "oauth2client", "pydrive"):
+    pytest.importorskip(module)
+
+from modules.map_data import DetectionFilter, jitter_coordinates, typed_detections  # noqa: E402
+
+
+def _sheet(**columns):
+    rows = {
+        "Timestamp": ["2024-03-05", "N/A", "05/04/2024", ""],
+        "Disease Detected": [" Rust", None, "", "Cercospora "],
+        "Confidence": [91, "80", "", 70],
+        "Latitude": [10.5, 10.5, "", 11.0],
+        "Longitude": [120.5, 120.5, "", 121.0],
+    }
+    rows.update(columns)
+    return pd.DataFrame(rows)
+
+
+def test_missing_diseases_get_code_minus_one():
+    table = typed_detections(_sheet())
+
+    diseases = table["disease detected"]
+    assert list(diseases.cat.categories) == ["Cercospora", "Rust"]
+    assert diseases.cat.codes.tolist() == [1, -1, -1, 0]
+
+
+def test_columns_are_typed_and_undated_rows_get_minus_one():
+    table = typed_detections(_sheet())
+
+    assert table["timestamp"].tolist()[:3] == [
+        pd.Timestamp("2024-03-05"), pd.NaT, pd.Timestamp("2024-05-04"),
+    ]
+    assert table["year"].tolist() == [2024, -1, 2024, -1]
+    assert table["month"].tolist() == [3, -1, 5, -1]
+    assert table["confidence"].dtype == np.float32
+    assert np.isnan(table["latitude"].iloc[2])
+
+
+def test_missing_columns_are_reported():
+    with pytest.raises(ValueError, match="Found columns"):
+        typed_detections(_sheet().drop(columns=["Latitude"]))
+    with pytest.raises(ValueError, match="timestamp"):
+        typed_detections(_sheet().drop(columns=["Timestamp"]))
+
+
+def test_jitter_spreads_only_stacked_points_and_is_deterministic():
+    df = pd.DataFrame(
+        {
+            "latitude": [10.0, 10.0, 10.0, 11.0, np.nan, np.nan],
+            "longitude": [120.0, 120.0, 120.0, 121.0, np.nan, np.nan],
+        }
+    )
+    lats, lons = jitter_coordinates(df, amount=0.001)
+
+    assert lats.iloc[3] == 11.0 and lons.iloc[3] == 121.0
+    assert lats.iloc[4:].isna().all()
+    stacked = list(zip(lats.iloc[:3], lons.iloc[:3]))
+    assert len(set(stacked)) == 3
+    assert np.all(np.abs(lats.iloc[:3] - 10.0) <= 0.001)
+    assert np.all(np.abs(lons.iloc[:3] - 120.0) <= 0.001)
+
+    again_lats, again_lons = jitter_coordinates(df.copy(), amount=0.001)
+    assert again_lats.equals(lats) and again_lons.equals(lons)
+
+
+def _filter_frame():
+    return pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(
+                ["2023-05-01", "2024-03-05", "2024-03-20", None, "2024-07-01"]
+            ),
+            "disease detected": pd.Categorical(["Rust", "Rust", "Cercospora", "Rust", None]),
+        }
+    )
+
+
+def test_filter_positions_combine_codes_within_and_since():
+    selector = DetectionFilter(_filter_frame())
+
+    assert selector.positions().tolist() == [0, 1, 2, 3, 4]
+    assert selector.positions(disease="Rust").tolist() == [0, 1, 3]
+    assert selector.positions(disease="Sooty mold").tolist() == []
+    assert selector.positions(year=2024).tolist() == [1, 2, 4]
+    assert selector.positions(disease="Rust", year=2024, month=3).tolist() == [1]
+    # Undated rows are never "since" anything
+    assert selector.positions(since="2024-03-10").tolist() == [2, 4]
+    # `within` is a spatial result in any order; positions come back sorted
+    assert selector.positions(within=[4, 0, 3]).tolist() == [0, 3, 4]
+    assert selector.positions(disease="Rust", within=[4, 3, 1]).tolist() == [1, 3]
+    assert selector.positions(within=[]).tolist() == []
+
+
+def test_filter_masks_are_cached_and_colors_default_for_missing():
+    selector = DetectionFilter(_filter_frame())
+    assert selector.mask("disease", "Rust") is selector.mask("disease", "Rust")
+
+    colors = selector.colors(np.arange(5), {"rust": "#ffa500"}, default="#000")
+    assert colors.tolist() == ["#ffa500", "#ffa500", "#000", "#ffa500", "#000"]
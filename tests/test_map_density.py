@@ -0,0 +1,37 @@
+import numpy as np
+
+from modules.map_density import density_grid, heatmap_radius_px
+
+
+def test_density_peaks_where_detections_cluster():
+    rng = np.random.default_rng(0)
+    lats = np.concatenate([rng.normal(10.0, 0.001, 200), rng.uniform(9.5, 10.5, 20), [np.nan]])
+    lons = np.concatenate([rng.normal(120.0, 0.001, 200), rng.uniform(119.5, 120.5, 20), [120.0]])
+
+    cells, cell = density_grid(lats, lons, 0.01)
+
+    assert cell >= 0.01
+    peak = cells.loc[cells["density"].idxmax()]
+    assert abs(peak["latitude"] - 10.0) <= cell and abs(peak["longitude"] - 120.0) <= cell
+    assert (cells["density"] >= cells["density"].max() * 0.02).all()
+
+
+def test_wide_extents_coarsen_and_cells_are_capped():
+    rng = np.random.default_rng(1)
+    lats, lons = rng.uniform(-40, 40, 5000), rng.uniform(-80, 80, 5000)
+
+    cells, cell = density_grid(lats, lons, 0.001, max_bins=50, max_cells=100)
+
+    assert cell >= (lons.max() - lons.min()) / 50
+    assert len(cells) <= 100
+
+
+def test_no_valid_points_give_an_empty_grid():
+    cells, cell = density_grid([np.nan], [np.nan], 0.5)
+    assert cells.empty and cell == 0.5
+
+
+def test_heatmap_radius_grows_with_zoom_within_bounds():
+    radii = [heatmap_radius_px(0.01, zoom) for zoom in range(0, 20)]
+    assert radii == sorted(radii)
+    assert min(radii) >= 4 and max(radii) <= 60
@@ -0,0 +1,65 @@
+import threading
+
+from modules.memory_utils import MemoryBudget
+
+
+def _acquire_in_thread(budget, num_bytes):
+    acquired = threading.Event()
+
+    def run():
+        budget.acquire(num_bytes)
+        acquired.set()
+
+    threading.Thread(target=run, daemon=True).start()
+    return acquired
+
+
+def test_second_acquire_blocks_until_bytes_are_released():
+    budget = MemoryBudget(100)
+    token = budget.acquire(80)
+
+    acquired = _acquire_in_thread(budget, 40)
+    assert not acquired.wait(0.2)
+
+    budget.release(token)
+    assert acquired.wait(2)
+    assert budget.in_use == 40
+
+
+def test_second_acquire_blocks_at_max_items():
+    budget = MemoryBudget(1000, max_items=1)
+    token = budget.acquire(1)
+
+    acquired = _acquire_in_thread(budget, 1)
+    assert not acquired.wait(0.2)
+
+    budget.release(token)
+    assert acquired.wait(2)
+
+
+def test_acquire_times_out_when_budget_is_exhausted():
+    budget = MemoryBudget(100)
+    budget.acquire(100)
+
+    assert budget.acquire(1, timeout=0.05) is None
+    assert budget.items == 1
+
+
+def test_oversized_request_passes_only_when_nothing_is_held():
+    budget = MemoryBudget(100)
+    assert budget.acquire(500) == 500
+
+    assert budget.acquire(10, timeout=0.05) is None
+    budget.release(500)
+    assert budget.acquire(10, timeout=0.05) == 10
+
+
+def test_close_wakes_waiters():
+    budget = MemoryBudget(100)
+    budget.acquire(100)
+
+    acquired = _acquire_in_thread(budget, 50)
+    assert not acquired.wait(0.1)
+
+    budget.close()
+    assert acquired.wait(2)
@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+from modules.pipeline import Failed, Stage, StagedPipeline
+
+
+def test_run_yields_heartbeats_while_a_stage_is_busy():
+    release = threading.Event()
+
+    def slow(item):
+        release.wait(5)
+        return item
+
+    pipeline = StagedPipeline([Stage("slow", slow)])
+    results = []
+    for result in pipeline.run([1], poll_interval=0.05):
+        if result is None:
+            release.set()  # the consumer got control back without a result
+            continue
+        results.append(result)
+    assert results == [1]
+
+
+def test_failures_are_passed_through():
+    def explode(item):
+        raise ValueError(item)
+
+    results = list(StagedPipeline([Stage("explode", explode)]).run([1, 2]))
+    assert all(isinstance(result, Failed) for result in results)
+    assert len(results) == 2
+
+
+def test_run_raises_when_the_stages_exit_without_finishing(monkeypatch):
+    pipeline = StagedPipeline([Stage("noop", lambda item: item)])
+    # A worker dying outside its stage function never forwards the sentinel
+    monkeypatch.setattr(pipeline, "_work", lambda *args: None)
+    with pytest.raises(RuntimeError):
+        for _ in pipeline.run([1], poll_interval=0.05):
+            pass
@@ -0,0 +1,45 @@
+import pandas as pd
+
+from modules.rollups import MONTH, RollupStore
+
+
+def test_undated_detections_change_only_the_detections_version(tmp_path):
+    store = RollupStore(tmp_path / "rollups.sqlite3")
+    store.add("N/A", "Rust", 10.0, 120.0)
+    store.mark_detections_changed()
+
+    assert store.is_empty()
+    assert store.data_version() == 0
+    assert store.detections_version() == 1
+
+
+def test_unchanged_rebuild_still_moves_the_detections_version(tmp_path):
+    store = RollupStore(tmp_path / "rollups.sqlite3")
+    history = pd.DataFrame(
+        {"timestamp": ["2024-03-05"], "disease detected": ["Rust"], "latitude": [10.0], "longitude": [120.0]}
+    )
+    assert store.rebuild(history)
+    assert not store.rebuild(history)
+    store.mark_detections_changed()
+
+    assert store.data_version() == 1
+    assert store.detections_version() == 1
+    assert store.query(MONTH)["count"].sum() == 1
+
+
+def test_missing_diseases_are_not_rolled_up_as_text(tmp_path):
+    store = RollupStore(tmp_path / "rollups.sqlite3")
+    history = pd.DataFrame(
+        {
+            "timestamp": ["2024-03-05", "2024-03-06", "2024-03-07"],
+            "disease detected": pd.Categorical([" Rust", None, float("nan")]),
+            "latitude": [10.0, 10.0, 10.0],
+            "longitude": [120.0, 120.0, 120.0],
+        }
+    )
+    store.rebuild(history)
+    store.add("2024-03-08", None, 10.0, 120.0)
+
+    counts = store.query(MONTH)
+    assert counts["disease detected"].tolist() == ["Rust"]
+    assert counts["count"].tolist() == [1]
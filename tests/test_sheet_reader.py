@@ -0,0 +1,74 @@
+import re
+
+import numpy as np
+import pytest
+
+for module in ("streamlit", "gspread", "oauth2client", "pydrive"):
+    pytest.importorskip(module)
+
+from modules.database import fetch_detection_columns  # noqa: E402
+
+
+class FakeWorksheet:
+    """Column-major batch_get over an in-memory sheet, trimming trailing blanks like the API."""
+
+    def __init__(self, rows, extra_rows=0):
+        self.rows = rows
+        self.row_count = len(rows) + extra_rows
+        self.requests = []
+
+    def row_values(self, row):
+        return list(self.rows[row - 1])
+
+    def batch_get(self, ranges, **kwargs):
+        assert kwargs["major_dimension"] == "COLUMNS"
+        self.requests.append(ranges)
+        pages = []
+        for cell_range in ranges:
+            (col, first), (_, last) = re.findall(r"([A-Z]+)(\d+)", cell_range)
+            index = ord(col) - ord("A")
+            values = [row[index] if index < len(row) else "" for row in self.rows[int(first) - 1 : int(last)]]
+            while values and values[-1] == "":
+                values.pop()
+            pages.append([values] if values else [])
+        return pages
+
+
+def _sheet():
+    header = ["Timestamp", "Disease Detected", "Notes", "Confidence", "Latitude", "Longitude"]
+    rows = [
+        ["2024-03-05", "Rust", "x", 91, 10.5, 120.5],
+        ["N/A", "Cercospora", "", 80, "", ""],
+        ["2024-03-07", "", "", "", 11.0, 121.0],
+        ["2024-03-08", "Rust", "", 70, 12.0, ""],
+        ["2024-03-09", "Rust", "", 60, 13.0, 123.0],
+    ]
+    return FakeWorksheet([header, *rows], extra_rows=3)
+
+
+def test_only_wanted_columns_are_read_in_pages():
+    worksheet = _sheet()
+    df = fetch_detection_columns(
+        ["timestamp", "disease detected", "confidence", "latitude", "longitude", "altitude"],
+        page_rows=2,
+        worksheet=worksheet,
+    )
+
+    assert list(df.columns) == ["timestamp", "disease detected", "confidence", "latitude", "longitude"]
+    # Rows 2..9 in pages of two, one range per wanted column and never the notes column
+    assert len(worksheet.requests) == 4
+    assert all(len(ranges) == 5 and not any(r.startswith("C") for r in ranges) for ranges in worksheet.requests)
+
+    # Trailing blank rows are dropped; blanks inside a column keep the rows aligned
+    assert len(df) == 5
+    assert df["timestamp"].tolist() == ["2024-03-05", "N/A", "2024-03-07", "2024-03-08", "2024-03-09"]
+    assert df["disease detected"].tolist() == ["Rust", "Cercospora", "", "Rust", "Rust"]
+    assert df["confidence"].dtype == np.float64
+    assert np.isnan(df["confidence"].iloc[2])
+    assert df["longitude"].isna().tolist() == [False, True, False, True, False]
+
+
+def test_a_sheet_without_wanted_headers_gives_an_empty_frame():
+    worksheet = FakeWorksheet([["Notes"], ["x"]])
+    assert fetch_detection_columns(["latitude"], worksheet=worksheet).empty
+    assert worksheet.requests == []
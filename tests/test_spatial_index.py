@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from modules import spatial_index
+from modules.spatial_index import SpatialIndex, get_spatial_index, haversine_km
+
+
+def _points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(10.0, 10.5, n), rng.uniform(120.0, 120.5, n)
+
+
+def test_queries_match_brute_force():
+    lats, lons = _points(2000)
+    lats[5] = np.nan
+    index = SpatialIndex(lats, lons)
+
+    inside = (lats >= 10.1) & (lats <= 10.2) & (lons >= 120.1) & (lons <= 120.3)
+    assert index.bbox(10.1, 120.1, 10.2, 120.3).tolist() == np.flatnonzero(inside).tolist()
+
+    ids, distances = index.radius(10.25, 120.25, 5.0)
+    expected = np.flatnonzero(haversine_km(10.25, 120.25, lats, lons) <= 5.0)
+    assert sorted(ids.tolist()) == expected.tolist()
+    assert np.all(np.diff(distances) >= 0)
+    assert 5 not in ids
+
+
+def test_added_points_are_found_before_and_after_merging():
+    lats, lons = _points(100)
+    index = SpatialIndex(lats[:90], lons[:90])
+    assert index.add(lats[90:], lons[90:]).tolist() == list(range(90, 100))
+    assert len(index) == 100
+
+    everything = index.bbox(10.0, 120.0, 10.5, 120.5)
+    assert everything.tolist() == list(range(100))
+
+
+def test_shared_index_is_rebuilt_when_the_version_or_row_count_changes(monkeypatch):
+    monkeypatch.setattr(spatial_index, "_index", None)
+    lats, lons = _points(10)
+    df = pd.DataFrame({"latitude": lats, "longitude": lons})
+
+    first = get_spatial_index(df, 1)
+    assert get_spatial_index(df, 1) is first
+    # Reloaded data may come back in another order; the version says it changed
+    reordered = get_spatial_index(df.iloc[::-1].reset_index(drop=True), 2)
+    assert reordered is not first
+    assert reordered.bbox(lats[0], lons[0], lats[0], lons[0]).tolist() == [9]
+    assert get_spatial_index(df.iloc[:5], 2) is not reordered